@@ -2,19 +2,16 @@
 
 import os
 import sys
+import time
 import streamlit as st
-import pandas as pd
-import joblib
 
 # Set up paths
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 SRC_DIR = os.path.join(BASE_DIR, 'src')
 sys.path.append(SRC_DIR)
 
-from src.backtest import run_and_log
-from src.ingestion import fetch_data
-from src.simple_strategy import get_signals_for_tickers
-from src.ml_model import fetch_and_prepare, train_model, predict_next_signal
+from src.jobs import get_runner, FAILED
+from src.store import get_sinks
 
 st.set_page_config(page_title="Algo Trading Dashboard", layout="wide")
 st.title("📈 Algo-Trading System with ML & Automation")
@@ -25,51 +22,136 @@ selected_ticker = st.selectbox("Select a stock to analyze", tickers)
 start_date = "2024-01-01"
 end_date = "2025-06-24"
 json_path = "algo_sheets_api.json"  # Replace with your actual file path
+POLL_SECONDS = 1.0
+
+# Work runs on the shared job runner: buttons only submit, every rerun just reads status,
+# and a result computed for one session is reused by all others.
+runner = get_runner()
+
+
+def submit(kind, **params):
+    st.session_state[f"{kind}:{selected_ticker}"] = runner.submit(kind, selected_ticker, **params).id
+
+
+def current_job(kind, **params):
+    job_id = st.session_state.get(f"{kind}:{selected_ticker}")
+    job = runner.get(job_id) if job_id else None
+    return job or runner.find(kind, selected_ticker, **params)
+
+
+def show(kind, label, render, **params):
+    job = current_job(kind, **params)
+    if job is None:
+        return None
+    if job.active:
+        st.progress(job.progress, text=f"{label} for {selected_ticker}: {job.message}")
+    elif job.status == FAILED:
+        render_error(kind, job)
+    else:
+        render(job.result)
+    return job
+
+
+def render_error(kind, job):
+    if kind == "predict" and job.error.startswith("FileNotFoundError"):
+        st.error(" Model or Scaler not found. Please train the model first.")
+    else:
+        st.error(f" {kind.capitalize()} failed: {job.error}")
+
+
+jobs = []
 
 # --- Backtesting ---
 if st.button("📉 Run Backtest"):
-    with st.spinner(f"Running backtest for {selected_ticker}..."):
-        stats, trades = run_and_log(selected_ticker)
-        if stats is not None and trades is not None:
-            st.subheader("📊 Backtest Statistics")
-            st.dataframe(stats.to_frame().T)
+    submit("backtest")
+
+
+def render_backtest(result):
+    stats, trades = result["stats"], result["trades"]
+    if stats is not None and trades is not None:
+        st.subheader("📊 Backtest Statistics")
+        st.dataframe(stats.to_frame().T)
+
+        st.subheader("📋 Trade Log")
+        st.dataframe(trades)
 
-            st.subheader("📋 Trade Log")
-            st.dataframe(trades)
+        st.subheader("📈 Equity Curve")
+        st.line_chart(stats['_equity_curve']['Equity'])
+    else:
+        st.warning("⚠️ No trades executed. Try a different stock or strategy.")
+
+
+jobs.append(show("backtest", "Backtest", render_backtest))
 
-            st.subheader("📈 Equity Curve")
-            st.line_chart(stats['_equity_curve']['Equity'])
-        else:
-            st.warning("⚠️ No trades executed. Try a different stock or strategy.")
 
 # --- ML Model Training ---
 if st.button("🧠 Train ML Model"):
-    with st.spinner(f"Fetching data and training ML model for {selected_ticker}..."):
-        df = fetch_and_prepare(selected_ticker)
-        train_model(df, selected_ticker)
-        st.success("✅ ML model trained and saved successfully!")
+    submit("train")
+
+
+def render_training(result):
+    st.success(f"✅ ML model trained and saved successfully! ({result['rows']} rows, {result['params']})")
+
+
+jobs.append(show("train", "Training", render_training))
+
 
 # --- Buy Signal Detection ---
 if st.button("🔍 Show Buy Signals"):
-    with st.spinner("Fetching buy signals..."):
-        signal_df = get_signals_for_tickers([selected_ticker], start_date, end_date)
-        buy_signals = signal_df[signal_df["signal"] == 1]
-        if not buy_signals.empty:
-            st.subheader(" Buy Signals Detected")
-            st.dataframe(buy_signals[["Date", "Close", "RSI", "SMA20", "SMA50"]])
-        else:
-            st.warning(" No buy signals found.")
+    submit("signals", start=start_date, end=end_date)
+
+
+def render_signals(signal_df):
+    buy_signals = signal_df[signal_df["signal"] == 1] if not signal_df.empty else signal_df
+    if not buy_signals.empty:
+        st.subheader(" Buy Signals Detected")
+        st.dataframe(buy_signals[["Date", "Close", "RSI", "SMA20", "SMA50"]])
+    else:
+        st.warning(" No buy signals found.")
+
+
+jobs.append(show("signals", "Signal scan", render_signals, start=start_date, end=end_date))
+
 
 # --- Predict Next Signal ---
 if st.button("📡 Predict Next Signal using ML"):
-    try:
-        signal, prob = predict_next_signal(selected_ticker)
-        if signal == 1:
-            st.success(f" Prediction: BUY Signal ({prob*100:.2f}% confidence)")
-        else:
-            st.warning(f" Prediction: SELL / HOLD Signal ({prob*100:.2f}% confidence)")
-    except FileNotFoundError:
-        st.error(" Model or Scaler not found. Please train the model first.")
-    except Exception as e:
-        st.error(f" Prediction failed: {str(e)}")
+    submit("predict")
+
+
+def render_prediction(result):
+    signal, prob = result
+    if signal == 1:
+        st.success(f" Prediction: BUY Signal ({prob*100:.2f}% confidence)")
+    else:
+        st.warning(f" Prediction: SELL / HOLD Signal ({prob*100:.2f}% confidence)")
+
+
+jobs.append(show("predict", "Prediction", render_prediction))
+
+
+# --- Jobs ---
+with st.expander("⏳ Jobs"):
+    st.dataframe(runner.status())
+
+
+# --- Stored Results ---
+if st.button("📚 Show Stored Results"):
+    store = get_sinks().store
+    summary = store.read("summary")
+    trades = store.read("trade_log", tickers=selected_ticker)
+    signals = store.read("buy_signals", tickers=selected_ticker)
+    if summary.empty and trades.empty and signals.empty:
+        st.warning(" No stored results yet. Run the bot or a backtest first.")
+    else:
+        st.subheader("📊 Summary")
+        st.dataframe(summary)
+        st.subheader(f"📋 Stored Trades for {selected_ticker}")
+        st.dataframe(trades)
+        st.subheader(f"🔍 Stored Buy Signals for {selected_ticker}")
+        st.dataframe(signals)
+
 
+# Poll (never block) while this ticker still has work in flight
+if any(job is not None and job.active for job in jobs):
+    time.sleep(POLL_SECONDS)
+    st.rerun()
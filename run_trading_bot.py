@@ -1,167 +1,283 @@
 import os
-import sys
+import argparse
 import pandas as pd
-import numpy as np
-import math
-import json
-import pandas_ta as ta
-from backtesting import Backtest, Strategy
-from backtesting.test import SMA
-from backtesting.lib import crossover
-
 
 from src.ingestion import fetch_data
-from src.simple_strategy import get_signals_for_tickers
-from src.sheets_logger import log_to_named_sheet
-from src.ml_model import fetch_and_prepare, train_model ,predict_next_signal
+from src.simple_strategy import generate_signals
+from src.sheet_sync import SheetSink, get_client
+from src.store import SheetsMirror, get_sinks
+from src.metrics import bar_metrics
+from src.portfolio import price_matrices, run_portfolio, portfolio_stats
+from src.serialize import serialize_frame
+from src.ml_model import prepare_features, predict_next_day, get_registry, TRAIN_START, TRAIN_END
+from src.pipeline import Stage, Pipeline, MarketCalendar, run_daemon, record_run, run_summary, fingerprint
+from src import instrument
+
+# backtesting and the sklearn training stack are imported by the stages that use them, so
+# a single command (e.g. `predict` from cron) only pays for what it runs. Importing this
+# module creates no files or folders.
+TICKERS = ["RELIANCE.NS", "TCS.NS", "INFY.NS"]
+START_DATE = "2022-01-01"
+END_DATE = "2025-06-24"
+BACKTEST_LOG_DIR = "trade_logs"
+BACKTEST_START = "2020-01-01"
+PIPELINE_STATE = "pipeline_state.json"
 
+# Google Sheets
+SHEETS_KEY = "src/algo_sheets_api.json"
+SHEET_NAME = "Algo_Trading_Sheets"
+WORKSHEETS = {"ingested": "Ingested_Data", "summary": "Summary", "buy_signals": "Buy_Signals"}
+SHEET_KEYS = {"ingested": ("Ticker", "Date"), "summary": ("Ticker",), "buy_signals": ("Ticker", "Date")}
 
 
-# Create logs folder for backtest results
-BACKTEST_LOG_DIR = "trade_logs"
-os.makedirs(BACKTEST_LOG_DIR, exist_ok=True)
+def sanitize_dataframe(df, debug=False):
+    """
+    Column-wise cleanup for Sheets: NaN/inf -> None, floats rounded to 4 places,
+    timestamps as strings. Rows that can't be sent as JSON are dropped.
+    """
+    header, rows = serialize_frame(df, debug=debug)
+    return pd.DataFrame(rows, columns=header, dtype=object)
 
 
-def sanitize_dataframe(df, debug=False):
-    def clean_value(val):
-        if isinstance(val, float):
-            if np.isnan(val) or np.isinf(val) or abs(val) > 1e308:
-                return None
-            return round(val, 4)
-        elif isinstance(val, (np.integer, int)):
-            return int(val)
-        elif isinstance(val, (np.floating,)):
-            return round(float(val), 4)
-        elif isinstance(val, pd.Timestamp):
-            return val.strftime("%Y-%m-%d %H:%M:%S")
-        return val
-
-    cleaned_df = df.astype(object).applymap(clean_value)
-
-    if debug:
-        valid_rows = []
-        for i, row in cleaned_df.iterrows():
-            try:
-                json.dumps(row.to_dict(), allow_nan=False)
-                valid_rows.append(row)
-            except ValueError:
-                print(f"\n Invalid JSON in row {i}:", row.to_dict())
-        cleaned_df = pd.DataFrame(valid_rows)
-
-    return cleaned_df.reset_index(drop=True)
-
-
-# --- Custom Strategy for Backtesting ---
-class MyStrategy(Strategy):
-    def init(self):
-        close = pd.Series(self.data.Close, index=self.data.index)
-        self.rsi = self.I(ta.rsi, close, length=14)
-        self.sma20 = self.I(SMA, close, 20)
-        self.sma50 = self.I(SMA, close, 50)
-
-    def next(self):
-        if pd.isna(self.rsi[-1]) or pd.isna(self.sma20[-1]) or pd.isna(self.sma50[-1]):
-            return
-        if self.rsi[-1] < 30 and crossover(self.sma20, self.sma50):
-            self.buy()
-        elif self.position.is_long and crossover(self.sma50, self.sma20):
-            self.position.close()
-
-
-def run_backtest(ticker):
+def run_backtest(ticker, df=None):
+    from backtesting import Backtest
+    from src.backtest import BotStrategy, TRADE_LOG_KEYS
+
     print(f"\n Backtesting {ticker}")
-    df = fetch_data(ticker, "2020-01-01", "2025-06-24")
+    if df is None:
+        df = fetch_data(ticker, BACKTEST_START, "2025-06-24")
 
     df = df.rename(columns={"Date": "datetime"})
     df = df[["datetime", "Open", "High", "Low", "Close", "Volume"]]
     df["datetime"] = pd.to_datetime(df["datetime"])
     df.set_index("datetime", inplace=True)
 
-    bt = Backtest(df, MyStrategy, cash=10000, commission=0.002, exclusive_orders=True)
-    stats = bt.run()
+    bt = Backtest(df, BotStrategy, cash=10000, commission=0.002, exclusive_orders=True)
+    with instrument.span("Backtest.run", ticker=ticker):
+        stats = bt.run()
     print(f"\n {ticker} Backtest Summary:\n{stats}")
 
     trades = stats._trades
-    trade_log_path = os.path.join(BACKTEST_LOG_DIR, f"{ticker}_trade_log.csv")
-    trades.to_csv(trade_log_path, index=False)
-    print(f" Trade log saved to: {trade_log_path}")
-
-
-def main():
-    tickers = ["RELIANCE.NS", "TCS.NS", "INFY.NS"]
-    start_date = "2022-01-01"
-    end_date = "2025-06-24"
-    json_path = "src/algo_sheets_api.json"
-    sheet_name = "Algo_Trading_Sheets"
-    data_sheet = "Ingested_Data"
-    summary_sheet = "Summary"
-    signal_sheet = "Buy_Signals"
-
-    # --- 1. Fetch Data ---
-    all_data = fetch_data(tickers, start=start_date, end=end_date)
-
-    # --- 2. Add Profit Columns ---
-    all_data["Buy_Price"] = all_data["Open"]
-    all_data["Sell_Price"] = all_data["Close"]
-    all_data["Profit"] = all_data["Sell_Price"] - all_data["Buy_Price"]
-
-    # --- 3. Log Trade Data ---
-    log_to_named_sheet(sheet_name, data_sheet, sanitize_dataframe(all_data), json_path)
-
-    # --- 4. Generate Summary ---
-    summary_list = []
-    for ticker, df in all_data.groupby("Ticker"):
-        total_trades = len(df)
-        win_trades = (df["Profit"] > 0).sum()
-        loss_trades = (df["Profit"] <= 0).sum()
-        total_profit = df["Profit"].sum()
-        avg_profit = df["Profit"].mean()
-        win_ratio = round((win_trades / total_trades) * 100, 2) if total_trades > 0 else 0.0
-
-        summary_list.append({
-            "Ticker": ticker,
-            "Total Trades": total_trades,
-            "Winning Trades": win_trades,
-            "Losing Trades": loss_trades,
-            "Total Profit": round(total_profit, 2),
-            "Average Profit": round(avg_profit, 2),
-            "Win Ratio (%)": win_ratio
-        })
-
-    summary_df = pd.DataFrame(summary_list)
-    log_to_named_sheet(sheet_name, summary_sheet, sanitize_dataframe(summary_df), json_path)
-
-    # --- 5. Generate Buy Signals ---
-    signal_df = get_signals_for_tickers(tickers, start_date, end_date, rsi_threshold=30)
-    signal_df["Date"] = pd.to_datetime(signal_df["Date"]).dt.strftime("%Y-%m-%d")
-    buy_signals = signal_df[signal_df["signal"] == 1][["Ticker", "Date", "Close", "RSI", "SMA20", "SMA50", "signal"]]
-    buy_signals = buy_signals.dropna(subset=["SMA20", "SMA50"])
-
-    if not buy_signals.empty:
-        log_to_named_sheet(sheet_name, signal_sheet, sanitize_dataframe(buy_signals, debug=True), json_path)
-    else:
-        print("⚠️ No Buy Signals found to log.")
-    # --- 6. Train ML Models ---
-    for ticker in tickers:
-        print(f"\n Training ML model for {ticker}...")
-        df = fetch_and_prepare(ticker)
-        train_model(df, ticker)
-
-    # --- 6.1 Predict Next Signal ---
-    for ticker in tickers:
-        print(f"\n Predicting next signal for {ticker} using ML model...")
-        try:
-            pred, prob = predict_next_signal(ticker)
+    get_sinks().replace("trade_log", trades.assign(Strategy="BotStrategy", Ticker=ticker), keys=TRADE_LOG_KEYS,
+                        scope={"Strategy": "BotStrategy", "Ticker": ticker})
+    print(f" Trade log saved to: {BACKTEST_LOG_DIR}/{ticker}_trade_log.csv and the results store")
+    return trades
+
+
+# --- DAG stages ---
+def build_pipeline(tickers, start_date, end_date, sinks, state_path=PIPELINE_STATE, max_workers=4):
+    """
+    The bot as a DAG. Per ticker: fetch (always runs, cheap through the OHLCV cache) ->
+    signals / backtest / predict; training and the universe-wide ingest, summary and
+    portfolio stages join the branches. Every other stage reruns only when its inputs
+    (new bars, a retrained model) changed since the last run.
+    """
+    def fetch(ticker):
+        def run(inputs):
+            bars = fetch_data(ticker, BACKTEST_START, end_date)
+            return {f"bars:{ticker}": bars.reset_index(drop=True)}
+        return run
+
+    def in_window(bars):
+        return bars[bars["Date"] >= pd.Timestamp(start_date)].reset_index(drop=True)
+
+    def signals(ticker):
+        def run(inputs):
+            df = generate_signals(in_window(inputs[f"bars:{ticker}"]), rsi_threshold=30, ticker=ticker)
+            df["Date"] = pd.to_datetime(df["Date"]).dt.strftime("%Y-%m-%d")
+            buy_signals = df[df["signal"] == 1][["Ticker", "Date", "Close", "RSI", "SMA20", "SMA50", "signal"]]
+            buy_signals = buy_signals.dropna(subset=["SMA20", "SMA50"])
+            if not buy_signals.empty:
+                sinks.write("buy_signals", buy_signals, keys=("Ticker", "Date"))
+            return {f"signals:{ticker}": buy_signals}
+        return run
+
+    def backtest(ticker):
+        def run(inputs):
+            return {f"trades:{ticker}": run_backtest(ticker, inputs[f"bars:{ticker}"])}
+        return run
+
+    def predict(ticker):
+        def run(inputs):
+            # Features of the latest fetched bar (same history start as training), so the
+            # stored prediction belongs to the bar it is labelled with
+            bars = inputs[f"bars:{ticker}"]
+            latest_row = prepare_features(bars[bars["Date"] >= pd.Timestamp(TRAIN_START)].copy(), ticker).iloc[-1]
+            pred, prob = predict_next_day(latest_row, ticker)
             signal_type = "📈 BUY" if pred == 1 else "📉 SELL/HOLD"
             print(f" Prediction for {ticker}: {signal_type} (Confidence: {round(prob*100, 2)}%)")
-        except Exception as e:
-            print(f" Prediction failed for {ticker}: {e}")
-
-
-    # --- 7. Run Backtests ---
-    for ticker in tickers:
-        run_backtest(ticker)
+            latest = latest_row["Date"]
+            prediction = pd.DataFrame([{"Ticker": ticker, "Date": latest, "Prediction": int(pred),
+                                        "Probability": float(prob)}])
+            sinks.write("predictions", prediction, keys=("Ticker", "Date"))
+            return {f"prediction:{ticker}": prediction}
+        return run
+
+    def train(inputs):
+        from src.training import train_models
+
+        print(f"\n Training ML models for {len(tickers)} tickers...")
+        # Fixed runs train on TRAIN_END's window, before the signal window; the daemon trains
+        # up to the latest bar. Tickers whose training data is unchanged are skipped.
+        train_models(tickers, end=TRAIN_END if end_date is not None else None)
+        return {f"model:{t}": get_registry().signature(t) for t in tickers}
+
+    def universe(inputs):
+        return pd.concat([inputs[f"bars:{t}"] for t in tickers], ignore_index=True)
+
+    def ingest(inputs):
+        all_data = in_window(universe(inputs))
+        all_data["Buy_Price"] = all_data["Open"]
+        all_data["Sell_Price"] = all_data["Close"]
+        all_data["Profit"] = all_data["Sell_Price"] - all_data["Buy_Price"]
+        sinks.write("ingested", all_data, keys=("Ticker", "Date"))
+        return {"ingested": fingerprint(all_data)}
+
+    def summary(inputs):
+        stored = sinks.read("ingested", tickers=tickers, start=start_date, end=end_date)
+        summary_df = bar_metrics(stored)
+        sinks.write("summary", summary_df, keys=("Ticker",))
+        return {"summary": summary_df}
+
+    def portfolio(inputs):
+        index, names, open_matrix, close_matrix = price_matrices(universe(inputs))
+        curve, portfolio_trades = run_portfolio(index, names, open_matrix, close_matrix,
+                                                cash=10000 * len(tickers), max_positions=len(tickers))
+        print(f"\n Portfolio Backtest Summary:\n{portfolio_stats(curve, portfolio_trades)}")
+        sinks.replace("portfolio_trades", portfolio_trades, keys=("Ticker", "EntryTime"))  # whole run
+        return {"portfolio": portfolio_trades}
+
+    all_bars = [f"bars:{t}" for t in tickers]
+    stages = [
+        Stage("ingest", ingest, inputs=all_bars, outputs=["ingested"]),
+        Stage("summary", summary, inputs=["ingested"], outputs=["summary"]),
+        Stage("train", train, inputs=all_bars, outputs=[f"model:{t}" for t in tickers]),
+        Stage("portfolio", portfolio, inputs=all_bars, outputs=["portfolio"]),
+    ]
+    for t in tickers:
+        stages += [
+            Stage(f"fetch:{t}", fetch(t), outputs=[f"bars:{t}"], cache=False),
+            Stage(f"signals:{t}", signals(t), inputs=[f"bars:{t}"], outputs=[f"signals:{t}"]),
+            Stage(f"backtest:{t}", backtest(t), inputs=[f"bars:{t}"], outputs=[f"trades:{t}"]),
+            Stage(f"predict:{t}", predict(t), inputs=[f"bars:{t}", f"model:{t}"], outputs=[f"prediction:{t}"]),
+        ]
+    return Pipeline(stages, state_path=state_path, max_workers=max_workers)
+
+
+# --- Commands ---
+# command -> stages it runs (plus everything they depend on); None runs the whole DAG
+COMMANDS = {
+    "run": lambda tickers: None,
+    "fetch": lambda tickers: [f"fetch:{t}" for t in tickers],
+    "signals": lambda tickers: [f"signals:{t}" for t in tickers],
+    "train": lambda tickers: ["train"],
+    "predict": lambda tickers: [f"predict:{t}" for t in tickers],
+    "backtest": lambda tickers: [f"backtest:{t}" for t in tickers] + ["portfolio"],
+}
+COMMAND_HELP = {
+    "run": "the whole pipeline, mirrored to Google Sheets (default)",
+    "fetch": "refresh the OHLCV cache",
+    "signals": "scan for buy signals",
+    "train": "retrain models whose training data changed",
+    "predict": "next-day prediction per ticker",
+    "backtest": "per-ticker and portfolio backtests",
+    "sync": "push stored ingested / summary / signal rows to Google Sheets",
+}
+
+
+def sheets_mirror(json_path=SHEETS_KEY):
+    return SheetsMirror(SheetSink(get_client(json_path)), SHEET_NAME, WORKSHEETS)
+
+
+def sync_sheets(sinks, mirror, tickers):
+    """
+    Mirrors the stored tables to Sheets; the sheet sink only sends new or changed rows.
+    """
+    for table, keys in SHEET_KEYS.items():
+        df = sinks.read(table, tickers=tickers)
+        if df.empty:
+            print(f" Nothing stored for {table} yet")
+            continue
+        mirror.write(table, df, keys)
+        print(f" Synced {table}: {len(df)} rows -> {WORKSHEETS[table]}")
+
+
+def main(command="run", tickers=None, daemon=False, force=False, trace=None, profile=False):
+    tickers = list(tickers or TICKERS)
+    end_date = None if daemon else END_DATE  # the daemon always extends to the latest bar
+    sinks = get_sinks()
+    if command == "sync":
+        sync_sheets(sinks, sheets_mirror(), tickers)
+        return
+    if command == "run":
+        sinks.add_mirror(sheets_mirror())
+
+    # Optional instrumentation: per-run span summary + Chrome trace (+ folded stacks) in `trace`
+    if trace:
+        instrument.enable()
+        instrument.reset()
+    profiler = instrument.SamplingProfiler().start() if trace and profile else None
+
+    def finish(report):
+        run_id = record_run(sinks, report)
+        if trace:
+            instrument.export(os.path.join(trace, run_id))
+            if profiler:
+                profiler.export_collapsed(os.path.join(trace, f"{run_id}.folded.txt"))
+                profiler.stacks.clear()
+            print(instrument.get_recorder().summary().head(10).to_string(index=False))
+            instrument.reset()
+
+    pipeline = build_pipeline(tickers, START_DATE, end_date, sinks)
+    if daemon:
+        # Runs after every NSE close; stage timings and skip counts go to the store
+        run_daemon(pipeline, MarketCalendar(), on_run=finish)
+        return
+
+    report = pipeline.run(force=force, only=COMMANDS[command](tickers))
+    finish(report)
+    if profiler:
+        profiler.stop()
+    print(f"\n Pipeline run: {run_summary(report)}")
+    print(report[["Stage", "Status", "Seconds", "Error"]].to_string(index=False))
+
+
+def _add_options(parser, default=None):
+    """
+    Options shared by every command. Subcommands pass argparse.SUPPRESS so options given
+    before the command name are not reset by the subcommand's defaults.
+    """
+    def value(fallback):
+        return fallback if default is None else default
+
+    parser.add_argument("--tickers", nargs="+", default=value(TICKERS), help="tickers to process")
+    parser.add_argument("--force", action="store_true", default=value(False),
+                        help="rerun every stage, even if its inputs are unchanged")
+    parser.add_argument("--trace", metavar="DIR", default=value(None),
+                        help="record timing spans and write per-run traces to DIR")
+    parser.add_argument("--profile", action="store_true", default=value(False),
+                        help="with --trace, also run the sampling profiler")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Algo-trading bot")
+    _add_options(parser)
+    parser.add_argument("--daemon", action="store_true", help="keep running, once per trading day after the close")
+    commands = parser.add_subparsers(dest="command", metavar="command")
+    for name, help_text in COMMAND_HELP.items():
+        sub = commands.add_parser(name, help=help_text, description=help_text)
+        _add_options(sub, default=argparse.SUPPRESS)
+        if name == "run":
+            sub.add_argument("--daemon", action="store_true", default=argparse.SUPPRESS,
+                             help="keep running, once per trading day after the close")
+    args = parser.parse_args(argv)
+    args.command = args.command or "run"
+    if args.daemon and args.command != "run":
+        parser.error("--daemon only applies to the run command")
+    return args
 
 
 if __name__ == "__main__":
-    main()
+    args = parse_args()
+    main(args.command, tickers=args.tickers, daemon=args.daemon, force=args.force,
+         trace=args.trace, profile=args.profile)
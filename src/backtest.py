@@ -1,22 +1,26 @@
 import os
 import pandas as pd
-import pandas_ta as ta
 from backtesting import Backtest, Strategy
-from backtesting.test import SMA
 from backtesting.lib import crossover
 from src.ingestion import fetch_data
+from src.indicators import cached_indicator
+from src.store import get_sinks
+from src.instrument import span
 
-# Output folder for logs
+# Output folder for logs (created by the results store's CSV mirror on first write)
 OUTPUT_FOLDER = "trade_logs"
-os.makedirs(OUTPUT_FOLDER, exist_ok=True)
+TRADE_LOG_KEYS = ("Strategy", "Ticker", "EntryTime")  # one backtest run replaces its (Strategy, Ticker) rows
 
 
 class MyStrategy(Strategy):
+    verbose = False  # per-bar logging; keep off for long (e.g. minute) histories
+    oversold = 30  # RSI threshold; a Backtest.run(oversold=...) parameter
+
     def init(self):
-        close = pd.Series(self.data.Close, index=self.data.index)
-        self.rsi = self.I(ta.rsi, close, length=14)
-        self.sma20 = self.I(SMA, close, 20)
-        self.sma50 = self.I(SMA, close, 50)
+        close = self.data.Close
+        self.rsi = self.I(cached_indicator, "rsi", close, length=14, name="rsi(14)")
+        self.sma20 = self.I(cached_indicator, "sma", close, length=20, name="SMA(20)")
+        self.sma50 = self.I(cached_indicator, "sma", close, length=50, name="SMA(50)")
         self.oversold_flag = False
 
     def next(self):
@@ -24,25 +28,42 @@ class MyStrategy(Strategy):
             return
 
         # Step 1: Monitor RSI condition
-        if self.rsi[-1] < 30:
+        if self.rsi[-1] < self.oversold:
             self.oversold_flag = True
-            print(f" RSI below 30 at {self.data.index[-1]}")
+            if self.verbose:
+                print(f" RSI below {self.oversold} at {self.data.index[-1]}")
 
-        # Step 2: Buy when crossover happens after RSI < 30
+        # Step 2: Buy when crossover happens after RSI < oversold
         if self.oversold_flag and crossover(self.sma20, self.sma50):
-            print(f"✅ BUY at {self.data.index[-1]} | RSI: {self.rsi[-1]:.2f}")
+            if self.verbose:
+                print(f"✅ BUY at {self.data.index[-1]} | RSI: {self.rsi[-1]:.2f}")
             self.buy()
             self.oversold_flag = False  # Reset after buying
 
         # Step 3: Sell condition
         elif self.position.is_long and crossover(self.sma50, self.sma20):
-            print(f"🔻 SELL at {self.data.index[-1]}")
+            if self.verbose:
+                print(f"🔻 SELL at {self.data.index[-1]}")
+            self.position.close()
+
+
+class BotStrategy(MyStrategy):
+    """
+    run_trading_bot's rules: buys only when RSI < oversold on the crossover bar itself (no latch).
+    """
+
+    def next(self):
+        if pd.isna(self.rsi[-1]) or pd.isna(self.sma20[-1]) or pd.isna(self.sma50[-1]):
+            return
+        if self.rsi[-1] < self.oversold and crossover(self.sma20, self.sma50):
+            self.buy()
+        elif self.position.is_long and crossover(self.sma50, self.sma20):
             self.position.close()
 
 
-def run_and_log(ticker):
+def run_and_log(ticker, start="2024-01-01", end="2025-06-20"):
     print(f"\n Running backtest for {ticker}")
-    df = fetch_data(ticker, "2024-01-01", "2025-06-20")
+    df = fetch_data(ticker, start, end)
 
     # Format the DataFrame correctly
     df = df.rename(columns={"Date": "datetime"})
@@ -51,14 +72,15 @@ def run_and_log(ticker):
     df.set_index("datetime", inplace=True)
 
     bt = Backtest(df, MyStrategy, cash=10000, commission=0.002, exclusive_orders=True)
-    stats = bt.run()
+    with span("Backtest.run", ticker=ticker):
+        stats = bt.run()
     print(f"\n {ticker} Performance Summary:\n{stats}")
 
-    # Save trade log
+    # Save trade log (results store, mirrored to trade_logs/)
     trades = stats._trades
-    log_path = os.path.join(OUTPUT_FOLDER, f"{ticker}_trade_log.csv")
-    trades.to_csv(log_path, index=False)
-    print(f" Saved trade log: {log_path}")
+    get_sinks().replace("trade_log", trades.assign(Strategy="MyStrategy", Ticker=ticker), keys=TRADE_LOG_KEYS,
+                        scope={"Strategy": "MyStrategy", "Ticker": ticker})
+    print(f" Saved trade log: {os.path.join(OUTPUT_FOLDER, f'{ticker}_trade_log.csv')}")
     return stats, trades
 
 
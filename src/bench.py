@@ -0,0 +1,413 @@
+# bench.py
+
+import io
+import os
+import sys
+import json
+import time
+import argparse
+import warnings
+import platform
+import tempfile
+import contextlib
+import subprocess
+
+import numpy as np
+import pandas as pd
+
+from src.synthetic import synthetic_universe, synthetic_downloader
+
+RESULTS_DIR = "bench_results"
+
+# tickers x bars of the generated universe; `heavy` caps the tickers used by the per-ticker
+# cases that are slow by nature (training, event-driven backtest, cached fetch)
+SCALES = {
+    "small": {"tickers": 5, "bars": 1_000, "heavy": 2},
+    "medium": {"tickers": 20, "bars": 5_000, "heavy": 4},
+    "large": {"tickers": 100, "bars": 10_000, "heavy": 8},
+}
+PREDICT_CALLS = 200  # predict_next_day calls per heavy ticker
+
+
+# --- 1. Cases: setup(ctx) -> (run, rows processed per run) ---
+class Context:
+    """
+    One scale's synthetic universe plus a scratch directory shared by its cases.
+    """
+
+    def __init__(self, scale, tickers, bars, heavy, interval="1d", model="regime", seed=0, tmp=None):
+        self.scale = scale
+        self.interval = interval
+        self.model = model
+        self.seed = seed
+        self.tmp = tmp
+        self.long, self.frames = synthetic_universe(tickers, bars, interval, model, seed)
+        self.tickers = list(self.frames)
+        self.heavy = self.tickers[:heavy]
+        self._features = None
+
+    @property
+    def rows(self):
+        return len(self.long)
+
+    def features(self):
+        """
+        ML feature frames of the heavy tickers (built once, outside any timing).
+        """
+        if self._features is None:
+            from src.indicators import set_engine, IndicatorEngine
+            from src.ml_model import prepare_features
+
+            set_engine(IndicatorEngine())
+            self._features = {t: prepare_features(self.frames[t].copy(), t) for t in self.heavy}
+        return self._features
+
+
+def _cold_engine():
+    from src.indicators import set_engine, IndicatorEngine
+
+    set_engine(IndicatorEngine())
+
+
+def case_assemble(ctx):
+    from src.ingestion import _assemble
+
+    return lambda: _assemble(ctx.tickers, ctx.frames), ctx.rows
+
+
+def case_add_indicators(ctx):
+    from src.simple_strategy import add_indicators
+
+    def run():
+        _cold_engine()
+        for ticker, frame in ctx.frames.items():
+            add_indicators(frame.copy(), ticker=ticker)
+    return run, ctx.rows
+
+
+def case_generate_signals(ctx):
+    from src.simple_strategy import generate_signals
+
+    def run():
+        _cold_engine()
+        for ticker, frame in ctx.frames.items():
+            generate_signals(frame.copy(), ticker=ticker)
+    return run, ctx.rows
+
+
+def case_screener(ctx):
+    from src.screener import screen
+
+    return lambda: screen(ctx.long), ctx.rows
+
+
+def case_paper(ctx):
+    from src.paper import ReplayFeed, run_paper
+
+    feed = ReplayFeed(ctx.long)
+    return lambda: run_paper(feed), ctx.rows
+
+
+def case_prepare_features(ctx):
+    from src.ml_model import prepare_features
+
+    def run():
+        _cold_engine()
+        for ticker, frame in ctx.frames.items():
+            prepare_features(frame.copy(), ticker)
+    return run, ctx.rows
+
+
+def case_fetch_and_prepare(ctx):
+    """
+    fetch_data through a warmed OHLCV cache + feature building, over the fixed training window.
+    """
+    from src.data_cache import OHLCVCache
+    from src.ingestion import set_cache
+    from src.ml_model import fetch_and_prepare
+
+    set_cache(OHLCVCache(synthetic_downloader(ctx.model, ctx.seed), root=os.path.join(ctx.tmp, "data_cache")))
+    rows = sum(len(fetch_and_prepare(t)) for t in ctx.heavy)
+
+    def run():
+        _cold_engine()
+        for ticker in ctx.heavy:
+            fetch_and_prepare(ticker)
+    return run, rows
+
+
+def case_train_model(ctx):
+    from src.ml_model import train_model
+
+    features = ctx.features()
+    model_dir = os.path.join(ctx.tmp, "models")
+    os.makedirs(model_dir, exist_ok=True)
+
+    def run():
+        with contextlib.redirect_stdout(io.StringIO()):
+            for ticker, df in features.items():
+                train_model(df, ticker, model_dir=model_dir)
+    return run, sum(len(df) for df in features.values())
+
+
+def case_predict_next_day(ctx):
+    """
+    Per-call latency of predict_next_day on trained models (registry already warm).
+    """
+    from src import ml_model
+    from src.model_registry import ModelRegistry
+
+    features = ctx.features()
+    model_dir = os.path.join(ctx.tmp, "models")
+    os.makedirs(model_dir, exist_ok=True)
+    with contextlib.redirect_stdout(io.StringIO()):
+        for ticker, df in features.items():
+            ml_model.train_model(df, ticker, model_dir=model_dir)
+    registry = ModelRegistry(model_dir)
+    last_rows = {t: df.iloc[-1] for t, df in features.items()}
+
+    def run():
+        saved, ml_model._registry = ml_model._registry, registry
+        try:
+            for ticker, row in last_rows.items():
+                for _ in range(PREDICT_CALLS):
+                    ml_model.predict_next_day(row, ticker)
+        finally:
+            ml_model._registry = saved
+    run()  # loads the models
+    return run, PREDICT_CALLS * len(last_rows)
+
+
+def case_sanitize(ctx):
+    from run_trading_bot import sanitize_dataframe
+
+    return lambda: sanitize_dataframe(ctx.long), ctx.rows
+
+
+def case_backtest(ctx):
+    from backtesting import Backtest
+    from src.backtest import MyStrategy
+
+    def run():
+        _cold_engine()
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")  # "trades remain open" on every run
+            for ticker in ctx.heavy:
+                Backtest(ctx.frames[ticker], MyStrategy, cash=10000, commission=0.002, exclusive_orders=True).run()
+    return run, sum(len(ctx.frames[t]) for t in ctx.heavy)
+
+
+def case_vector_backtest(ctx):
+    from src.vector_backtest import run_vectorized
+
+    def run():
+        _cold_engine()
+        for ticker in ctx.heavy:
+            run_vectorized(ctx.frames[ticker])
+    return run, sum(len(ctx.frames[t]) for t in ctx.heavy)
+
+
+CASES = {
+    "ingest.assemble": case_assemble,
+    "signals.add_indicators": case_add_indicators,
+    "signals.generate_signals": case_generate_signals,
+    "signals.screener": case_screener,
+    "signals.paper_replay": case_paper,
+    "ml.prepare_features": case_prepare_features,
+    "ml.fetch_and_prepare": case_fetch_and_prepare,
+    "ml.train_model": case_train_model,
+    "ml.predict_next_day": case_predict_next_day,
+    "sheets.sanitize_dataframe": case_sanitize,
+    "backtest.MyStrategy": case_backtest,
+    "backtest.vectorized": case_vector_backtest,
+}
+
+
+# --- 2. Runner ---
+def time_case(run, repeat=3):
+    """
+    Calls `run` `repeat` times; returns the per-run wall times in seconds.
+    """
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - started)
+    return times
+
+
+def select_cases(patterns=None):
+    """
+    Case names matching any of `patterns` (exact name or prefix such as "ml"), in suite order.
+    """
+    if not patterns:
+        return list(CASES)
+    names = [name for name in CASES if any(name == p or name.startswith(p.rstrip(".") + ".") for p in patterns)]
+    if not names:
+        raise ValueError(f"No benchmark case matches {patterns}; known: {', '.join(CASES)}")
+    return names
+
+
+def run_suite(scales=("small",), cases=None, interval="1d", model="regime", seed=0, repeat=3):
+    """
+    Runs the selected cases at each scale. Returns one row per (scale, case) with min /
+    median seconds and rows per second (computed from the median).
+    """
+    rows = []
+    for scale in scales:
+        config = SCALES[scale]
+        with tempfile.TemporaryDirectory() as tmp:
+            ctx = Context(scale, config["tickers"], config["bars"], config["heavy"], interval, model, seed, tmp)
+            print(f"[{scale}] {len(ctx.tickers)} tickers x {config['bars']} {interval} bars ({ctx.rows:,} rows)")
+            for name in select_cases(cases):
+                run, n = CASES[name](ctx)
+                times = time_case(run, repeat)
+                median = float(np.median(times))
+                rows.append({"scale": scale, "case": name, "tickers": len(ctx.tickers), "bars": config["bars"],
+                             "rows": int(n), "repeat": repeat, "min_s": min(times), "median_s": median,
+                             "rows_per_s": n / median if median > 0 else None})
+                print(f"  {name:<28} {median:9.4f}s  ({n / median if median > 0 else float('inf'):,.0f} rows/s)")
+    return pd.DataFrame(rows)
+
+
+# --- 3. Results (JSON, comparable across commits) ---
+def _git(*args):
+    try:
+        return subprocess.run(["git", *args], capture_output=True, text=True, timeout=10).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return ""
+
+
+def environment():
+    versions = {}
+    for module in ("numpy", "pandas", "sklearn", "backtesting"):
+        try:
+            versions[module] = __import__(module).__version__
+        except Exception:
+            versions[module] = None
+    return {"commit": _git("rev-parse", "--short", "HEAD") or None,
+            "dirty": bool(_git("status", "--porcelain", "--untracked-files=no")),
+            "python": platform.python_version(), "platform": platform.platform(),
+            "cpus": os.cpu_count(), "versions": versions}
+
+
+def save_results(results, config, out_dir=RESULTS_DIR):
+    """
+    Writes `{out_dir}/{timestamp}_{commit}.json` and returns its path.
+    """
+    env = environment()
+    os.makedirs(out_dir, exist_ok=True)
+    stamp = pd.Timestamp.now().strftime("%Y%m%d-%H%M%S")
+    path = os.path.join(out_dir, f"{stamp}_{env['commit'] or 'nogit'}.json")
+    with open(path, "w") as f:
+        json.dump({"created": pd.Timestamp.now().isoformat(), **env, "config": config,
+                   "results": results.to_dict(orient="records")}, f, indent=2)
+    return path
+
+
+def load_results(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def compare(old, new):
+    """
+    Old vs new median seconds per (scale, case) from two result files (paths or loaded dicts).
+    Change is relative to old: negative is faster.
+    """
+    old, new = (load_results(r) if isinstance(r, str) else r for r in (old, new))
+    keys = ["scale", "case"]
+    merged = pd.DataFrame(old["results"])[keys + ["median_s"]].merge(
+        pd.DataFrame(new["results"])[keys + ["median_s"]], on=keys, suffixes=("_old", "_new"))
+    merged["change_pct"] = (merged["median_s_new"] / merged["median_s_old"] - 1) * 100
+    return merged.rename(columns={"median_s_old": f"old ({old.get('commit')})",
+                                  "median_s_new": f"new ({new.get('commit')})"})
+
+
+# --- 4. Import-time budget ---
+# Entry-point module -> allowed import seconds on top of `import pandas` (every module needs it)
+IMPORT_BUDGET = {
+    "run_trading_bot": 0.5,
+    "src.jobs": 0.3,
+    "src.ml_model": 0.3,
+    "src.ingestion": 0.3,
+    "src.sheets_logger": 0.3,
+}
+# Loaded only by the code paths that use them, never by importing an entry point
+LAZY_MODULES = ("sklearn", "backtesting", "matplotlib", "gspread", "oauth2client", "yfinance", "joblib")
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def import_time(module, repeat=3):
+    """
+    Best-of-`repeat` seconds to import `module` in a fresh interpreter, and the lazy
+    modules that import pulled in.
+    """
+    code = ("import sys, time, json; t = time.perf_counter(); import {m}; elapsed = time.perf_counter() - t; "
+            "print(json.dumps([elapsed, sorted(n for n in {lazy!r} if n in sys.modules)]))"
+            ).format(m=module, lazy=LAZY_MODULES)
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [ROOT, os.environ.get("PYTHONPATH")])))
+    best, loaded = float("inf"), []
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, cwd=ROOT, env=env)
+        if out.returncode != 0:
+            raise RuntimeError(f"import {module} failed:\n{out.stderr.strip()}")
+        elapsed, loaded = json.loads(out.stdout.strip().splitlines()[-1])
+        best = min(best, elapsed)
+    return best, loaded
+
+
+def check_imports(budget=IMPORT_BUDGET, repeat=3):
+    """
+    Import time of each entry point against its budget. A module fails when it exceeds
+    `pandas + budget` seconds or loads any of LAZY_MODULES.
+    """
+    baseline, _ = import_time("pandas", repeat)
+    rows = []
+    for module, allowed in budget.items():
+        seconds, loaded = import_time(module, repeat)
+        rows.append({"module": module, "seconds": seconds, "over_pandas_s": seconds - baseline,
+                     "budget_s": allowed, "lazy_loaded": ",".join(loaded),
+                     "ok": seconds - baseline <= allowed and not loaded})
+    return pd.DataFrame(rows)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline benchmark suite on synthetic market data.")
+    parser.add_argument("--scales", nargs="+", default=["small"], choices=list(SCALES))
+    parser.add_argument("--cases", nargs="+", help="case names or prefixes (e.g. ml signals.generate_signals)")
+    parser.add_argument("--interval", default="1d", help='bar interval, e.g. "1d", "15m", "1h"')
+    parser.add_argument("--model", default="regime", choices=["gbm", "regime"])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--out", default=RESULTS_DIR)
+    parser.add_argument("--compare", nargs="+", metavar="RESULT",
+                        help="compare this run with RESULT, or two result files without running")
+    parser.add_argument("--list", action="store_true", help="list the cases and exit")
+    parser.add_argument("--imports", action="store_true",
+                        help="check entry-point import times against IMPORT_BUDGET (exit 1 on failure)")
+    args = parser.parse_args(argv)
+
+    if args.imports:
+        report = check_imports()
+        print(report.to_string(index=False))
+        return 0 if report["ok"].all() else 1
+
+    if args.list:
+        print("\n".join(CASES))
+        return
+    if args.compare and len(args.compare) == 2:
+        print(compare(*args.compare).to_string(index=False))
+        return
+
+    config = {"scales": {s: SCALES[s] for s in args.scales}, "interval": args.interval,
+              "model": args.model, "seed": args.seed, "repeat": args.repeat}
+    results = run_suite(args.scales, args.cases, args.interval, args.model, args.seed, args.repeat)
+    path = save_results(results, config, args.out)
+    print(f"Saved: {path}")
+    if args.compare:
+        print(compare(args.compare[0], path).to_string(index=False))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
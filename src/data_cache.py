@@ -0,0 +1,201 @@
+# data_cache.py
+
+import os
+import json
+import threading
+import pandas as pd
+
+CACHE_DIR = "data_cache"
+OHLCV_COLS = ['Open', 'High', 'Low', 'Close', 'Volume']
+
+
+def _day(value):
+    return pd.Timestamp(value).tz_localize(None).normalize()
+
+
+def missing_ranges(coverage, start, end):
+    """
+    Returns the [start, end) gaps of the requested range not covered by `coverage`.
+    `coverage` is a sorted list of non-overlapping (start, end) Timestamp pairs.
+    """
+    gaps = []
+    cursor = start
+    for cov_start, cov_end in coverage:
+        if cov_end <= cursor:
+            continue
+        if cov_start >= end:
+            break
+        if cov_start > cursor:
+            gaps.append((cursor, min(cov_start, end)))
+        cursor = max(cursor, cov_end)
+        if cursor >= end:
+            break
+    if cursor < end:
+        gaps.append((cursor, end))
+    return gaps
+
+
+def merge_ranges(ranges):
+    """
+    Merges overlapping or touching (start, end) pairs into a sorted list.
+    """
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+class OHLCVCache:
+    """
+    On-disk Parquet store of OHLCV bars, one partition per (interval, ticker).
+
+    Each partition keeps a JSON sidecar with the date ranges already downloaded,
+    so only the missing gaps of a request go to the downloader. The downloader is
+    any callable `(tickers, start, end, interval) -> DataFrame` returning the long
+    `Date/Ticker/Open/High/Low/Close/Volume` format used by `fetch_data`; tickers
+    listed in `df.attrs["failed"]` are left uncovered so the next call retries them.
+
+    Downloads of different partitions run concurrently: each (ticker, interval) has
+    its own lock, held while its gaps are re-checked, downloaded and merged, and the
+    shared lock only guards the lock table and the stats.
+    """
+
+    def __init__(self, downloader, root=CACHE_DIR):
+        self.downloader = downloader
+        self.root = root
+        self.stats = {"hits": 0, "misses": 0, "downloads": 0,
+                      "bytes_read": 0, "bytes_written": 0}
+        self._lock = threading.Lock()
+        self._partition_locks = {}
+
+    def _count(self, stat, n=1):
+        with self._lock:
+            self.stats[stat] += n
+
+    def _locks_for(self, tickers, interval):
+        # Always acquired in sorted order, so overlapping ticker groups cannot deadlock
+        with self._lock:
+            return [self._partition_locks.setdefault((ticker, interval), threading.Lock())
+                    for ticker in sorted(set(tickers))]
+
+    # --- Partition layout ---
+    def _paths(self, ticker, interval):
+        folder = os.path.join(self.root, interval)
+        name = ticker.replace(os.sep, "_")
+        return os.path.join(folder, f"{name}.parquet"), os.path.join(folder, f"{name}.json")
+
+    def coverage(self, ticker, interval="1d"):
+        _, meta_path = self._paths(ticker, interval)
+        if not os.path.exists(meta_path):
+            return []
+        with open(meta_path) as f:
+            meta = json.load(f)
+        return [(pd.Timestamp(s), pd.Timestamp(e)) for s, e in meta["coverage"]]
+
+    def _read(self, ticker, interval):
+        data_path, _ = self._paths(ticker, interval)
+        if not os.path.exists(data_path):
+            return pd.DataFrame(columns=OHLCV_COLS, index=pd.DatetimeIndex([], name="Date"))
+        self._count("bytes_read", os.path.getsize(data_path))
+        return pd.read_parquet(data_path)
+
+    def _write(self, ticker, interval, data, coverage):
+        data_path, meta_path = self._paths(ticker, interval)
+        os.makedirs(os.path.dirname(data_path), exist_ok=True)
+
+        tmp_path = data_path + ".tmp"
+        data.to_parquet(tmp_path)
+        os.replace(tmp_path, data_path)
+        self._count("bytes_written", os.path.getsize(data_path))
+
+        meta = {"ticker": ticker, "interval": interval, "rows": len(data),
+                "coverage": [[s.isoformat(), e.isoformat()] for s, e in coverage]}
+        with open(meta_path + ".tmp", "w") as f:
+            json.dump(meta, f, indent=2)
+        os.replace(meta_path + ".tmp", meta_path)
+
+    # --- Public API ---
+    def get(self, tickers, start, end=None, interval="1d"):
+        """
+        Returns bars for `tickers` in [start, end), downloading only uncovered gaps.
+        """
+        if isinstance(tickers, str):
+            tickers = [tickers]
+
+        today = pd.Timestamp.today().normalize()
+        start = _day(start)
+        end = _day(end) if end is not None else today + pd.Timedelta(days=1)
+
+        # Group tickers sharing the same gap so each gap is one download call
+        pending = {}
+        for ticker in tickers:
+            gaps = missing_ranges(self.coverage(ticker, interval), start, end)
+            self._count("misses" if gaps else "hits")
+            for gap in gaps:
+                pending.setdefault(gap, []).append(ticker)
+
+        for (gap_start, gap_end), gap_tickers in pending.items():
+            locks = self._locks_for(gap_tickers, interval)
+            for lock in locks:
+                lock.acquire()
+            try:
+                # Another thread may have filled the gap while we waited for the locks
+                gap_tickers = [t for t in gap_tickers
+                               if missing_ranges(self.coverage(t, interval), gap_start, gap_end)]
+                if gap_tickers:
+                    self._fill_gap(gap_tickers, gap_start, gap_end, interval, today)
+            finally:
+                for lock in locks:
+                    lock.release()
+
+        frames = []
+        for ticker in tickers:
+            data = self._read(ticker, interval)
+            data = data[(data.index >= start) & (data.index < end)]
+            frames.append(data.assign(Ticker=ticker).rename_axis("Date").reset_index())
+
+        final_df = pd.concat(frames, ignore_index=True)
+        return final_df[['Date', 'Ticker'] + OHLCV_COLS]
+
+    def _fill_gap(self, tickers, start, end, interval, today):
+        new_data = self.downloader(tickers, start, end, interval)
+        self._count("downloads")
+        failed = set(new_data.attrs.get("failed", ()))
+
+        # Today's bar is still forming, so it is never marked as covered
+        covered_end = min(end, today)
+
+        for ticker in tickers:
+            if ticker in failed:
+                continue
+
+            # An empty answer to a successful download (weekend, holiday) is still covered
+            rows = new_data[new_data["Ticker"] == ticker]
+            rows = rows.set_index(pd.DatetimeIndex(rows["Date"], name="Date"))[OHLCV_COLS]
+            existing = self._read(ticker, interval)
+            if rows.empty:
+                merged = existing
+            elif existing.empty:
+                merged = rows.sort_index()
+            else:
+                merged = pd.concat([existing, rows])
+                merged = merged[~merged.index.duplicated(keep="last")].sort_index()
+
+            coverage = self.coverage(ticker, interval)
+            if start < covered_end:
+                coverage = merge_ranges(coverage + [(start, covered_end)])
+            self._write(ticker, interval, merged, coverage)
+
+    def clear(self, ticker=None, interval="1d"):
+        """
+        Removes one partition, or every partition of `interval` if no ticker is given.
+        """
+        folder = os.path.join(self.root, interval)
+        if not os.path.isdir(folder):
+            return
+        for name in os.listdir(folder):
+            if ticker is None or os.path.splitext(name)[0] == ticker.replace(os.sep, "_"):
+                os.remove(os.path.join(folder, name))
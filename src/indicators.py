@@ -0,0 +1,262 @@
+# indicators.py
+
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from src.instrument import traced, count
+
+_engine = None
+
+
+# --- 1. Indicator functions (same results as the pandas_ta defaults) ---
+def _frame(values):
+    values = np.asarray(values, dtype=np.float64)
+    return pd.DataFrame(values) if values.ndim == 2 else pd.Series(values)
+
+
+def _out(result):
+    return result.to_numpy()
+
+
+def _rma(values, length):
+    return values.ewm(alpha=1.0 / length, min_periods=length).mean()
+
+
+@traced()
+def rsi(close, length=14):
+    """
+    Wilder RSI, identical to `pandas_ta.rsi` (RMA = ewm(alpha=1/length, min_periods=length)).
+    Works on a 1-D array or column-wise on a (bars x tickers) 2-D array.
+    """
+    close = np.asarray(close, dtype=np.float64)
+    delta = np.full_like(close, np.nan)
+    delta[1:] = close[1:] - close[:-1]
+    # Only the smoothing needs pandas; the element-wise steps stay in NumPy (same values)
+    positive_avg = _out(_rma(_frame(np.maximum(delta, 0.0)), length))
+    negative_avg = _out(_rma(_frame(np.minimum(delta, 0.0)), length))
+    return 100 * positive_avg / (positive_avg + np.abs(negative_avg))
+
+
+@traced()
+def sma(close, length):
+    """
+    Simple moving average, identical to `backtesting.test.SMA` / `Series.rolling(length).mean()`.
+    """
+    return _out(_frame(close).rolling(length).mean())
+
+
+@traced()
+def ema(close, length=10):
+    """
+    EMA seeded with the SMA of the first `length` bars, like `pandas_ta.ema`.
+    """
+    values = _frame(close).copy()
+    seed = values.iloc[:length].mean()
+    values.iloc[:length - 1] = np.nan
+    values.iloc[length - 1] = seed
+    return _out(values.ewm(span=length, adjust=False).mean())
+
+
+@traced()
+def macd(close, fast=12, slow=26, signal=9):
+    """
+    Returns (macd, histogram, signal) like the MACD_/MACDh_/MACDs_ columns of `pandas_ta.macd`.
+    """
+    line = ema(close, fast) - ema(close, slow)
+    first = int(np.isnan(line).argmin())
+    signal_line = np.full_like(line, np.nan)
+    signal_line[first:] = ema(line[first:], signal)
+    return line, line - signal_line, signal_line
+
+
+@traced()
+def atr(high, low, close, length=14):
+    """
+    Average True Range with RMA smoothing, like `pandas_ta.atr`.
+    """
+    high, low, close = (np.asarray(x, dtype=np.float64) for x in (high, low, close))
+    high_low = high - low
+    if (high_low == 0).any():
+        high_low = high_low + np.finfo(float).eps
+    prev_close = np.concatenate(([np.nan], close[:-1]))
+    true_range = np.nanmax(np.abs(np.vstack([high_low, high - prev_close, prev_close - low])), axis=0)
+    true_range[:1] = np.nan
+    return _out(_rma(pd.Series(true_range), length))
+
+
+@traced()
+def bbands(close, length=5, std=2.0):
+    """
+    Returns (lower, mid, upper) Bollinger bands (population std), like `pandas_ta.bbands`.
+    """
+    values = _frame(close)
+    mid = values.rolling(length, min_periods=length).mean()
+    deviation = std * values.rolling(length, min_periods=length).std(ddof=0)
+    return _out(mid - deviation), _out(mid), _out(mid + deviation)
+
+
+@traced()
+def willr(high, low, close, length=14):
+    """
+    Williams %R, like `pandas_ta.willr`.
+    """
+    lowest_low = _frame(low).rolling(length, min_periods=length).min()
+    highest_high = _frame(high).rolling(length, min_periods=length).max()
+    return _out(100 * ((_frame(close) - lowest_low) / (highest_high - lowest_low) - 1))
+
+
+def crossover(series1, series2):
+    """
+    Boolean array, True on bars where `series1` just crossed above `series2`.
+    Vectorized form of `backtesting.lib.crossover` evaluated at every bar.
+    """
+    series1 = np.asarray(series1)
+    series2 = np.asarray(series2)
+    out = np.zeros(series1.shape, dtype=bool)
+    with np.errstate(invalid="ignore"):
+        out[1:] = (series1[:-1] < series2[:-1]) & (series1[1:] > series2[1:])
+    return out
+
+
+# name -> (function, input columns)
+INDICATORS = {
+    "rsi": (rsi, ("Close",)),
+    "sma": (sma, ("Close",)),
+    "ema": (ema, ("Close",)),
+    "macd": (macd, ("Close",)),
+    "atr": (atr, ("High", "Low", "Close")),
+    "bbands": (bbands, ("Close",)),
+    "willr": (willr, ("High", "Low", "Close")),
+}
+
+
+# --- 2. Memoizing engine ---
+class IndicatorEngine:
+    """
+    Computes indicators once per (ticker, interval, data version, indicator, params).
+
+    The data version is a hash of the input arrays, so any caller holding the same bars
+    (strategy, ML features, backtest) shares one result. Results live in an in-memory
+    LRU and, when `cache_dir` is set, in .npz files that survive restarts.
+    """
+
+    def __init__(self, max_entries=512, cache_dir=None):
+        self.max_entries = max_entries
+        self.cache_dir = cache_dir
+        self.stats = {"hits": 0, "disk_hits": 0, "misses": 0}
+        self._lru = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def data_version(*arrays):
+        digest = hashlib.blake2b(digest_size=12)
+        for values in arrays:
+            values = np.ascontiguousarray(values, dtype=np.float64)
+            digest.update(str(values.shape).encode())
+            digest.update(values.tobytes())
+        return digest.hexdigest()
+
+    def _disk_path(self, key):
+        ticker, interval, version, name, params = key
+        label = "-".join(f"{k}{v}" for k, v in params)
+        return os.path.join(self.cache_dir, ticker or "_", interval, f"{name}-{label}-{version}.npz")
+
+    def _lookup(self, key):
+        with self._lock:
+            if key in self._lru:
+                self._lru.move_to_end(key)
+                self.stats["hits"] += 1
+                count("indicators.memory_hits")
+                return self._lru[key]
+
+        if self.cache_dir and os.path.exists(self._disk_path(key)):
+            with np.load(self._disk_path(key)) as stored:
+                parts = [stored[f"arr_{i}"] for i in range(len(stored.files))]
+            self.stats["disk_hits"] += 1
+            count("indicators.disk_hits")
+            result = parts[0] if len(parts) == 1 else tuple(parts)
+            self._store(key, result, persist=False)
+            return result
+        return None
+
+    def _store(self, key, result, persist=True):
+        parts = result if isinstance(result, tuple) else (result,)
+        for part in parts:
+            part.setflags(write=False)  # cached arrays are shared between callers
+
+        with self._lock:
+            self._lru[key] = result
+            self._lru.move_to_end(key)
+            while len(self._lru) > self.max_entries:
+                self._lru.popitem(last=False)
+
+        if persist and self.cache_dir:
+            path = self._disk_path(key)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            np.savez(path, *parts)
+
+    def indicator(self, name, close, high=None, low=None, ticker="", interval="1d", version=None, **params):
+        """
+        Returns one indicator (an array, or a tuple of arrays for macd/bbands).
+        """
+        func, inputs = INDICATORS[name]
+        columns = {"Close": close, "High": high, "Low": low}
+        arrays = [np.ascontiguousarray(columns[col], dtype=np.float64) for col in inputs]
+        if version is None:
+            version = self.data_version(*arrays)
+
+        key = (ticker, interval, version, name, tuple(sorted(params.items())))
+        result = self._lookup(key)
+        if result is None:
+            self.stats["misses"] += 1
+            count("indicators.misses")
+            result = func(*arrays, **params)
+            self._store(key, result)
+        return result
+
+    def compute_all(self, df, specs, ticker="", interval="1d"):
+        """
+        Computes every (name, params) spec for one ticker's OHLC frame in a single pass:
+        each price column is converted to a contiguous array and hashed once.
+        Returns {spec label: result}, labels like "rsi_14" or "bbands_20".
+        """
+        columns = {col: np.ascontiguousarray(df[col], dtype=np.float64)
+                   for col in ("High", "Low", "Close") if col in df}
+        versions = {}
+
+        results = {}
+        for name, params in specs:
+            inputs = INDICATORS[name][1]
+            if inputs not in versions:
+                versions[inputs] = self.data_version(*(columns[col] for col in inputs))
+            label = "_".join([name] + [str(v) for v in params.values()])
+            results[label] = self.indicator(name, columns["Close"], columns.get("High"), columns.get("Low"),
+                                            ticker=ticker, interval=interval, version=versions[inputs], **params)
+        return results
+
+
+def get_engine():
+    """
+    Returns the process-wide indicator engine, created on first use.
+    """
+    global _engine
+    if _engine is None:
+        _engine = IndicatorEngine()
+    return _engine
+
+
+def set_engine(engine):
+    global _engine
+    _engine = engine
+
+
+def cached_indicator(name, close, high=None, low=None, **params):
+    """
+    Shortcut for `get_engine().indicator(...)`, usable directly as a `Strategy.I` function.
+    """
+    return get_engine().indicator(name, close, high, low, **params)
@@ -1,38 +1,257 @@
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
 import pandas as pd
-import yfinance as yf
 
-def fetch_data(tickers, start, end, interval="1d"):
-    if isinstance(tickers, str):
-        tickers = [tickers]
+from src.data_cache import OHLCVCache
+from src.instrument import traced, count
+
+OHLCV_COLS = ['Open', 'High', 'Low', 'Close', 'Volume']
 
-    df = yf.download(
-        tickers=tickers,
-        start=start,
-        end=end,
-        interval=interval,
-        auto_adjust=True,
-        progress=False,
-        group_by='ticker'
-    )
+_cache = None
 
-    df.index = df.index.tz_localize(None)
-    combined = []
 
+# --- 1. Sources ---
+def yahoo_source(tickers, start, end, interval="1d"):
+    """
+    Fetches each ticker through `yf.Ticker.history`.
+    `yf.download` keeps module-level state, so it is not safe to call from several threads.
+    A ticker that fails (delisted, bad symbol, timeout) maps to its exception, so one bad
+    symbol never takes down the rest of the chunk.
+    """
+    import yfinance as yf  # only needed for live downloads; keeps `import src.ingestion` cheap
+
+    frames = {}
     for ticker in tickers:
         try:
-            # Try multi-ticker format
-            data = df[ticker][['Open', 'High', 'Low', 'Close', 'Volume']].copy()
-        except (KeyError, TypeError):
-            try:
-                # Fallback: single-ticker format
-                data = df[['Open', 'High', 'Low', 'Close', 'Volume']].copy()
-            except:
-                print(f" No valid data for {ticker}, filling empty frame.")
-                data = pd.DataFrame(columns=['Open', 'High', 'Low', 'Close', 'Volume'])
-
-        data['Ticker'] = ticker
-        data['Date'] = data.index
-        combined.append(data)
-
-    final_df = pd.concat(combined).reset_index(drop=True)
-    return final_df[['Date', 'Ticker', 'Open', 'High', 'Low', 'Close', 'Volume']]
+            data = yf.Ticker(ticker).history(start=start, end=end, interval=interval,
+                                             auto_adjust=True, raise_errors=True)
+        except Exception as e:
+            frames[ticker] = e
+            continue
+        if data.empty:
+            continue
+        data.index = data.index.tz_localize(None)
+        frames[ticker] = data[OHLCV_COLS]
+    return frames
+
+
+TRANSIENT_ERRORS = (ConnectionError, TimeoutError)
+TRANSIENT_NAMES = ("Timeout", "RateLimit", "Connection", "HTTPError")
+
+
+def is_transient(error):
+    """
+    Worth retrying: network / timeout / rate-limit errors, not a missing or delisted symbol.
+    """
+    return isinstance(error, TRANSIENT_ERRORS) or any(n in type(error).__name__ for n in TRANSIENT_NAMES)
+
+
+# --- 2. Rate limiting & status report ---
+class RateLimiter:
+    """
+    Spaces calls at least `1 / calls_per_second` apart across all threads.
+    """
+
+    def __init__(self, calls_per_second=None):
+        self.interval = 1.0 / calls_per_second if calls_per_second else 0.0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next)
+            self._next = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class IngestionReport:
+    """
+    Per-ticker outcome of a `fetch_universe` call.
+    Each status is a dict with ticker, status ('ok' / 'empty' / 'error'), rows, attempts, error, seconds.
+    """
+
+    def __init__(self, statuses):
+        self.statuses = statuses
+
+    @property
+    def failed(self):
+        return [s["ticker"] for s in self.statuses if s["status"] != "ok"]
+
+    def to_frame(self):
+        return pd.DataFrame(self.statuses, columns=["ticker", "status", "rows", "attempts", "error", "seconds"])
+
+    def summary(self):
+        counts = {}
+        for s in self.statuses:
+            counts[s["status"]] = counts.get(s["status"], 0) + 1
+        return counts
+
+
+# --- 3. Engine ---
+def _fetch_chunk(source, chunk, start, end, interval, limiter, retries, backoff):
+    """
+    Fetches one chunk. If the whole call raises, every ticker still pending is retried;
+    tickers the source reports as failed (an exception in place of their frame) are
+    retried only for transient errors, and only those tickers are requested again.
+    """
+    started = time.perf_counter()
+    frames, errors, attempts = {}, {}, {}
+    pending = list(chunk)
+    for attempt in range(1, retries + 1):
+        limiter.wait()
+        try:
+            result, call_failed = source(pending, start, end, interval), False
+        except Exception as e:
+            result, call_failed = {ticker: e for ticker in pending}, True
+
+        retry = []
+        for ticker in pending:
+            attempts[ticker] = attempt
+            data = result.get(ticker)
+            if isinstance(data, Exception):
+                errors[ticker] = f"{type(data).__name__}: {data}"
+                if call_failed or is_transient(data):
+                    retry.append(ticker)
+                continue
+            errors.pop(ticker, None)
+            if data is not None:
+                frames[ticker] = data
+        pending = retry
+        if not pending:
+            break
+        if attempt < retries:
+            time.sleep(backoff * 2 ** (attempt - 1))
+
+    seconds = round(time.perf_counter() - started, 4)
+    statuses = []
+    for ticker in chunk:
+        data = frames.get(ticker)
+        if data is not None and not data.empty:
+            statuses.append({"ticker": ticker, "status": "ok", "rows": len(data),
+                             "attempts": attempts[ticker], "error": None, "seconds": seconds})
+        else:
+            error = errors.get(ticker)
+            statuses.append({"ticker": ticker, "status": "error" if error else "empty",
+                             "rows": 0, "attempts": attempts[ticker], "error": error, "seconds": seconds})
+    return frames, statuses
+
+
+def _assemble(tickers, frames):
+    """
+    Builds the long Date/Ticker/OHLCV frame with one pre-allocated array per column.
+    """
+    sizes = [len(frames[t]) if t in frames else 0 for t in tickers]
+    total = sum(sizes)
+
+    dates = np.empty(total, dtype="datetime64[ns]")
+    values = np.empty((total, len(OHLCV_COLS)), dtype=np.float64)
+    names = np.repeat(np.array(tickers, dtype=object), sizes)
+
+    pos = 0
+    for ticker, size in zip(tickers, sizes):
+        if not size:
+            continue
+        data = frames[ticker]
+        dates[pos:pos + size] = data.index.values
+        values[pos:pos + size] = data[OHLCV_COLS].to_numpy(dtype=np.float64)
+        pos += size
+
+    columns = {"Date": dates, "Ticker": names}
+    for i, col in enumerate(OHLCV_COLS):
+        columns[col] = values[:, i]
+    if np.isfinite(columns["Volume"]).all():
+        columns["Volume"] = columns["Volume"].astype(np.int64)
+    return pd.DataFrame(columns)
+
+
+def fetch_universe(tickers, start, end, interval="1d", source=yahoo_source,
+                   chunk_size=50, max_workers=4, retries=3, backoff=1.0, calls_per_second=None):
+    """
+    Splits `tickers` into chunks, fetches them concurrently from `source` and
+    returns (long-format DataFrame, IngestionReport). A failing chunk never
+    affects the others; its tickers are reported as 'error'.
+
+    `source` is any callable `(tickers, start, end, interval) -> {ticker: DataFrame}`
+    whose frames are indexed by date and hold the OHLCV columns. A ticker may map to an
+    exception instead, to report that ticker alone as failed.
+    """
+    if isinstance(tickers, str):
+        tickers = [tickers]
+    tickers = list(dict.fromkeys(tickers))
+    chunks = [tickers[i:i + chunk_size] for i in range(0, len(tickers), chunk_size)]
+    limiter = RateLimiter(calls_per_second)
+
+    frames, statuses = {}, []
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(chunks)))) as pool:
+        futures = [pool.submit(_fetch_chunk, source, chunk, start, end, interval, limiter, retries, backoff)
+                   for chunk in chunks]
+        for future in futures:
+            chunk_frames, chunk_statuses = future.result()
+            frames.update(chunk_frames)
+            statuses.extend(chunk_statuses)
+
+    return _assemble(tickers, frames), IngestionReport(statuses)
+
+
+@traced()
+def download_yahoo(tickers, start, end, interval="1d"):
+    df, report = fetch_universe(tickers, start, end, interval=interval)
+    for s in report.statuses:
+        if s["status"] != "ok":
+            print(f" No valid data for {s['ticker']} ({s['status']}: {s['error']})")
+    # Errored tickers stay uncovered in the cache; "empty" ones had no sessions to return
+    df.attrs["failed"] = [s["ticker"] for s in report.statuses if s["status"] == "error"]
+    return df
+
+
+# --- 4. Cached entry point ---
+def get_cache():
+    """
+    Returns the process-wide OHLCV cache, created on first use.
+    """
+    global _cache
+    if _cache is None:
+        _cache = OHLCVCache(downloader=download_yahoo)
+    return _cache
+
+
+def set_cache(cache):
+    """
+    Replaces the process-wide cache (e.g. one backed by a fake downloader).
+    """
+    global _cache
+    _cache = cache
+
+
+@traced()
+def fetch_data(tickers, start, end, interval="1d", use_cache=True):
+    if not use_cache:
+        df = download_yahoo(tickers, start, end, interval=interval)
+    else:
+        df = get_cache().get(tickers, start, end, interval=interval)
+    count("fetch_data.rows", len(df))
+    return df
+
+
+# --- Optional CLI Benchmark ---
+if __name__ == "__main__":
+    from src.synthetic import synthetic_source
+
+    universe = [f"SYN{i:03d}.NS" for i in range(500)]
+    source = synthetic_source(latency=0.5)
+
+    t0 = time.perf_counter()
+    serial, _ = fetch_universe(universe, "2015-01-01", "2025-01-01", source=source, chunk_size=25, max_workers=1)
+    t1 = time.perf_counter()
+    df, report = fetch_universe(universe, "2015-01-01", "2025-01-01", source=source, chunk_size=25, max_workers=8)
+    t2 = time.perf_counter()
+
+    print(f"Rows: {len(df):,} | Status: {report.summary()}")
+    print(f"1 worker: {t1 - t0:.2f}s | 8 workers: {t2 - t1:.2f}s")
@@ -0,0 +1,345 @@
+# instrument.py
+
+import os
+import sys
+import json
+import time
+import functools
+import threading
+from collections import Counter
+
+import pandas as pd
+
+TRACE_ENV = "ALGO_TRACE"
+
+_enabled = os.environ.get(TRACE_ENV, "") not in ("", "0")
+_recorder = None
+_recorder_lock = threading.Lock()
+
+
+# --- 1. Recorder ---
+class Recorder:
+    """
+    Collects finished spans (name, start, duration, thread, args) and counters for one run.
+    """
+
+    def __init__(self):
+        self.started = time.time()
+        self.origin = time.perf_counter_ns()
+        self.events = []
+        self.counters = Counter()
+        self.threads = {}
+        self._lock = threading.Lock()
+
+    def add_span(self, name, start_ns, end_ns, args):
+        thread = threading.current_thread()
+        event = (name, start_ns - self.origin, end_ns - start_ns, thread.ident, args)
+        with self._lock:
+            self.events.append(event)
+            self.threads.setdefault(thread.ident, thread.name)
+
+    def add_count(self, name, n):
+        with self._lock:
+            self.counters[name] += n
+
+    def summary(self):
+        """
+        One row per span name: calls, total / mean / max seconds and share of the run's wall time.
+        """
+        with self._lock:
+            events = list(self.events)
+        wall = (time.perf_counter_ns() - self.origin) / 1e9
+        frame = pd.DataFrame(events, columns=["Span", "Start", "Duration", "Thread", "Args"])
+        if frame.empty:
+            return pd.DataFrame(columns=["Span", "Calls", "Total (s)", "Mean (ms)", "Max (ms)", "% of wall"])
+        stats = frame.groupby("Span")["Duration"].agg(["count", "sum", "mean", "max"])
+        result = pd.DataFrame({
+            "Span": stats.index,
+            "Calls": stats["count"].to_numpy(),
+            "Total (s)": stats["sum"].to_numpy() / 1e9,
+            "Mean (ms)": stats["mean"].to_numpy() / 1e6,
+            "Max (ms)": stats["max"].to_numpy() / 1e6,
+        })
+        result["% of wall"] = result["Total (s)"] / wall * 100 if wall > 0 else 0.0
+        return result.sort_values("Total (s)", ascending=False).reset_index(drop=True)
+
+    def chrome_trace(self):
+        """
+        The run in Chrome trace-event format (open in chrome://tracing or ui.perfetto.dev).
+        """
+        pid = os.getpid()
+        with self._lock:
+            events, counters, threads = list(self.events), dict(self.counters), dict(self.threads)
+        trace = [{"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": name}}
+                 for tid, name in threads.items()]
+        trace += [{"name": name, "cat": name.split(".")[0], "ph": "X", "pid": pid, "tid": tid,
+                   "ts": start / 1e3, "dur": duration / 1e3, "args": args or {}}
+                  for name, start, duration, tid, args in events]
+        end = (time.perf_counter_ns() - self.origin) / 1e3
+        trace += [{"name": name, "ph": "C", "pid": pid, "ts": end, "args": {"value": value}}
+                  for name, value in counters.items()]
+        return {"traceEvents": trace, "displayTimeUnit": "ms"}
+
+    def report(self):
+        summary = self.summary()
+        return {"started": pd.Timestamp(self.started, unit="s").isoformat(),
+                "wall_seconds": (time.perf_counter_ns() - self.origin) / 1e9,
+                "spans": summary.to_dict(orient="records"),
+                "counters": dict(self.counters)}
+
+
+def get_recorder():
+    global _recorder
+    with _recorder_lock:
+        if _recorder is None:
+            _recorder = Recorder()
+        return _recorder
+
+
+def reset():
+    """
+    Starts a new run: drops every recorded span and counter.
+    """
+    global _recorder
+    with _recorder_lock:
+        _recorder = Recorder()
+    return _recorder
+
+
+# --- 2. Switch, spans & counters ---
+def enable(flag=True):
+    global _enabled
+    _enabled = bool(flag)
+
+
+def disable():
+    enable(False)
+
+
+def enabled():
+    return _enabled
+
+
+class _Span:
+    __slots__ = ("name", "args", "start")
+
+    def __init__(self, name, args):
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        get_recorder().add_span(self.name, self.start, time.perf_counter_ns(), self.args)
+        return False
+
+
+class _NoSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NO_SPAN = _NoSpan()
+
+
+def span(name, **args):
+    """
+    `with span("stage"):` times a block. Disabled, it returns a shared no-op object.
+    """
+    return _Span(name, args or None) if _enabled else _NO_SPAN
+
+
+def count(name, n=1):
+    if _enabled:
+        get_recorder().add_count(name, n)
+
+
+def traced(name=None):
+    """
+    Decorator recording a span per call (default name: module.function).
+    Disabled, the only overhead is one flag check.
+    """
+    def decorate(func):
+        label = name or f"{func.__module__.split('.')[-1]}.{func.__qualname__}"
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            start = time.perf_counter_ns()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                get_recorder().add_span(label, start, time.perf_counter_ns(), None)
+        return wrapper
+    return decorate
+
+
+# --- 3. Sampling profiler ---
+class SamplingProfiler:
+    """
+    Samples every thread's Python stack each `interval` seconds from a background thread
+    (no tracing hooks, so overhead is bounded by the sampling rate). `top()` lists the
+    hottest functions; `export_collapsed()` writes folded stacks for flame graphs
+    (speedscope, flamegraph.pl).
+    """
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for tid, frame in sys._current_frames().items():
+                if tid == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._sample, name="sampling-profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        return self
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
+
+    def top(self, n=15):
+        """
+        Functions by samples where they were on the stack (inclusive) and on top (self).
+        """
+        inclusive, own = Counter(), Counter()
+        for stack, hits in self.stacks.items():
+            frames = stack.split(";")
+            own[frames[-1]] += hits
+            for frame in set(frames):
+                inclusive[frame] += hits
+        total = max(1, sum(self.stacks.values()))
+        rows = [{"Function": f, "Self %": own[f] / total * 100, "Total %": inclusive[f] / total * 100}
+                for f in inclusive]
+        return pd.DataFrame(rows, columns=["Function", "Self %", "Total %"]).sort_values(
+            ["Self %", "Total %"], ascending=False).head(n).reset_index(drop=True)
+
+    def export_collapsed(self, path):
+        with open(path, "w") as f:
+            for stack, hits in self.stacks.most_common():
+                f.write(f"{stack} {hits}\n")
+
+
+# --- 4. Per-run export ---
+def export(prefix, recorder=None):
+    """
+    Writes `{prefix}.json` (span summary + counters) and `{prefix}.trace.json` (Chrome trace).
+    """
+    recorder = recorder or get_recorder()
+    folder = os.path.dirname(prefix)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+    with open(f"{prefix}.json", "w") as f:
+        json.dump(recorder.report(), f, indent=2, default=str)
+    with open(f"{prefix}.trace.json", "w") as f:
+        json.dump(recorder.chrome_trace(), f)
+    return f"{prefix}.json", f"{prefix}.trace.json"
+
+
+class trace_run:
+    """
+    `with trace_run("traces/run"):` enables instrumentation for the block (optionally with
+    the sampling profiler) and exports the run's summary, Chrome trace and folded stacks.
+    """
+
+    def __init__(self, prefix, profile=False, interval=0.005):
+        self.prefix = prefix
+        self.profiler = SamplingProfiler(interval) if profile else None
+
+    def __enter__(self):
+        self._was_enabled = enabled()
+        self.recorder = reset()
+        enable()
+        if self.profiler:
+            self.profiler.start()
+        return self
+
+    def __exit__(self, *exc):
+        enable(self._was_enabled)
+        export(self.prefix, self.recorder)
+        if self.profiler:
+            self.profiler.stop()
+            self.profiler.export_collapsed(f"{self.prefix}.folded.txt")
+        return False
+
+
+if __name__ == "__main__":
+    import tempfile
+    import numpy as np
+    # Use the importable module (the one the instrumented modules share), not __main__
+    from src.instrument import enable, disable, traced, span, trace_run
+
+    @traced()
+    def work(x):
+        return x + 1
+
+    def raw(x):
+        return x + 1
+
+    n = 1_000_000
+    disable()
+    t0 = time.perf_counter()
+    for i in range(n):
+        raw(i)
+    t1 = time.perf_counter()
+    for i in range(n):
+        work(i)
+    t2 = time.perf_counter()
+    for i in range(n):
+        with span("block"):
+            pass
+    t3 = time.perf_counter()
+    enable()
+    for i in range(n // 10):
+        work(i)
+    t4 = time.perf_counter()
+    print(f"Per call: plain {(t1 - t0) / n * 1e9:.0f}ns | disabled @traced {(t2 - t1) / n * 1e9:.0f}ns | "
+          f"disabled span {(t3 - t2) / n * 1e9:.0f}ns | enabled @traced {(t4 - t3) / (n // 10) * 1e9:.0f}ns")
+
+    from src.indicators import rsi
+    from src.vector_backtest import run_vectorized
+    from src.synthetic import synthetic_bars
+
+    df = synthetic_bars("SYN.NS", "2000-01-01", "2025-01-01")
+    with tempfile.TemporaryDirectory() as tmp:
+        with trace_run(os.path.join(tmp, "run"), profile=True, interval=0.001) as run:
+            for _ in range(20):
+                run_vectorized(df)
+                rsi(np.random.default_rng(0).random(200_000), 14)
+        print(run.recorder.summary().head(8).to_string(index=False))
+        print(f"Profiler: {run.profiler.samples} samples | hottest:")
+        print(run.profiler.top(5).to_string(index=False))
+        print(f"Exported: {sorted(os.listdir(tmp))}")
@@ -0,0 +1,415 @@
+# intraday.py
+
+import os
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from src.indicators import rsi, sma, crossover
+from src.vector_backtest import TRADE_COLS, pair_trades, size_trades
+
+STORE_ROOT = "minute_store"
+EPOCH = np.datetime64("2000-01-03T00:00", "m")
+SESSION = ("09:15", "15:30")  # NSE regular session, exchange wall time
+CHUNK_ROWS = 250_000
+
+# On-disk column layout: minute stamps as int32 minutes since EPOCH, prices as float32
+COLUMNS = {"Minute": "<i4", "Open": "<f4", "High": "<f4", "Low": "<f4", "Close": "<f4", "Volume": "<i4"}
+
+
+def _minute_of_day(text):
+    return int(text[:2]) * 60 + int(text[3:])
+
+
+def to_minutes(index):
+    """
+    Datetimes -> int32 minutes since EPOCH (exchange wall time, no tz).
+    """
+    values = pd.DatetimeIndex(index).tz_localize(None).values.astype("datetime64[m]")
+    return (values - EPOCH).astype(np.int32)
+
+
+def to_datetimes(minutes):
+    return pd.DatetimeIndex((EPOCH + np.asarray(minutes, dtype=np.int64)).astype("datetime64[ns]"), name="Date")
+
+
+# --- 1. Columnar minute bars ---
+class MinuteBars:
+    """
+    One ticker's bars as equal-length column arrays (memory-mapped or in memory).
+    Slicing is free: it only creates views on the same columns.
+    """
+
+    def __init__(self, columns):
+        self.columns = columns
+
+    def __len__(self):
+        return len(self.columns["Minute"])
+
+    def __getitem__(self, col):
+        return self.columns[col]
+
+    @property
+    def index(self):
+        return to_datetimes(self.columns["Minute"])
+
+    @property
+    def nbytes(self):
+        return sum(values.nbytes for values in self.columns.values())
+
+    def slice(self, start, stop):
+        return MinuteBars({col: values[start:stop] for col, values in self.columns.items()})
+
+    def to_frame(self):
+        """
+        Materializes the bars as a DataFrame indexed by Date (prices stay float32).
+        """
+        return pd.DataFrame({col: np.asarray(self.columns[col]) for col in COLUMNS if col != "Minute"},
+                            index=self.index)
+
+
+class MinuteStore:
+    """
+    Append-only columnar store: `{root}/{ticker}/{column}.bin` raw little-endian arrays
+    (int32 minutes, float32 OHLC, int32 volume) — 24 bytes per bar instead of ~48 for
+    a float64 frame, and loadable with np.memmap so only touched pages are read.
+    """
+
+    def __init__(self, root=STORE_ROOT):
+        self.root = root
+
+    def _path(self, ticker, col):
+        return os.path.join(self.root, ticker, f"{col}.bin")
+
+    def tickers(self):
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(t for t in os.listdir(self.root) if os.path.exists(self._path(t, "Minute")))
+
+    def rows(self, ticker):
+        """
+        Complete rows on disk (the shortest column, so a torn append is ignored).
+        """
+        sizes = [os.path.getsize(self._path(ticker, col)) // np.dtype(dtype).itemsize
+                 if os.path.exists(self._path(ticker, col)) else 0 for col, dtype in COLUMNS.items()]
+        return min(sizes)
+
+    def nbytes(self, ticker):
+        return self.rows(ticker) * sum(np.dtype(dtype).itemsize for dtype in COLUMNS.values())
+
+    def append(self, ticker, df):
+        """
+        Appends bars newer than the last stored minute. `df` is indexed by datetime and
+        holds the OHLCV columns. Returns the number of rows written.
+        """
+        minutes = to_minutes(df.index)
+        n = self.rows(ticker)
+        if n:
+            last = np.memmap(self._path(ticker, "Minute"), dtype=COLUMNS["Minute"], mode="r")[n - 1]
+            keep = minutes > last
+            df, minutes = df[keep], minutes[keep]
+        if not len(minutes):
+            return 0
+
+        volume = df["Volume"].to_numpy(dtype=np.float64)
+        if np.nanmax(volume, initial=0) > np.iinfo(np.int32).max:
+            raise OverflowError(f"{ticker}: minute volume exceeds int32")
+        values = {"Minute": minutes, "Volume": np.nan_to_num(volume).astype(np.int32)}
+        for col in ("Open", "High", "Low", "Close"):
+            values[col] = df[col].to_numpy(dtype=np.float32)
+
+        os.makedirs(os.path.join(self.root, ticker), exist_ok=True)
+        for col, dtype in COLUMNS.items():
+            # Drop any torn tail first; Minute goes last so a crash never exposes partial rows
+            with open(self._path(ticker, col), "ab") as f:
+                f.truncate(n * np.dtype(dtype).itemsize)
+        for col in [c for c in COLUMNS if c != "Minute"] + ["Minute"]:
+            with open(self._path(ticker, col), "ab") as f:
+                f.write(np.ascontiguousarray(values[col], dtype=COLUMNS[col]).tobytes())
+        return len(minutes)
+
+    def load(self, ticker, start=None, end=None):
+        """
+        Memory-maps a ticker's bars, sliced to [start, end) by binary search on the minutes.
+        """
+        n = self.rows(ticker)
+        columns = {col: np.memmap(self._path(ticker, col), dtype=dtype, mode="r", shape=(n,))
+                   if n else np.empty(0, dtype=dtype) for col, dtype in COLUMNS.items()}
+        bars = MinuteBars(columns)
+        lo = 0 if start is None else np.searchsorted(columns["Minute"], to_minutes([start])[0])
+        hi = n if end is None else np.searchsorted(columns["Minute"], to_minutes([end])[0])
+        return bars.slice(lo, hi)
+
+
+def ingest_minutes(store, tickers, start, end, source=None):
+    """
+    Fetches 1-minute bars through `fetch_universe` and appends them to `store`.
+    Returns the IngestionReport.
+    """
+    from src.ingestion import fetch_universe, yahoo_source
+
+    data, report = fetch_universe(tickers, start, end, interval="1m", source=source or yahoo_source)
+    for ticker, part in data.groupby("Ticker", sort=False):
+        store.append(ticker, part.set_index("Date"))
+    return report
+
+
+# --- 2. Session-aware resampling ---
+def resample(bars, minutes=15, session=SESSION):
+    """
+    Aggregates minute bars to `minutes`-long bars anchored at the session open.
+
+    Buckets never cross a day or the session close, so with a 09:15-15:30 session hourly
+    bars start at 09:15, 10:15, ... and the last one is the partial 15:15-15:30 bar.
+    Bars outside the session are dropped. A bucket at least as long as the session
+    gives one bar per day, labelled at midnight like daily data.
+    """
+    if not isinstance(minutes, (int, np.integer)):
+        minutes = int(pd.Timedelta(minutes) / pd.Timedelta(minutes=1))
+    open_minute, close_minute = (_minute_of_day(t) for t in session)
+    daily = minutes >= close_minute - open_minute
+
+    stamp = np.asarray(bars["Minute"], dtype=np.int64)
+    day, minute = np.divmod(stamp, 1440)
+    in_session = (minute >= open_minute) & (minute < close_minute)
+    rows = np.flatnonzero(in_session)
+    if not len(rows):
+        return MinuteBars({col: np.empty(0, dtype=dtype) for col, dtype in COLUMNS.items()})
+
+    bucket = np.zeros(len(rows), dtype=np.int64) if daily else (minute[rows] - open_minute) // minutes
+    key = day[rows] * 1440 + bucket
+    starts = np.flatnonzero(np.r_[True, key[1:] != key[:-1]])
+    ends = np.r_[starts[1:], len(rows)] - 1
+
+    def column(col):
+        return np.asarray(bars[col])[rows]
+
+    label = day[rows][starts] * 1440 + (0 if daily else open_minute + bucket[starts] * minutes)
+    return MinuteBars({
+        "Minute": label.astype(np.int32),
+        "Open": column("Open")[starts],
+        "High": np.maximum.reduceat(column("High"), starts),
+        "Low": np.minimum.reduceat(column("Low"), starts),
+        "Close": column("Close")[ends],
+        "Volume": np.add.reduceat(column("Volume").astype(np.int64), starts),
+    })
+
+
+# --- 3. Chunked signals & backtest ---
+def _warmup(rsi_length, fast, slow):
+    # SMA needs slow - 1 prior bars; Wilder's RMA forgets its start at (1 - 1/n)^k,
+    # so 40 * n extra bars put chunk-edge RSI within float rounding of the full series
+    return max(fast, slow) + 40 * rsi_length
+
+
+def chunked_signals(close, chunk_rows=CHUNK_ROWS, rsi_length=14, oversold=30, fast=20, slow=50, latch=True):
+    """
+    `vector_backtest.strategy_signals` over a long (e.g. memory-mapped) close series,
+    `chunk_rows` bars at a time. Each chunk is computed in float64 with a warm-up overlap
+    from the previous one and the oversold latch is carried across chunk boundaries,
+    so only the boolean buy/sell arrays are kept for the whole series.
+    """
+    n = len(close)
+    warmup = _warmup(rsi_length, fast, slow)
+    chunk_rows = max(chunk_rows, warmup)
+    buy = np.zeros(n, dtype=bool)
+    sell = np.zeros(n, dtype=bool)
+    start, armed = n, False
+
+    for a in range(0, n, chunk_rows):
+        b = min(a + chunk_rows, n)
+        lo = max(0, a - warmup)
+        window = np.asarray(close[lo:b], dtype=np.float64)
+        rsi_values = rsi(window, rsi_length)
+        fast_values = sma(window, fast)
+        slow_values = sma(window, slow)
+        if a == 0:
+            # Same warm-up as Backtest.run: 1 + first bar where every indicator is defined
+            start = max(int(np.isnan(ind).argmin()) for ind in (rsi_values, fast_values, slow_values)) + 1
+
+        core = slice(a - lo, None)
+        active = np.arange(a, b) >= start
+        cross_up = crossover(fast_values, slow_values)[core] & active
+        sell[a:b] = crossover(slow_values, fast_values)[core] & active
+        with np.errstate(invalid="ignore"):
+            oversold_bar = (rsi_values[core] < oversold) & active
+
+        if not latch:
+            buy[a:b] = cross_up & oversold_bar
+            continue
+        # A crossover buys iff an oversold bar happened since the previous crossover,
+        # which may lie in an earlier chunk (`armed`)
+        up_bars = np.flatnonzero(cross_up)
+        seen = np.cumsum(oversold_bar) + armed
+        prev_seen = np.concatenate(([0], seen[up_bars[:-1]]))
+        buy[a + up_bars[seen[up_bars] > prev_seen]] = True
+        if len(seen):
+            armed = bool(seen[-1] > (seen[up_bars[-1]] if len(up_bars) else 0))
+
+    return {"buy": buy, "sell": sell, "start": start}
+
+
+def chunked_backtest(bars, cash=10000, commission=0.002, chunk_rows=CHUNK_ROWS, rsi_length=14,
+                     oversold=30, fast=20, slow=50, latch=True):
+    """
+    `run_vectorized` for MinuteBars: signals, sizing and the equity curve are all built
+    chunk by chunk, so memory stays bounded by `chunk_rows` whatever the history length.
+    Returns (stats Series with a daily `_equity_curve`, trades DataFrame).
+    """
+    open_, close, stamps = bars["Open"], bars["Close"], bars["Minute"]
+    n = len(close)
+    signals = chunked_signals(close, chunk_rows, rsi_length, oversold, fast, slow, latch)
+    entries, exits = pair_trades(signals["buy"], signals["sell"])
+    sizes, closed, entry_price, exit_price = size_trades(open_, entries, exits, cash, commission)
+    realised = np.where(closed, sizes * (exit_price - entry_price) - sizes * np.nan_to_num(exit_price) * commission, 0.0)
+
+    position = cost_basis = 0.0
+    balance, peak, max_drawdown, exposure = float(cash), float(cash), 0.0, 0
+    first_equity = last_equity = float(cash)
+    daily = []
+    for a in range(0, n, chunk_rows):
+        b = min(a + chunk_rows, n)
+        delta_pos, delta_cost, delta_cash = np.zeros(b - a), np.zeros(b - a), np.zeros(b - a)
+        for bars_at, sign, cash_delta in ((entries, 1, -sizes * entry_price * commission), (exits, -1, realised)):
+            inside = (bars_at >= a) & (bars_at < b)
+            np.add.at(delta_pos, bars_at[inside] - a, sign * sizes[inside])
+            np.add.at(delta_cost, bars_at[inside] - a, sign * sizes[inside] * entry_price[inside])
+            np.add.at(delta_cash, bars_at[inside] - a, cash_delta[inside])
+
+        pos = position + np.cumsum(delta_pos)
+        cost = cost_basis + np.cumsum(delta_cost)
+        bal = balance + np.cumsum(delta_cash)
+        equity = bal + (np.asarray(close[a:b], dtype=np.float64) * pos - cost)
+        position, cost_basis, balance = pos[-1], cost[-1], bal[-1]
+
+        running_peak = np.maximum(np.maximum.accumulate(equity), peak)
+        max_drawdown = max(max_drawdown, float((1 - equity / running_peak).max()))
+        peak = running_peak[-1]
+        exposure += int((pos > 0).sum())
+        first_equity = equity[0] if a == 0 else first_equity
+        last_equity = equity[-1]
+
+        # Keep one equity point per day: the last bar of each day in this chunk
+        day = np.asarray(stamps[a:b], dtype=np.int64) // 1440
+        last = np.flatnonzero(np.r_[day[1:] != day[:-1], True])
+        daily.append(pd.Series(equity[last], index=to_datetimes(day[last] * 1440)))
+
+    keep = closed & (sizes > 0)
+    trades = _trade_log(bars, entries[keep], exits[keep], sizes[keep], commission)
+    returns = trades["ReturnPct"]
+    curve = pd.concat(daily).groupby(level=0).last().to_frame("Equity") if daily else pd.DataFrame(columns=["Equity"])
+    index = to_datetimes([stamps[0], stamps[n - 1]]) if n else [pd.NaT, pd.NaT]
+    stats = pd.Series({
+        "Start": index[0],
+        "End": index[-1],
+        "Duration": index[-1] - index[0],
+        "Exposure Time [%]": exposure / n * 100 if n else np.nan,
+        "Equity Final [$]": last_equity,
+        "Equity Peak [$]": peak,
+        "Return [%]": (last_equity - first_equity) / first_equity * 100,
+        "Buy & Hold Return [%]": (float(close[n - 1]) - float(close[0])) / float(close[0]) * 100 if n else np.nan,
+        "Max. Drawdown [%]": -max_drawdown * 100,
+        "# Trades": len(trades),
+        "Win Rate [%]": (returns > 0).mean() * 100 if len(trades) else np.nan,
+        "Best Trade [%]": returns.max() * 100,
+        "Worst Trade [%]": returns.min() * 100,
+        "Avg. Trade [%]": returns.mean() * 100,
+    })
+    stats["_equity_curve"] = curve
+    stats["_trades"] = trades
+    return stats, trades
+
+
+def _trade_log(bars, entries, exits, sizes, commission):
+    """
+    Closed trades in the `trade_logs/*.csv` base schema (no indicator columns).
+    """
+    open_ = bars["Open"]
+    entry_price = np.asarray(open_[entries], dtype=np.float64)
+    exit_price = np.asarray(open_[exits], dtype=np.float64)
+    commissions = sizes * exit_price * commission + sizes * entry_price * commission
+    trades = pd.DataFrame({
+        "Size": sizes,
+        "EntryBar": entries,
+        "ExitBar": exits,
+        "EntryPrice": entry_price,
+        "ExitPrice": exit_price,
+        "SL": np.nan,
+        "TP": np.nan,
+        "PnL": sizes * (exit_price - entry_price) - commissions,
+        "ReturnPct": (exit_price / entry_price - 1) - commissions / (sizes * entry_price),
+        "EntryTime": to_datetimes(bars["Minute"][entries]),
+        "ExitTime": to_datetimes(bars["Minute"][exits]),
+    })
+    trades["Duration"] = trades["ExitTime"] - trades["EntryTime"]
+    trades["Tag"] = None
+    return trades[TRADE_COLS]
+
+
+# --- 4. Memory reporting ---
+def memory_report(store, tickers=None):
+    """
+    Per ticker: rows, bytes on disk and the size of the same bars as a float64 OHLCV
+    frame with a datetime index (what `fetch_data` would hold in RAM).
+    """
+    rows = []
+    for ticker in tickers or store.tickers():
+        n = store.rows(ticker)
+        rows.append({"Ticker": ticker, "Rows": n, "Disk (MB)": store.nbytes(ticker) / 1e6,
+                     "Float64 frame (MB)": n * (5 * 8 + 8) / 1e6})
+    report = pd.DataFrame(rows, columns=["Ticker", "Rows", "Disk (MB)", "Float64 frame (MB)"])
+    if len(report):
+        total = report[["Rows", "Disk (MB)", "Float64 frame (MB)"]].sum()
+        report.loc[len(report)] = ["ALL", total["Rows"], total["Disk (MB)"], total["Float64 frame (MB)"]]
+    return report
+
+
+def peak_memory(func, *args, **kwargs):
+    """
+    Runs `func` and returns (result, peak Python heap allocation in MB). Pages of
+    memory-mapped files are not heap allocations, so they don't count.
+    """
+    tracemalloc.start()
+    try:
+        result = func(*args, **kwargs)
+        peak = tracemalloc.get_traced_memory()[1] / 1e6
+    finally:
+        tracemalloc.stop()
+    return result, peak
+
+
+if __name__ == "__main__":
+    import time
+    import tempfile
+    from src.synthetic import synthetic_minute_bars
+    from src.vector_backtest import run_vectorized
+
+    universe = [f"SYN{i:02d}.NS" for i in range(20)]
+    with tempfile.TemporaryDirectory() as tmp:
+        store = MinuteStore(tmp)
+        t0 = time.perf_counter()
+        for ticker in universe:
+            store.append(ticker, synthetic_minute_bars(ticker, "2024-01-01", "2024-07-01"))
+            store.append(ticker, synthetic_minute_bars(ticker, "2024-06-01", "2025-01-01"))  # overlap is skipped
+        t1 = time.perf_counter()
+        print(f"Stored {len(universe)} tickers x 1 year of minute bars in {t1 - t0:.2f}s")
+        print(memory_report(store).tail(3).to_string(index=False))
+
+        bars = store.load(universe[0])
+        frame = bars.to_frame().astype(np.float64)
+        (reference, ref_trades), frame_peak = peak_memory(run_vectorized, frame)
+        (stats, trades), chunk_peak = peak_memory(chunked_backtest, bars, chunk_rows=20_000)
+        same = (len(trades) == len(ref_trades)
+                and np.allclose(trades[["Size", "EntryBar", "ExitBar", "PnL"]].to_numpy(dtype=float),
+                                ref_trades[["Size", "EntryBar", "ExitBar", "PnL"]].to_numpy(dtype=float))
+                and np.isclose(stats["Equity Final [$]"], reference["Equity Final [$]"]))
+        print(f"{len(bars):,} bars | in-memory peak heap: {frame_peak:.1f} MB | "
+              f"chunked memmap peak heap: {chunk_peak:.1f} MB | same trades & equity: {same}")
+
+        t2 = time.perf_counter()
+        hourly = resample(bars, "1h")
+        daily = resample(bars, "1d")
+        t3 = time.perf_counter()
+        print(f"Resampled to {len(hourly):,} hourly / {len(daily):,} daily bars in {(t3 - t2) * 1000:.0f}ms")
+        print(hourly.to_frame().head(7).to_string())
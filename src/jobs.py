@@ -0,0 +1,310 @@
+# jobs.py
+
+import time
+import uuid
+import threading
+import traceback
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+MAX_WORKERS = 2
+MAX_JOBS = 256
+
+# Dashboard windows (app.py); training uses ml_model.TRAIN_START / TRAIN_END
+START_DATE = "2024-01-01"
+BACKTEST_END = "2025-06-20"
+SIGNALS_END = "2025-06-24"
+TRAIN_END = "2025-06-20"
+
+_runner = None
+_runner_lock = threading.Lock()
+
+
+# --- 1. Data versions ---
+def data_version(end=None):
+    """
+    Bars up to `end` stop changing once `end` has passed (the OHLCV cache never re-downloads
+    covered days), so the version is the last day the data can include: `end` itself for
+    past windows, today for open-ended or still-running ones.
+    """
+    today = pd.Timestamp.today().normalize()
+    if end is None:
+        return str(today.date())
+    return str(min(pd.Timestamp(end).normalize(), today).date())
+
+
+def model_version(ticker):
+    """
+    Version of a ticker's saved model (file mtimes + sizes), or "untrained".
+    """
+    from src.ml_model import get_registry
+
+    signature = get_registry().signature(ticker)
+    return "untrained" if signature is None else "-".join(f"{m}:{s}" for m, s in signature)
+
+
+# --- 2. Tasks: func(ticker, progress, **params) -> result ---
+def backtest_task(ticker, progress, start=START_DATE, end=BACKTEST_END):
+    from src.ingestion import fetch_data
+    from src.backtest import run_and_log
+
+    progress(0.1, "Fetching data")
+    fetch_data(ticker, start, end)
+    progress(0.4, "Running backtest")
+    stats, trades = run_and_log(ticker, start, end)
+    return {"stats": stats, "trades": trades}
+
+
+def train_task(ticker, progress, model_dir=None):
+    from src.ml_model import fetch_and_prepare, train_model, MODEL_DIR
+
+    progress(0.1, "Fetching data and building features")
+    df = fetch_and_prepare(ticker)
+    progress(0.4, f"Training on {len(df)} rows")
+    model, _ = train_model(df, ticker, model_dir=model_dir or MODEL_DIR)
+    return {"rows": len(df), "params": {k: model.get_params()[k]
+                                        for k in ("max_depth", "min_samples_split", "min_samples_leaf")}}
+
+
+def signals_task(ticker, progress, start=START_DATE, end=SIGNALS_END, rsi_threshold=30):
+    from src.simple_strategy import get_signals_for_tickers
+
+    progress(0.1, "Scanning for signals")
+    return get_signals_for_tickers([ticker], start, end, rsi_threshold=rsi_threshold)
+
+
+def predict_task(ticker, progress):
+    from src.ml_model import predict_next_signal
+
+    progress(0.1, "Scoring the latest bar")
+    return predict_next_signal(ticker)
+
+
+# kind -> (task, version function of (ticker, params))
+TASKS = {
+    "backtest": (backtest_task, lambda ticker, params: data_version(params.get("end", BACKTEST_END))),
+    "train": (train_task, lambda ticker, params: data_version(TRAIN_END)),
+    "signals": (signals_task, lambda ticker, params: data_version(params.get("end", SIGNALS_END))),
+    "predict": (predict_task, lambda ticker, params: data_version(TRAIN_END) + "|" + model_version(ticker)),
+}
+
+
+# --- 3. Jobs & runner ---
+class Job:
+    """
+    One task run. Workers update `status`, `progress` (0-1) and `message`; readers only poll.
+    """
+
+    def __init__(self, kind, ticker, params, version):
+        self.id = uuid.uuid4().hex[:8]
+        self.kind = kind
+        self.ticker = ticker
+        self.params = params
+        self.version = version
+        self.status = QUEUED
+        self.progress = 0.0
+        self.message = "Queued"
+        self.result = None
+        self.error = None
+        self.traceback = None
+        self.submitted = time.time()
+        self.started = None
+        self.finished = None
+        self._event = threading.Event()
+
+    @property
+    def active(self):
+        return self.status in (QUEUED, RUNNING)
+
+    def update(self, progress=None, message=None):
+        if progress is not None:
+            self.progress = float(progress)
+        if message is not None:
+            self.message = message
+
+    def wait(self, timeout=None):
+        """
+        Blocks until the job finishes (for scripts and tests; the dashboard polls instead).
+        """
+        return self._event.wait(timeout)
+
+    def to_dict(self):
+        end = self.finished or time.time()
+        return {"Job": self.id, "Kind": self.kind, "Ticker": self.ticker, "Status": self.status,
+                "Progress": round(self.progress * 100), "Message": self.message,
+                "Seconds": round(end - (self.started or end), 2), "Version": self.version}
+
+
+class JobRunner:
+    """
+    Runs backtests, trainings and scans on a worker pool, off the caller's thread.
+
+    A job is identified by (kind, ticker, params, data version): submitting the same key
+    again returns the queued, running or finished job instead of recomputing, so every
+    dashboard session shares one result until the data (or model) version changes.
+    Failed jobs are retried on the next submit. At most `max_jobs` finished jobs are kept.
+    """
+
+    def __init__(self, max_workers=MAX_WORKERS, max_jobs=MAX_JOBS, tasks=None):
+        self.tasks = dict(TASKS if tasks is None else tasks)
+        self.max_jobs = max_jobs
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._jobs = OrderedDict()  # key -> Job
+        self._by_id = {}
+        self._lock = threading.Lock()
+
+    def _key(self, kind, ticker, params):
+        _, version = self.tasks[kind]
+        return (kind, ticker, tuple(sorted(params.items())), version(ticker, params))
+
+    def submit(self, kind, ticker, force=False, **params):
+        """
+        Returns the job for this request, starting it only if no usable one exists.
+        """
+        key = self._key(kind, ticker, params)
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is not None and job.status != FAILED and not force:
+                self._jobs.move_to_end(key)
+                return job
+            job = Job(kind, ticker, params, key[-1])
+            self._jobs[key] = job
+            self._jobs.move_to_end(key)
+            self._by_id[job.id] = job
+            self._evict()
+        self._pool.submit(self._run, job)
+        return job
+
+    def _evict(self):
+        finished = [key for key, job in self._jobs.items() if not job.active]
+        for key in finished[:max(0, len(self._jobs) - self.max_jobs)]:
+            self._by_id.pop(self._jobs.pop(key).id, None)
+
+    def _run(self, job):
+        func, _ = self.tasks[job.kind]
+        job.status, job.started = RUNNING, time.time()
+        job.update(message="Running")
+        try:
+            job.result = func(job.ticker, job.update, **job.params)
+            job.status = DONE
+            job.update(1.0, "Done")
+        except Exception as e:
+            job.error = "".join(traceback.format_exception_only(type(e), e)).strip()
+            job.status = FAILED
+            job.update(message=job.error)
+            job.traceback = traceback.format_exc()
+        finally:
+            job.finished = time.time()
+            job._event.set()
+
+    def get(self, job_id):
+        return self._by_id.get(job_id)
+
+    def find(self, kind, ticker, **params):
+        """
+        The job for this request if one exists (never starts one).
+        """
+        return self._jobs.get(self._key(kind, ticker, params))
+
+    def status(self):
+        """
+        Every known job, newest first, as a DataFrame for the dashboard.
+        """
+        with self._lock:
+            rows = [job.to_dict() for job in reversed(self._jobs.values())]
+        return pd.DataFrame(rows, columns=["Job", "Kind", "Ticker", "Status", "Progress",
+                                           "Message", "Seconds", "Version"])
+
+    def shutdown(self, wait=True):
+        self._pool.shutdown(wait=wait)
+
+
+def get_runner():
+    """
+    Returns the process-wide runner. Streamlit keeps imported modules between reruns and
+    sessions, so every browser tab shares this one pool and its results.
+    """
+    global _runner
+    with _runner_lock:
+        if _runner is None:
+            _runner = JobRunner()
+        return _runner
+
+
+def set_runner(runner):
+    global _runner
+    _runner = runner
+
+
+if __name__ == "__main__":
+    # Headless driver: submits jobs the way app.py does, polls them to completion and
+    # exits non-zero when completion, deduplication or failure retry don't hold
+    import io
+    import sys
+    import tempfile
+    import contextlib
+    from src.data_cache import OHLCVCache
+    from src.ingestion import set_cache, fetch_universe
+    from src.synthetic import synthetic_source
+    from src.store import set_sinks, ResultSinks, SQLiteStore
+
+    attempts = {}
+
+    def flaky_task(ticker, progress):
+        # Fails on its first run, like a rate-limited download
+        attempts[ticker] = attempts.get(ticker, 0) + 1
+        if attempts[ticker] == 1:
+            raise ConnectionError("rate limited")
+        return attempts[ticker]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        set_cache(OHLCVCache(lambda t, s, e, i: fetch_universe(t, s, e, i, source=synthetic_source())[0], root=tmp))
+        set_sinks(ResultSinks(SQLiteStore(f"{tmp}/results.db")))
+        runner = JobRunner(max_workers=2, tasks={**TASKS, "flaky": (flaky_task, lambda ticker, params: "1")})
+        tickers = ["RELIANCE.NS", "TCS.NS", "INFY.NS"]
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            t0 = time.perf_counter()
+            jobs = [runner.submit("backtest", t) for t in tickers] + [runner.submit("signals", t) for t in tickers]
+            submit_s = time.perf_counter() - t0
+            while_running = [runner.submit("backtest", t) for t in tickers]
+            polls = 0
+            while any(job.active for job in jobs) and time.perf_counter() - t0 < 120:
+                polls += 1
+                time.sleep(0.05)
+            first_s = time.perf_counter() - t0
+
+            t1 = time.perf_counter()
+            again = [runner.submit("backtest", t) for t in tickers]  # a second session asking again
+            second_s = time.perf_counter() - t1
+
+            # Two trainings at once, as two dashboard sessions would start them
+            trainings = [runner.submit("train", t, model_dir=f"{tmp}/models") for t in tickers[:2]]
+            for job in trainings:
+                job.wait(300)
+
+            failed = runner.submit("flaky", "TCS.NS")
+            failed.wait(30)
+            retried = runner.submit("flaky", "TCS.NS")
+            retried.wait(30)
+
+        checks = {
+            "all jobs done": all(job.status == DONE for job in jobs),
+            "concurrent trainings done": all(job.status == DONE for job in trainings),
+            "deduplicated while running": all(a is b for a, b in zip(while_running, jobs)),
+            "reused once finished": all(a is b for a, b in zip(again, jobs)),
+            "failure recorded": failed.status == FAILED and "rate limited" in failed.error,
+            "failure retried": retried is not failed and retried.status == DONE and retried.result == 2,
+            "success reused": runner.submit("flaky", "TCS.NS") is retried,
+        }
+        print(f"Submit 6 jobs: {submit_s * 1000:.1f}ms (non-blocking) | all finished after {first_s:.2f}s, {polls} polls")
+        print(f"Same requests again: {second_s * 1000:.2f}ms")
+        print(runner.status().drop(columns="Version").to_string(index=False))
+        runner.shutdown()
+
+    for name, ok in checks.items():
+        print(f"{'ok  ' if ok else 'FAIL'} {name}")
+    sys.exit(0 if all(checks.values()) else 1)
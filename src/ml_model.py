@@ -1,46 +1,67 @@
 import os
+import io
+import time
+import tempfile
+import contextlib
 import pandas as pd
 import numpy as np
-import pandas_ta as ta
-import matplotlib.pyplot as plt
-from sklearn.model_selection import train_test_split, GridSearchCV
-from sklearn.tree import DecisionTreeClassifier
-from sklearn.metrics import classification_report, accuracy_score
-from sklearn.preprocessing import StandardScaler
-import joblib
 
 from src.ingestion import fetch_data
+from src.indicators import get_engine
+from src.model_registry import ModelRegistry
+from src.tree_pack import export_models
+from src.instrument import traced
 
-# Constants
+# Constants (sklearn / joblib are imported where used, so scoring-only callers start fast)
 MODEL_DIR = "final_model"
-os.makedirs(MODEL_DIR, exist_ok=True)
+_registry = ModelRegistry(MODEL_DIR)
+POOLED_PATH = os.path.join(MODEL_DIR, "pooled_model.pkl")
+_pooled = {}  # path -> (file signature, artifact)
 
 FEATURE_COLS = ['RSI', 'MACD', 'ATR', 'BBU', 'BBL', 'WILLR', 'RSI_prev', 'MACD_prev']
+ML_INDICATORS = [
+    ("rsi", {"length": 14}),
+    ("macd", {"fast": 12, "slow": 26, "signal": 9}),
+    ("atr", {"length": 14}),
+    ("bbands", {"length": 20}),
+    ("willr", {"length": 14}),
+]
+
+
+PARAM_GRID = {
+    'max_depth': [4, 6, 10],
+    'min_samples_split': [2, 5, 10],
+    'min_samples_leaf': [1, 3, 5]
+}
+
+TRAIN_START = "2023-01-01"
+TRAIN_END = "2025-06-20"
 
 
 def fetch_and_prepare(ticker):
-    df = fetch_data(ticker, start="2023-01-01", end="2025-06-20")
+    df = fetch_data(ticker, start=TRAIN_START, end=TRAIN_END)
     if df is None or df.empty:
         raise ValueError(f"Failed to fetch data for {ticker}")
+    return prepare_features(df, ticker)
 
-    df.dropna(inplace=True)
 
-    # Technical indicators
-    df['RSI'] = ta.rsi(df['Close'], length=14)
-    macd = ta.macd(df['Close'])
-    if macd is None or 'MACD_12_26_9' not in macd:
-        raise ValueError("MACD calculation failed.")
+def prepare_features(df, ticker=""):
+    """
+    Adds FEATURE_COLS and Target to one ticker's raw OHLCV frame.
+    """
+    df.dropna(inplace=True)
 
-    df['MACD'] = macd['MACD_12_26_9']
-    df['ATR'] = ta.atr(df['High'], df['Low'], df['Close'])
-    bb = ta.bbands(df['Close'], length=20)
-    if bb is not None and bb.shape[1] >= 3:
-        df['BBU'] = bb.iloc[:, 2]
-        df['BBL'] = bb.iloc[:, 0]
-    else:
-        raise ValueError("Bollinger Bands calculation failed.")
+    # Technical indicators (one pass, shared with the strategy/backtest through the engine)
+    values = get_engine().compute_all(df, ML_INDICATORS, ticker=ticker)
+    macd_line, _, _ = values['macd_12_26_9']
+    bbl, _, bbu = values['bbands_20']
 
-    df['WILLR'] = ta.willr(df['High'], df['Low'], df['Close'])
+    df['RSI'] = values['rsi_14']
+    df['MACD'] = macd_line
+    df['ATR'] = values['atr_14']
+    df['BBU'] = bbu
+    df['BBL'] = bbl
+    df['WILLR'] = values['willr_14']
 
     # Lag features
     df['RSI_prev'] = df['RSI'].shift(1)
@@ -53,63 +74,232 @@ def fetch_and_prepare(ticker):
     return df
 
 
-def train_model(df, ticker):
-    X = df[FEATURE_COLS]
-    y = df['Target']
+@traced()
+def train_model(df, ticker, model_dir=MODEL_DIR):
+    """
+    Picks the tree's parameters by purged walk-forward CV (`validation.purged_search`),
+    reports the untouched newest fold and saves a scaler + model fit on every labelled row.
+    """
+    from sklearn.metrics import classification_report
+    from src.validation import purged_search, purged_walk_forward, labelled, fit_final, N_SPLITS, EMBARGO
+
+    X, y = labelled(df)
+    result = purged_search({ticker: (X, y)}, PARAM_GRID, max_workers=1).get(ticker)
+    if result is None:
+        raise ValueError(f"Not enough rows to validate {ticker}: {len(X)}")
+
+    # The holdout fold again, for the per-class report
+    train_idx, test_idx = purged_walk_forward(len(X), N_SPLITS + 1, embargo=EMBARGO)[-1]
+    holdout_model, holdout_scaler = fit_final(X[train_idx], y[train_idx], result["params"])
+    y_pred = holdout_model.predict(holdout_scaler.transform(X[test_idx]))
+
+    print(f"\n📊 {ticker} - Best Parameters: {result['params']}")
+    print(f"✅ Accuracy (purged walk-forward holdout): {result['holdout_accuracy']:.4f} "
+          f"| CV: {result['cv_accuracy']:.4f}")
+    print("✅ Report:\n", classification_report(y[test_idx], y_pred))
+
+    best_model, scaler = fit_final(X, y, result["params"])
+    save_model(best_model, scaler, ticker, model_dir)
+    export_models(model_dir)
+    return best_model, scaler
+
+
+def save_model(model, scaler, ticker, model_dir=MODEL_DIR):
+    import joblib
+
+    os.makedirs(model_dir, exist_ok=True)
+    joblib.dump(model, os.path.join(model_dir, f"{ticker}_model.pkl"))
+    joblib.dump(scaler, os.path.join(model_dir, f"{ticker}_scaler.pkl"))
+
+
+@traced()
+def predict_next_day(df_row, ticker):
+    return _registry.predict(ticker, df_row[FEATURE_COLS])
 
-    scaler = StandardScaler()
-    X_scaled = scaler.fit_transform(X)
 
-    X_train, X_test, y_train, y_test = train_test_split(X_scaled, y, test_size=0.2, random_state=42)
+def predict_next_signal(ticker):
+    df = fetch_and_prepare(ticker)
+    latest_row = df.iloc[-1]
+    return predict_next_day(latest_row, ticker)
 
-    params = {
-        'max_depth': [4, 6, 10],
-        'min_samples_split': [2, 5, 10],
-        'min_samples_leaf': [1, 3, 5]
-    }
 
-    clf = GridSearchCV(DecisionTreeClassifier(random_state=42), params, cv=5)
+def predict_many(tickers, pooled=False):
+    """
+    Scores the latest feature row of every ticker in one batch, with the per-ticker
+    models or (`pooled=True`) the single pooled model.
+    Returns a DataFrame with Ticker, Prediction, Probability and Error columns.
+    """
+    rows = {}
+    errors = []
+    for ticker in tickers:
+        try:
+            rows[ticker] = fetch_and_prepare(ticker)[FEATURE_COLS].iloc[-1]
+        except Exception as e:
+            errors.append({"Ticker": ticker, "Prediction": None, "Probability": None, "Error": str(e)})
+    results = predict_pooled(rows) if pooled else _registry.predict_many(rows)
+    if errors:
+        results = pd.concat([results, pd.DataFrame(errors)], ignore_index=True)
+    return results
+
+
+def get_registry():
+    return _registry
+
+
+# --- Pooled cross-sectional model ---
+def _pooled_design(X, meta):
+    """
+    Per-ticker z-scored features plus ticker and sector codes, as one float32 block.
+    """
+    X = (np.asarray(X, dtype=np.float64) - meta["mean"]) / meta["std"]
+    codes = np.empty((len(X), 2))
+    codes[:, 0] = meta["code"]
+    codes[:, 1] = meta["sector"]
+    return np.hstack([X, codes]).astype(np.float32)
+
+
+def train_pooled_model(frames, sectors=None, path=POOLED_PATH):
+    """
+    Trains a single model on every ticker's rows. `frames` maps ticker -> `prepare_features`
+    output and `sectors` optionally maps ticker -> sector name. Each ticker keeps the same
+    80/20 holdout as `compare_pooled`'s per-ticker models; the normalization stats come
+    from its training rows.
+    Saves one artifact at `path` and returns (artifact, holdout accuracy).
+    """
+    from sklearn.model_selection import train_test_split, GridSearchCV
+    from sklearn.tree import DecisionTreeClassifier
+    from sklearn.metrics import accuracy_score
+    import joblib
+
+    sectors = sectors or {}
+    sector_names = sorted({sectors.get(t, "Unknown") for t in frames})
+
+    meta, train_parts, test_parts = {}, [], []
+    for code, (ticker, df) in enumerate(frames.items()):
+        X_train, X_test, y_train, y_test = train_test_split(
+            df[FEATURE_COLS].to_numpy(), df['Target'].to_numpy(), test_size=0.2, random_state=42)
+        std = X_train.std(axis=0)
+        std[std == 0] = 1.0
+        meta[ticker] = {"code": code, "sector": sector_names.index(sectors.get(ticker, "Unknown")),
+                        "mean": X_train.mean(axis=0), "std": std}
+        train_parts.append((_pooled_design(X_train, meta[ticker]), y_train))
+        test_parts.append((_pooled_design(X_test, meta[ticker]), y_test))
+
+    X_train = np.vstack([X for X, _ in train_parts])
+    y_train = np.concatenate([y for _, y in train_parts])
+    X_test = np.vstack([X for X, _ in test_parts])
+    y_test = np.concatenate([y for _, y in test_parts])
+
+    clf = GridSearchCV(DecisionTreeClassifier(random_state=42), PARAM_GRID, cv=5)
     clf.fit(X_train, y_train)
+    accuracy = accuracy_score(y_test, clf.best_estimator_.predict(X_test))
 
-    best_model = clf.best_estimator_
-    y_pred = best_model.predict(X_test)
+    print(f"\n📊 Pooled ({len(frames)} tickers, {len(X_train)} rows) - Best Parameters: {clf.best_params_}")
+    print(f"✅ Accuracy: {accuracy:.4f}")
 
-    print(f"\n📊 {ticker} - Best Parameters: {clf.best_params_}")
-    print(f"✅ Accuracy: {accuracy_score(y_test, y_pred):.4f}")
-    print("✅ Report:\n", classification_report(y_test, y_pred))
+    artifact = {"model": clf.best_estimator_, "tickers": meta, "sectors": sector_names,
+                "feature_cols": FEATURE_COLS}
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    joblib.dump(artifact, path)
+    return artifact, accuracy
 
-    # Save model and scaler
-    joblib.dump(best_model, os.path.join(MODEL_DIR, f"{ticker}_model.pkl"))
-    joblib.dump(scaler, os.path.join(MODEL_DIR, f"{ticker}_scaler.pkl"))
 
-    # # Plot feature importances
-    # importances = pd.Series(best_model.feature_importances_, index=FEATURE_COLS)
-    # importances.nlargest(10).plot(kind='barh')
-    # plt.title(f"Top Features - {ticker}")
-    # plt.tight_layout()
-    # plt.show()
+def load_pooled_model(path=POOLED_PATH):
+    """
+    Returns the pooled artifact, reloading it only when the file changes.
+    """
+    import joblib
 
-    return best_model, scaler
+    if not os.path.exists(path):
+        raise FileNotFoundError("Pooled model not found. Please train it first.")
+    stat = os.stat(path)
+    signature = (stat.st_mtime_ns, stat.st_size)
+    cached = _pooled.get(path)
+    if cached is None or cached[0] != signature:
+        cached = _pooled[path] = (signature, joblib.load(path))
+    return cached[1]
 
 
-def predict_next_day(df_row, ticker):
-    model_path = os.path.join(MODEL_DIR, f"{ticker}_model.pkl")
-    scaler_path = os.path.join(MODEL_DIR, f"{ticker}_scaler.pkl")
+def predict_pooled(rows, path=POOLED_PATH):
+    """
+    Scores {ticker: feature row} with the pooled model in one predict_proba call.
+    Returns a DataFrame with Ticker, Prediction, Probability and Error columns.
+    """
+    artifact = load_pooled_model(path)
+    known = [t for t in rows if t in artifact["tickers"]]
+    results = [{"Ticker": t, "Prediction": None, "Probability": None, "Error": f"{t} not in pooled model"}
+               for t in rows if t not in artifact["tickers"]]
+    if known:
+        X = np.vstack([_pooled_design(np.asarray(rows[t][FEATURE_COLS], dtype=np.float64)[None, :],
+                                      artifact["tickers"][t]) for t in known])
+        model = artifact["model"]
+        proba = model.predict_proba(X)
+        preds = model.classes_[proba.argmax(axis=1)]
+        results = [{"Ticker": t, "Prediction": int(pred), "Probability": float(p[1]), "Error": None}
+                   for t, pred, p in zip(known, preds, proba)] + results
+    return pd.DataFrame(results, columns=["Ticker", "Prediction", "Probability", "Error"])
 
-    if not os.path.exists(model_path) or not os.path.exists(scaler_path):
-        raise FileNotFoundError(f"Model or scaler not found for {ticker}. Please train the model first.")
 
-    model = joblib.load(model_path)
-    scaler = joblib.load(scaler_path)
+def compare_pooled(frames, sectors=None):
+    """
+    Benchmarks per-ticker models against the pooled model on the same holdout rows:
+    training time, artifact size, cold-load time and accuracy. Both sides are grid-searched
+    on the same shuffled 80/20 split, so this compares model layouts, not leakage-free
+    accuracy (see `validation.compare_estimates` for that).
+    """
+    from sklearn.model_selection import train_test_split, GridSearchCV
+    from sklearn.tree import DecisionTreeClassifier
+    from sklearn.preprocessing import StandardScaler
+    import joblib
 
-    X = scaler.transform([df_row[FEATURE_COLS].values])
-    pred = model.predict(X)[0]
-    prob = model.predict_proba(X)[0][1]  # Probability of class 1 (buy)
+    with tempfile.TemporaryDirectory() as model_dir:
+        rows = []
 
-    return pred, prob
+        t0 = time.perf_counter()
+        correct = total = 0
+        with contextlib.redirect_stdout(io.StringIO()):
+            for ticker, df in frames.items():
+                X_train, X_test, y_train, y_test = train_test_split(df[FEATURE_COLS].to_numpy(), df['Target'],
+                                                                    test_size=0.2, random_state=42)
+                scaler = StandardScaler().fit(X_train)
+                clf = GridSearchCV(DecisionTreeClassifier(random_state=42), PARAM_GRID, cv=5)
+                model = clf.fit(scaler.transform(X_train), y_train).best_estimator_
+                save_model(model, scaler, ticker, model_dir)
+                correct += (model.predict(scaler.transform(X_test)) == y_test).sum()
+                total += len(y_test)
+        train_s = time.perf_counter() - t0
+        paths = [os.path.join(model_dir, f"{t}_{kind}.pkl") for t in frames for kind in ("model", "scaler")]
+        t0 = time.perf_counter()
+        registry = ModelRegistry(model_dir, max_models=len(frames))
+        for ticker in frames:
+            registry.get(ticker)
+        rows.append({"mode": "per-ticker", "train_s": train_s, "artifact_bytes": sum(map(os.path.getsize, paths)),
+                     "files": len(paths), "cold_load_s": time.perf_counter() - t0, "accuracy": correct / total})
 
+        pooled_path = os.path.join(model_dir, "pooled_model.pkl")
+        t0 = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            _, accuracy = train_pooled_model(frames, sectors, pooled_path)
+        train_s = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        joblib.load(pooled_path)
+        rows.append({"mode": "pooled", "train_s": train_s, "artifact_bytes": os.path.getsize(pooled_path),
+                     "files": 1, "cold_load_s": time.perf_counter() - t0, "accuracy": accuracy})
+    return pd.DataFrame(rows)
 
-def predict_next_signal(ticker):
-    df = fetch_and_prepare(ticker)
-    latest_row = df.iloc[-1]
-    return predict_next_day(latest_row, ticker)
+
+if __name__ == "__main__":
+    from src.ingestion import set_cache, fetch_universe
+    from src.data_cache import OHLCVCache
+    from src.synthetic import synthetic_source
+
+    def synthetic_download(tickers, start, end, interval):
+        return fetch_universe(tickers, start, end, interval, source=synthetic_source())[0]
+
+    universe = [f"SYN{i:02d}.NS" for i in range(50)]
+    with tempfile.TemporaryDirectory() as tmp:
+        set_cache(OHLCVCache(synthetic_download, root=tmp))
+        frames = {t: fetch_and_prepare(t) for t in universe}
+        sectors = {t: f"Sector{i % 5}" for i, t in enumerate(universe)}
+        print(compare_pooled(frames, sectors).to_string(index=False))
@@ -0,0 +1,213 @@
+# model_registry.py
+
+import os
+import time
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from src.tree_pack import load_pack, feature_matrix, INDEX_NAME, PACK_DIR
+
+
+class LatencyHistogram:
+    """
+    Fixed log-spaced buckets (in milliseconds) with count / mean / approximate percentiles.
+    """
+
+    BOUNDS_MS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, float("inf"))
+
+    def __init__(self):
+        self.counts = [0] * len(self.BOUNDS_MS)
+        self.total_ms = 0.0
+        self.count = 0
+
+    def observe(self, seconds):
+        ms = seconds * 1000
+        self.counts[int(np.searchsorted(self.BOUNDS_MS, ms))] += 1
+        self.total_ms += ms
+        self.count += 1
+
+    def percentile(self, q):
+        if not self.count:
+            return None
+        target = q / 100 * self.count
+        running = 0
+        for bound, count in zip(self.BOUNDS_MS, self.counts):
+            running += count
+            if running >= target:
+                return bound
+        return self.BOUNDS_MS[-1]
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "mean_ms": round(self.total_ms / self.count, 4) if self.count else None,
+            "p50_ms": self.percentile(50),
+            "p95_ms": self.percentile(95),
+            "p99_ms": self.percentile(99),
+            "buckets": {f"<={b}": c for b, c in zip(self.BOUNDS_MS, self.counts) if c},
+        }
+
+
+class ModelRegistry:
+    """
+    Loads each ticker's `{ticker}_model.pkl` + `{ticker}_scaler.pkl` once and keeps the
+    pair as one scaler -> model Pipeline in a bounded LRU. An entry is reloaded when
+    either file's mtime or size changes, so retraining is picked up automatically.
+
+    Tickers exported to the NumPy tree pack (`tree_pack.export_models`) with unchanged
+    pickles are scored from the pack instead, without unpickling or importing sklearn.
+    """
+
+    def __init__(self, model_dir, max_models=64):
+        self.model_dir = model_dir
+        self.max_models = max_models
+        self.load_latency = LatencyHistogram()
+        self.inference_latency = LatencyHistogram()
+        self._models = OrderedDict()  # ticker -> (file signature, pipeline)
+        self._pack = (None, None)  # (index file signature, TreePack)
+        self._lock = threading.Lock()
+
+    def _paths(self, ticker):
+        return (os.path.join(self.model_dir, f"{ticker}_model.pkl"),
+                os.path.join(self.model_dir, f"{ticker}_scaler.pkl"))
+
+    def _signature(self, ticker):
+        model_path, scaler_path = self._paths(ticker)
+        if not os.path.exists(model_path) or not os.path.exists(scaler_path):
+            raise FileNotFoundError(f"Model or scaler not found for {ticker}. Please train the model first.")
+        stats = [os.stat(model_path), os.stat(scaler_path)]
+        return tuple((s.st_mtime_ns, s.st_size) for s in stats)
+
+    def signature(self, ticker):
+        """
+        File signature of the saved model, or None if the ticker has not been trained.
+        """
+        try:
+            return self._signature(ticker)
+        except FileNotFoundError:
+            return None
+
+    def get(self, ticker):
+        """
+        Returns the fitted scaler -> model Pipeline for `ticker`.
+        """
+        signature = self._signature(ticker)
+        with self._lock:
+            cached = self._models.get(ticker)
+            if cached and cached[0] == signature:
+                self._models.move_to_end(ticker)
+                return cached[1]
+
+        import joblib
+        from sklearn.pipeline import Pipeline
+
+        started = time.perf_counter()
+        model_path, scaler_path = self._paths(ticker)
+        pipeline = Pipeline([("scaler", joblib.load(scaler_path)), ("model", joblib.load(model_path))])
+        self.load_latency.observe(time.perf_counter() - started)
+
+        with self._lock:
+            self._models[ticker] = (signature, pipeline)
+            self._models.move_to_end(ticker)
+            while len(self._models) > self.max_models:
+                self._models.popitem(last=False)
+        return pipeline
+
+    def pack(self):
+        """
+        The model directory's tree pack (reloaded when re-exported), or None.
+        """
+        index = os.path.join(self.model_dir, PACK_DIR, INDEX_NAME)
+        try:
+            stat = os.stat(index)
+        except FileNotFoundError:
+            return None
+        signature = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            if self._pack[0] != signature:
+                pack = load_pack(self.model_dir)
+                if pack is None:
+                    return None  # unreadable: retried on the next call, pickles used meanwhile
+                self._pack = (signature, pack)
+            return self._pack[1]
+
+    def _packed(self, tickers):
+        """
+        The pack and the tickers it can score (exported from the current pickles).
+        """
+        pack = self.pack()
+        if pack is None:
+            return None, []
+        fresh = []
+        for ticker in tickers:
+            signature = self.signature(ticker)
+            if ticker in pack and signature is not None and pack.signature(ticker) == [list(s) for s in signature]:
+                fresh.append(ticker)
+        return pack, fresh
+
+    def invalidate(self, ticker=None):
+        with self._lock:
+            if ticker is None:
+                self._models.clear()
+            else:
+                self._models.pop(ticker, None)
+
+    def predict(self, ticker, features):
+        """
+        Scores one feature row (Series/dict keyed by feature name, or a 1 x n DataFrame).
+        Returns (prediction, probability of class 1) from a single predict_proba call.
+        """
+        pack, fresh = self._packed([ticker])
+        if fresh:
+            row = features.iloc[0] if isinstance(features, pd.DataFrame) else features
+            _, X = feature_matrix({ticker: row}, pack.features)
+            started = time.perf_counter()
+            pred, prob = pack.predict(fresh, X)
+            self.inference_latency.observe(time.perf_counter() - started)
+            return pred[0], prob[0]
+
+        pipeline = self.get(ticker)
+        X = features if isinstance(features, pd.DataFrame) else pd.DataFrame([features])
+        names = getattr(pipeline, "feature_names_in_", None)
+        X = X[names] if names is not None else X.to_numpy()
+
+        started = time.perf_counter()
+        proba = pipeline.predict_proba(X)[0]
+        self.inference_latency.observe(time.perf_counter() - started)
+
+        # predict() is argmax over predict_proba, so one call gives both
+        pred = pipeline.classes_[proba.argmax()]
+        return pred, proba[1]  # Probability of class 1 (buy)
+
+    def predict_many(self, rows):
+        """
+        Scores {ticker: feature row}. Returns a DataFrame with Ticker, Prediction, Probability
+        (and Error for tickers without a usable model). Packed tickers are scored in one batch.
+        """
+        results = []
+        pack, fresh = self._packed(rows)
+        if fresh:
+            tickers, X = feature_matrix({t: rows[t] for t in fresh}, pack.features)
+            started = time.perf_counter()
+            preds, probs = pack.predict(tickers, X)
+            self.inference_latency.observe(time.perf_counter() - started)
+            results = [{"Ticker": t, "Prediction": int(pred), "Probability": float(prob), "Error": None}
+                       for t, pred, prob in zip(tickers, preds, probs)]
+        packed = set(fresh)
+        for ticker, features in rows.items():
+            if ticker in packed:
+                continue
+            try:
+                pred, prob = self.predict(ticker, features)
+                results.append({"Ticker": ticker, "Prediction": int(pred), "Probability": float(prob), "Error": None})
+            except Exception as e:
+                results.append({"Ticker": ticker, "Prediction": None, "Probability": None, "Error": str(e)})
+        return pd.DataFrame(results, columns=["Ticker", "Prediction", "Probability", "Error"])
+
+    def report(self):
+        return {"cached_models": len(self._models),
+                "load": self.load_latency.summary(),
+                "inference": self.inference_latency.summary()}
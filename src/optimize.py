@@ -0,0 +1,229 @@
+# optimize.py
+
+import os
+import itertools
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from src.indicators import rsi, sma
+from src.pipeline import fingerprint
+from src.vector_backtest import strategy_signals, pair_trades, simulate
+
+RESULTS_PATH = "sweep_results.parquet"
+PARAM_KEYS = ["rsi_length", "oversold", "fast", "slow", "latch"]
+
+_shared = {}
+
+
+# --- 1. Parameter grids & walk-forward splits ---
+def param_grid(rsi_length=(14,), oversold=(30,), fast=(20,), slow=(50,), latch=(True,)):
+    """
+    Cartesian product of the strategy parameters, skipping fast >= slow.
+    """
+    combos = []
+    for values in itertools.product(rsi_length, oversold, fast, slow, latch):
+        params = dict(zip(PARAM_KEYS, values))
+        if params["fast"] < params["slow"]:
+            combos.append(params)
+    return combos
+
+
+def walk_forward_splits(n_bars, n_splits=4, train_bars=504, test_bars=126):
+    """
+    Rolling (train_start, train_end, test_start, test_end) bar ranges, newest split last.
+    With n_splits=0 the whole series is a single in-sample "fold".
+    """
+    if not n_splits:
+        return [(0, n_bars, n_bars, n_bars)]
+    splits = []
+    end = n_bars
+    for _ in range(n_splits):
+        test_start = end - test_bars
+        train_start = test_start - train_bars
+        if train_start < 0:
+            break
+        splits.append((train_start, test_start, test_start, end))
+        end = test_start
+    return splits[::-1]
+
+
+# --- 2. Shared-memory price store ---
+def _pack(prices):
+    """
+    Copies every ticker's Open/Close into one shared-memory block.
+    Returns (SharedMemory, layout) where layout maps ticker -> (offset, length).
+    """
+    total = sum(len(df) for df in prices.values())
+    shm = shared_memory.SharedMemory(create=True, size=max(1, total * 2 * 8))
+    block = np.ndarray((2, total), dtype=np.float64, buffer=shm.buf)
+
+    layout, pos = {}, 0
+    for ticker, df in prices.items():
+        n = len(df)
+        block[0, pos:pos + n] = df["Open"].to_numpy(dtype=np.float64)
+        block[1, pos:pos + n] = df["Close"].to_numpy(dtype=np.float64)
+        layout[ticker] = (pos, n)
+        pos += n
+    return shm, (layout, total)
+
+
+def _attach(name, layout):
+    shm = shared_memory.SharedMemory(name=name)
+    _shared["shm"] = shm
+    _shared["layout"], total = layout
+    _shared["block"] = np.ndarray((2, total), dtype=np.float64, buffer=shm.buf)
+
+
+def _prices(ticker):
+    offset, n = _shared["layout"][ticker]
+    block = _shared["block"]
+    return block[0, offset:offset + n], block[1, offset:offset + n]
+
+
+# --- 3. Worker ---
+def _score(open_, close, signals, cash, commission):
+    entries, exits = pair_trades(signals["buy"], signals["sell"])
+    sizes, closed, equity = simulate(open_, close, entries, exits, cash, commission)
+    done = closed & (sizes > 0)
+    pnl = sizes[done] * (open_[exits[done]] - open_[entries[done]])
+
+    daily = np.diff(equity) / equity[:-1] if len(equity) > 1 else np.zeros(0)
+    std = daily.std()
+    return {
+        "return_pct": (equity[-1] / cash - 1) * 100 if len(equity) else 0.0,
+        "max_drawdown_pct": (1 - equity / np.maximum.accumulate(equity)).max() * 100 if len(equity) else 0.0,
+        "sharpe": daily.mean() / std * np.sqrt(252) if std > 0 else 0.0,
+        "trades": int(done.sum()),
+        "win_rate": float((pnl > 0).mean() * 100) if done.any() else np.nan,
+    }
+
+
+def _run_task(ticker, fold, split, combos, cash, commission):
+    """
+    Evaluates every parameter combo for one (ticker, fold). Indicators are computed once
+    per distinct window on the full history, so the split windows keep their warm-up.
+    """
+    open_, close = _prices(ticker)
+    rsi_cache = {length: rsi(close, length) for length in {c["rsi_length"] for c in combos}}
+    sma_cache = {length: sma(close, length) for length in {c[k] for c in combos for k in ("fast", "slow")}}
+
+    train_start, train_end, test_start, test_end = split
+    rows = []
+    for params in combos:
+        for phase, (a, b) in (("train", (train_start, train_end)), ("test", (test_start, test_end))):
+            if b - a < 2:
+                continue
+            signals = strategy_signals(close[a:b], params["rsi_length"], params["oversold"],
+                                       params["fast"], params["slow"], latch=params["latch"],
+                                       rsi_values=rsi_cache[params["rsi_length"]][a:b],
+                                       fast_values=sma_cache[params["fast"]][a:b],
+                                       slow_values=sma_cache[params["slow"]][a:b])
+            row = {"ticker": ticker, "fold": fold, "phase": phase, **params}
+            row.update(_score(open_[a:b], close[a:b], signals, cash, commission))
+            rows.append(row)
+    return rows
+
+
+# --- 4. Sweep driver ---
+def _sweep_signature(prices, combos, *settings):
+    """
+    Hash of everything a journal row depends on: the grid, the Open/Close data and the
+    split / cost settings.
+    """
+    data = [(ticker, fingerprint(df[["Open", "Close"]])) for ticker, df in sorted(prices.items())]
+    return fingerprint(repr((combos, data, settings)))
+
+
+def _rank(results):
+    """
+    Ranks parameter combos by their mean out-of-sample (or in-sample, without folds) Sharpe.
+    """
+    phase = "test" if (results["phase"] == "test").any() else "train"
+    scored = results[results["phase"] == phase]
+    ranking = (scored.groupby(PARAM_KEYS)["sharpe"].mean()
+               .rank(ascending=False, method="min").rename("rank").reset_index())
+    results = results.merge(ranking, on=PARAM_KEYS, how="left")
+    return results.sort_values(["rank", "ticker", "fold", "phase"]).reset_index(drop=True)
+
+
+def walk_forward_summary(results):
+    """
+    For each (ticker, fold) picks the combo with the best in-sample Sharpe and reports
+    how that choice did on the following out-of-sample window.
+    """
+    train = results[results["phase"] == "train"]
+    test = results[results["phase"] == "test"]
+    best = train.loc[train.groupby(["ticker", "fold"])["sharpe"].idxmax(), ["ticker", "fold"] + PARAM_KEYS]
+    return best.merge(test, on=["ticker", "fold"] + PARAM_KEYS, how="left", suffixes=("", "_test"))
+
+
+def run_sweep(prices, combos, n_splits=0, train_bars=504, test_bars=126,
+              results_path=RESULTS_PATH, max_workers=None, cash=10000, commission=0.002):
+    """
+    Fans (ticker x fold) tasks out over a process pool; each task scores every combo.
+
+    `prices` maps ticker -> DataFrame with Open/Close columns. Finished tasks are appended
+    to a journal next to `results_path`, so an interrupted sweep resumes where it stopped;
+    journal rows carry a signature of the grid, data and settings, and a journal written
+    by a different sweep is discarded rather than resumed.
+    The ranked results end up in the single Parquet file `results_path`.
+    """
+    journal_path = results_path + ".journal.csv"
+    signature = _sweep_signature(prices, combos, n_splits, train_bars, test_bars, cash, commission)
+    done = set()
+    if os.path.exists(journal_path):
+        journal = pd.read_csv(journal_path)
+        if "signature" in journal and (journal["signature"] == signature).all():
+            done = set(zip(journal["ticker"], journal["fold"]))
+            print(f" Resuming sweep: {len(done)} (ticker, fold) tasks already done")
+        else:
+            print(" Discarding sweep journal from a different grid, data window or settings")
+            os.remove(journal_path)
+
+    tasks = []
+    for ticker, df in prices.items():
+        for fold, split in enumerate(walk_forward_splits(len(df), n_splits, train_bars, test_bars)):
+            if (ticker, fold) not in done:
+                tasks.append((ticker, fold, split))
+
+    shm, layout = _pack(prices)
+    try:
+        with ProcessPoolExecutor(max_workers=max_workers or os.cpu_count(),
+                                 initializer=_attach, initargs=(shm.name, layout)) as pool:
+            futures = [pool.submit(_run_task, ticker, fold, split, combos, cash, commission)
+                       for ticker, fold, split in tasks]
+            for future in as_completed(futures):
+                rows = pd.DataFrame(future.result()).assign(signature=signature)
+                rows.to_csv(journal_path, mode="a", index=False, header=not os.path.exists(journal_path))
+    finally:
+        shm.close()
+        shm.unlink()
+
+    if not os.path.exists(journal_path):
+        print(" No sweep results produced.")
+        return pd.DataFrame()
+    results = _rank(pd.read_csv(journal_path).drop(columns="signature"))
+    results.to_parquet(results_path, index=False)
+    os.remove(journal_path)
+    print(f" Saved {len(results)} sweep results to {results_path}")
+    return results
+
+
+if __name__ == "__main__":
+    import time
+    import tempfile
+    from src.synthetic import synthetic_bars
+
+    universe = [f"SYN{i:02d}.NS" for i in range(20)]
+    prices = {t: synthetic_bars(t, "2015-01-01", "2025-01-01") for t in universe}
+    combos = param_grid(rsi_length=(7, 14, 21), oversold=(25, 30, 35), fast=(10, 20), slow=(50, 100))
+
+    t0 = time.perf_counter()
+    with tempfile.TemporaryDirectory() as tmp:
+        results = run_sweep(prices, combos, n_splits=4, results_path=os.path.join(tmp, "sweep_demo.parquet"))
+    print(f"{len(combos)} combos x {len(universe)} tickers in {time.perf_counter() - t0:.2f}s")
+    print(results[results["phase"] == "test"].groupby("rank")[["sharpe", "return_pct"]].mean().head())
+    print(walk_forward_summary(results).head())
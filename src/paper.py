@@ -0,0 +1,430 @@
+# paper.py
+
+import time
+import asyncio
+
+import numpy as np
+import pandas as pd
+
+from src.streaming import StreamingSignalGenerator, FeatureStream
+from src.instrument import span, count
+
+PRICE_COLS = ["Open", "High", "Low", "Close", "Volume"]
+TRADE_COLS = ["Ticker", "Size", "EntryTime", "ExitTime", "EntryPrice", "ExitPrice", "PnL", "ReturnPct"]
+
+
+# --- 1. Events ---
+class Bar:
+    __slots__ = ("ticker", "time", "open", "high", "low", "close", "volume", "emitted_ns")
+
+    def __init__(self, ticker, time, open, high, low, close, volume, emitted_ns):
+        self.ticker = ticker
+        self.time = time
+        self.open = open
+        self.high = high
+        self.low = low
+        self.close = close
+        self.volume = volume
+        self.emitted_ns = emitted_ns
+
+
+class Order:
+    """
+    A market order. Buys carry no size: like `Strategy.buy()` they are sized at the fill,
+    from the cash available then. Sells close the whole position.
+    """
+
+    __slots__ = ("id", "ticker", "side", "signal_time", "probability",
+                 "emitted_ns", "created_ns", "accepted_ns", "status")
+
+    def __init__(self, id, ticker, side, bar, probability=None):
+        self.id = id
+        self.ticker = ticker
+        self.side = side
+        self.signal_time = bar.time
+        self.probability = probability
+        self.emitted_ns = bar.emitted_ns  # when the feed published the signal bar
+        self.created_ns = time.perf_counter_ns()
+        self.accepted_ns = None
+        self.status = "new"
+
+
+# --- 2. Replay feed ---
+class ReplayFeed:
+    """
+    Replays stored bars (a long Date/Ticker frame) in timestamp order, one tick = every
+    ticker's bar for one timestamp.
+
+    `speed` is market time per wall time (1 = real time, 3600 = one market hour per second).
+    Closed-market gaps (longer than `max_gap`, by default the usual bar spacing) are replayed
+    as one bar spacing. `speed=None` replays as fast as the engine consumes: each tick waits
+    until the previous one's orders reached the broker, so fills land on the next bar as in
+    a backtest.
+    """
+
+    def __init__(self, bars, speed=None, max_gap=None):
+        bars = bars.sort_values("Date", kind="stable")
+        self.speed = speed
+        self.tickers = bars["Ticker"].to_numpy()
+        dates = pd.DatetimeIndex(bars["Date"])
+        self.values = bars[PRICE_COLS].to_numpy(dtype=np.float64).tolist()
+        starts = np.flatnonzero(np.r_[True, dates[1:] != dates[:-1]])
+        self.bounds = list(zip(starts, np.r_[starts[1:], len(bars)]))
+        self.times = dates[starts].to_pydatetime()
+
+        # Market clock: seconds since the first tick with closed-market gaps squeezed out
+        gaps = np.diff(dates[starts].asi8) / 1e9
+        if max_gap is None:
+            max_gap = np.median(gaps) if len(gaps) else 0.0
+        self.clock = np.r_[0.0, np.cumsum(np.minimum(gaps, max_gap))]
+
+    @property
+    def lockstep(self):
+        return self.speed is None
+
+    def __len__(self):
+        return len(self.tickers)
+
+    @classmethod
+    def from_store(cls, tickers, start, end, interval="1d", speed=None):
+        """
+        Bars from the local OHLCV cache (`ingestion.fetch_data`).
+        """
+        from src.ingestion import fetch_data
+
+        return cls(fetch_data(tickers, start=start, end=end, interval=interval), speed)
+
+    @classmethod
+    def from_minutes(cls, store, tickers, start=None, end=None, speed=None):
+        """
+        Bars from the memory-mapped minute store (`intraday.MinuteStore`).
+        """
+        frames = []
+        for ticker in tickers:
+            df = store.load(ticker, start, end).to_frame()
+            df.index.name = "Date"
+            frames.append(df.reset_index().assign(Ticker=ticker))
+        return cls(pd.concat(frames, ignore_index=True), speed)
+
+    async def ticks(self):
+        started = time.perf_counter()
+        for k, (lo, hi) in enumerate(self.bounds):
+            if self.speed is not None:
+                delay = started + self.clock[k] / self.speed - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            emitted = time.perf_counter_ns()
+            when = self.times[k]
+            yield [Bar(self.tickers[i], when, *self.values[i], emitted) for i in range(lo, hi)]
+
+
+# --- 3. Simulated broker ---
+class SimulatedBroker:
+    """
+    Accepts orders after `latency` seconds and fills each on its ticker's next bar at the
+    open, moved against the order by `slippage` (a fraction: 0.0005 = 5 bps). Commission is
+    charged on both legs like `Backtest(commission=0.002)`. One shared cash pool; a buy is
+    sized to `position_size` of equity, capped by the cash left.
+    """
+
+    def __init__(self, cash=100_000, commission=0.002, slippage=0.0005, latency=0.0, position_size=0.1):
+        self.cash = float(cash)
+        self.commission = commission
+        self.slippage = slippage
+        self.latency = latency
+        self.position_size = position_size
+        self.pending = {}    # ticker -> accepted order waiting for the next bar
+        self.positions = {}  # ticker -> [size, entry price, entry time]
+        self.last = {}       # ticker -> last close of held tickers
+        self.fills = []
+        self.trades = []
+        self.rejected = 0
+
+    async def submit(self, order):
+        await asyncio.sleep(self.latency)
+        order.accepted_ns = time.perf_counter_ns()
+        held = order.ticker in self.positions
+        queued = self.pending.get(order.ticker)
+        if order.side == "buy" and not held and queued is None:
+            order.status = "accepted"
+            self.pending[order.ticker] = order
+        elif order.side == "sell" and queued is not None and queued.side == "buy":
+            queued.status = order.status = "cancelled"  # sold before the buy filled
+            del self.pending[order.ticker]
+        elif order.side == "sell" and held and queued is None:
+            order.status = "accepted"
+            self.pending[order.ticker] = order
+        else:
+            order.status = "rejected"
+            self.rejected += 1
+        return order
+
+    def equity(self):
+        return self.cash + sum(size * self.last[t] for t, (size, _, _) in self.positions.items())
+
+    def on_bar(self, bar):
+        """
+        Fills the ticker's pending order at this bar's open, then marks the position.
+        A bar without an open (NaN) leaves the order pending; one without a close keeps
+        the previous mark.
+        """
+        order = self.pending.get(bar.ticker) if self.pending else None
+        if order is not None and bar.open == bar.open:
+            del self.pending[bar.ticker]
+            self._fill(order, bar)
+        if bar.ticker in self.positions and bar.close == bar.close:
+            self.last[bar.ticker] = bar.close
+
+    def _fill(self, order, bar):
+        if order.side == "buy":
+            price = bar.open * (1 + self.slippage)
+            budget = min(self.equity() * self.position_size, self.cash)
+            size = int(budget // (price * (1 + self.commission)))
+            if size <= 0:
+                order.status = "rejected"
+                self.rejected += 1
+                return
+            self.cash -= size * price * (1 + self.commission)
+            self.positions[bar.ticker] = [size, price, bar.time]
+            self.last[bar.ticker] = bar.close
+        else:
+            price = bar.open * (1 - self.slippage)
+            size, entry_price, entry_time = self.positions.pop(bar.ticker)
+            del self.last[bar.ticker]
+            self.cash += size * price * (1 - self.commission)
+            pnl = size * (price - entry_price) - size * (entry_price + price) * self.commission
+            self.trades.append((bar.ticker, size, entry_time, bar.time, entry_price, price,
+                                pnl, pnl / (size * entry_price)))
+        order.status = "filled"
+        self.fills.append((order.id, bar.ticker, order.side, size, price, order.signal_time, bar.time,
+                           time.perf_counter_ns() - order.emitted_ns))
+
+
+# --- 4. Engine ---
+class PaperEngine:
+    """
+    Feed -> strategy runner -> order manager -> broker, as asyncio tasks joined by queues.
+
+    The runner keeps one StreamingSignalGenerator per ticker (MyStrategy's rules; `latch=False`
+    is BotStrategy) and turns its buy / sell events into orders. With `use_model=True` a
+    FeatureStream per ticker is kept too and a buy is only sent when `predict_next_day` gives
+    class 1 a probability of at least `min_probability` (tickers without a model trade unfiltered).
+    """
+
+    def __init__(self, feed, broker=None, rsi_length=14, oversold=30, fast=20, slow=50, latch=True,
+                 use_model=False, min_probability=0.5, queue_size=1024):
+        self.feed = feed
+        self.broker = broker or SimulatedBroker()
+        self.params = dict(rsi_length=rsi_length, oversold=oversold, fast=fast, slow=slow, latch=latch)
+        self.use_model = use_model
+        self.min_probability = min_probability
+        self.queue_size = queue_size
+        self.signals = {}
+        self.features = {}
+        self.rows = {}  # ticker -> latest FEATURE_COLS row
+        self.orders = []
+        self.equity = []
+        self.stats = {"bars": 0, "ticks": 0, "filtered": 0, "model_errors": 0}
+        self.wall_seconds = None
+        if use_model:
+            from src.ml_model import predict_next_day
+            self._predict = predict_next_day
+
+    def _score(self, ticker):
+        try:
+            return float(self._predict(pd.Series(self.rows[ticker]), ticker)[1])
+        except Exception:
+            self.stats["model_errors"] += 1
+            return None
+
+    async def _run_strategy(self, bars, orders):
+        broker = self.broker
+        while True:
+            tick = await bars.get()
+            if tick is None:
+                bars.task_done()
+                return
+            for bar in tick:
+                broker.on_bar(bar)
+                generator = self.signals.get(bar.ticker)
+                if generator is None:
+                    generator = self.signals[bar.ticker] = StreamingSignalGenerator(**self.params)
+                    if self.use_model:
+                        self.features[bar.ticker] = FeatureStream()
+                if self.use_model:
+                    self.rows[bar.ticker] = self.features[bar.ticker].update(bar.high, bar.low, bar.close)
+                for event in generator.update(bar.close, bar.time):
+                    if event["type"] in ("buy", "sell"):
+                        self._signal(bar, event["type"], orders)
+            self.stats["bars"] += len(tick)
+            self.stats["ticks"] += 1
+            self.equity.append((tick[0].time, broker.equity()))
+            bars.task_done()
+
+    def _signal(self, bar, side, orders):
+        probability = None
+        if side == "buy" and self.use_model:
+            probability = self._score(bar.ticker)
+            if probability is not None and probability < self.min_probability:
+                self.stats["filtered"] += 1
+                return
+        order = Order(len(self.orders), bar.ticker, side, bar, probability)
+        self.orders.append(order)
+        orders.put_nowait(order)
+
+    async def _manage_orders(self, orders):
+        inflight = set()
+
+        async def send(order):
+            try:
+                await self.broker.submit(order)
+            except Exception as e:
+                if not self._failed.done():
+                    self._failed.set_exception(e)
+            finally:
+                orders.task_done()
+
+        while True:
+            order = await orders.get()
+            task = asyncio.create_task(send(order))
+            inflight.add(task)
+            task.add_done_callback(inflight.discard)
+
+    @staticmethod
+    async def _until(awaitable, *watched):
+        """
+        Awaits `awaitable` unless one of the `watched` tasks finishes first; then re-raises
+        its exception, so a dead consumer fails the run instead of leaving a join hanging.
+        """
+        waiter = asyncio.ensure_future(awaitable)
+        await asyncio.wait({waiter, *watched}, return_when=asyncio.FIRST_COMPLETED)
+        if waiter.done():
+            return waiter.result()
+        waiter.cancel()
+        _raise_stopped(watched)
+
+    async def run(self):
+        bars, orders = asyncio.Queue(self.queue_size), asyncio.Queue()
+        self._failed = asyncio.get_running_loop().create_future()  # first broker.submit error
+        manager = asyncio.create_task(self._manage_orders(orders))
+        strategy = asyncio.create_task(self._run_strategy(bars, orders))
+        started = time.perf_counter()
+        try:
+            with span("paper.run", bars=len(self.feed)):
+                async for tick in self.feed.ticks():
+                    if strategy.done() or self._failed.done():
+                        _raise_stopped((strategy, self._failed))
+                    if bars.full():
+                        await self._until(bars.put(tick), strategy, self._failed)
+                    else:
+                        bars.put_nowait(tick)
+                    if self.feed.lockstep:
+                        await self._until(bars.join(), strategy, self._failed)
+                        await self._until(orders.join(), self._failed)
+                await self._until(bars.put(None), strategy, self._failed)
+                await strategy
+                await self._until(orders.join(), self._failed)
+                if self._failed.done():
+                    self._failed.result()
+        finally:
+            manager.cancel()
+            strategy.cancel()
+        self.wall_seconds = time.perf_counter() - started
+        count("paper.bars", self.stats["bars"])
+        count("paper.orders", len(self.orders))
+        return self.report()
+
+    def trades(self):
+        return pd.DataFrame(self.broker.trades, columns=TRADE_COLS)
+
+    def fills(self):
+        return pd.DataFrame(self.broker.fills, columns=["Order", "Ticker", "Side", "Size", "Price",
+                                                        "SignalTime", "FillTime", "Latency (ns)"])
+
+    def report(self):
+        """
+        Throughput and latency percentiles (microseconds): `decision` is bar published ->
+        order created, `signal_to_order` is bar published -> order accepted by the broker.
+        """
+        accepted = [o for o in self.orders if o.accepted_ns is not None]
+        decision = np.array([o.created_ns - o.emitted_ns for o in self.orders]) / 1e3
+        to_order = np.array([o.accepted_ns - o.emitted_ns for o in accepted]) / 1e3
+        wall = self.wall_seconds or float("nan")
+        return {
+            **self.stats,
+            "orders": len(self.orders),
+            "fills": len(self.broker.fills),
+            "rejected": self.broker.rejected,
+            "trades": len(self.broker.trades),
+            "wall_seconds": wall,
+            "bars_per_second": self.stats["bars"] / wall,
+            "equity": self.broker.equity(),
+            "decision_us": _percentiles(decision),
+            "signal_to_order_us": _percentiles(to_order),
+        }
+
+
+def _raise_stopped(tasks):
+    for task in tasks:
+        if task.done():
+            task.result()
+    raise RuntimeError("paper engine task stopped before the replay finished")
+
+
+def _percentiles(values):
+    if not len(values):
+        return None
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {"p50": round(float(p50), 1), "p95": round(float(p95), 1), "p99": round(float(p99), 1),
+            "max": round(float(values.max()), 1)}
+
+
+def run_paper(feed, **kwargs):
+    """
+    Runs a PaperEngine over `feed` to completion; returns the engine (report, trades, fills).
+    """
+    engine = PaperEngine(feed, **kwargs)
+    asyncio.run(engine.run())
+    return engine
+
+
+if __name__ == "__main__":
+    from src.vector_backtest import run_vectorized
+    from src.synthetic import synthetic_bars, synthetic_universe
+
+    # Parity: one ticker, lockstep, no slippage, all-in sizing == the backtest's closed trades
+    df = synthetic_bars("SYN.NS", "2000-01-01", "2025-01-01")
+    feed = ReplayFeed(df.reset_index().rename(columns={df.index.name or "index": "Date"}).assign(Ticker="SYN.NS"))
+    engine = run_paper(feed, broker=SimulatedBroker(cash=10000, slippage=0.0, position_size=1.0))
+    _, expected = run_vectorized(df)
+    expected = expected.dropna(subset=["ExitPrice"]).reset_index(drop=True)
+    trades = engine.trades()
+    same = (len(trades) == len(expected)
+            and (trades["EntryTime"].to_numpy() == expected["EntryTime"].to_numpy()).all()
+            and (trades["ExitTime"].to_numpy() == expected["ExitTime"].to_numpy()).all()
+            and (trades["Size"].to_numpy() == expected["Size"].to_numpy()).all()
+            and np.allclose(trades["PnL"], expected["PnL"]))
+    print(f"Parity vs run_vectorized: {len(trades)} trades | same entries, exits, sizes, PnL: {same}")
+
+    # Throughput: many tickers replayed as fast as possible
+    long, _ = synthetic_universe(500, 1000)
+    engine = run_paper(ReplayFeed(long), broker=SimulatedBroker(cash=1_000_000))
+    report = engine.report()
+    print(f"Lockstep: {report['bars']:,} bars / {report['ticks']} ticks in {report['wall_seconds']:.2f}s "
+          f"({report['bars_per_second']:,.0f} bars/s) | {report['orders']} orders, {report['fills']} fills, "
+          f"{report['trades']} trades | equity {report['equity']:,.0f}")
+    print(f"  decision {report['decision_us']} | signal->order {report['signal_to_order_us']}")
+
+    # Paced: minute bars at 6000x arrive every 10ms of wall time. A 2ms broker acknowledges
+    # before the next bar, so orders fill on it; a 15ms broker is slower than the bar
+    # spacing, so its acknowledgements arrive late and the fills slip to later bars.
+    long, _ = synthetic_universe(200, 390 * 2, interval="1m")
+    for latency in (0.002, 0.015):
+        engine = run_paper(ReplayFeed(long, speed=6000), broker=SimulatedBroker(cash=1_000_000, latency=latency))
+        report = engine.report()
+        fills = engine.fills()
+        lag = (fills["FillTime"] - fills["SignalTime"]).dt.total_seconds().div(60)
+        print(f"Paced x6000, {latency * 1000:.0f}ms broker: {report['bars']:,} bars in {report['wall_seconds']:.2f}s "
+              f"({report['bars_per_second']:,.0f} bars/s) | {report['orders']} orders | "
+              f"fills on the bar after the signal: {(lag <= 1).mean():.0%}")
+        print(f"  decision {report['decision_us']} | signal->order {report['signal_to_order_us']}")
@@ -0,0 +1,108 @@
+# parallel.py
+
+import os
+import threading
+import contextlib
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor
+
+from threadpoolctl import threadpool_limits
+
+# The state of the one map a pool process serves (never used in the host process)
+_pool_state = {}
+
+# threadpool_limits is process-wide: concurrent in-process maps share one limit
+_blas_lock = threading.Lock()
+_blas = {"users": 0, "limits": None}
+
+
+def _init_worker(state):
+    # A pool process lives only for one map, so its BLAS limit can stay for good
+    _pool_state["limits"] = threadpool_limits(limits=1)
+    _pool_state["state"] = state
+
+
+def _call_pooled(func, job):
+    return func(_pool_state["state"], job)
+
+
+@contextlib.contextmanager
+def _single_threaded_blas():
+    """
+    Limits BLAS to one thread while any in-process map runs; the last one out restores it.
+    """
+    with _blas_lock:
+        if _blas["users"] == 0:
+            _blas["limits"] = threadpool_limits(limits=1)
+        _blas["users"] += 1
+    try:
+        yield
+    finally:
+        with _blas_lock:
+            _blas["users"] -= 1
+            if _blas["users"] == 0:
+                _blas["limits"].restore_original_limits()
+                _blas["limits"] = None
+
+
+def worker_map(func, jobs, state, max_workers=None):
+    """
+    Yields `func(state, job)` for every job, in order.
+
+    The budget is `max_workers` single-threaded-BLAS processes (default: one per core),
+    each receiving `state` once through its initializer. With a budget of one the jobs run
+    in the calling thread instead, with BLAS limited only while the map runs; `state` is
+    passed to every call rather than stored globally, so concurrent maps (two training jobs
+    on the JobRunner) never see each other's data.
+    """
+    workers = max(1, min(max_workers or os.cpu_count(), len(jobs) or 1))
+    if workers == 1:
+        with _single_threaded_blas():
+            yield from map(partial(func, state), jobs)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(state,)) as pool:
+        yield from pool.map(partial(_call_pooled, func), jobs,
+                            chunksize=max(1, len(jobs) // (workers * 4)))
+
+
+if __name__ == "__main__":
+    import sys
+    import numpy as np
+    from threadpoolctl import threadpool_info
+
+    def blas_threads():
+        return [pool["num_threads"] for pool in threadpool_info()]
+
+    def scaled(state, job):
+        return float(state["matrix"][job].sum() * state["factor"])
+
+    state = {"matrix": np.arange(12.0).reshape(4, 3), "factor": 2}
+    expected = [6.0, 24.0, 42.0, 60.0]
+    before = blas_threads()
+    in_process = list(worker_map(scaled, range(4), state, max_workers=1))
+    pooled = list(worker_map(scaled, range(4), state, max_workers=2))
+
+    # Two threads mapping in-process at once, each with its own state
+    results = {}
+
+    def run(factor):
+        own = {"matrix": state["matrix"], "factor": factor}
+        results[factor] = [list(worker_map(scaled, range(4), own, max_workers=1)) for _ in range(200)]
+
+    threads = [threading.Thread(target=run, args=(factor,)) for factor in (2, 3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    checks = {
+        "in-process": in_process == expected,
+        "pool": pooled == expected,
+        "concurrent in-process maps": all(r == [v * factor / 2 for v in expected]
+                                          for factor, runs in results.items() for r in runs),
+        "BLAS threads restored": blas_threads() == before,
+    }
+    for name, ok in checks.items():
+        print(f"{'ok  ' if ok else 'FAIL'} {name}")
+    sys.exit(0 if all(checks.values()) else 1)
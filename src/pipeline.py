@@ -0,0 +1,335 @@
+# pipeline.py
+
+import os
+import json
+import time
+import hashlib
+import threading
+from datetime import datetime
+from zoneinfo import ZoneInfo
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import numpy as np
+import pandas as pd
+
+from src.instrument import span, count
+
+STATE_PATH = "pipeline_state.json"
+RAN, SKIPPED, FAILED, BLOCKED = "ran", "skipped", "failed", "blocked"
+
+# NSE equity-segment trading holidays (weekdays only). Extend this list every year,
+# or pass `holidays=` to MarketCalendar; a calendar refuses days in years it has no list for.
+NSE_HOLIDAYS = [
+    "2025-02-26", "2025-03-14", "2025-03-31", "2025-04-10", "2025-04-14", "2025-04-18",
+    "2025-05-01", "2025-08-15", "2025-08-27", "2025-10-02", "2025-10-21", "2025-10-22",
+    "2025-11-05", "2025-12-25",
+    "2026-01-26", "2026-03-03", "2026-03-26", "2026-03-31", "2026-04-03", "2026-04-14",
+    "2026-05-01", "2026-05-28", "2026-06-26", "2026-09-14", "2026-10-02", "2026-10-20",
+    "2026-11-10", "2026-11-24", "2026-12-25",
+]
+
+
+def fingerprint(value):
+    """
+    Stable content hash of a stage output (DataFrames hashed by value, not identity).
+    """
+    digest = hashlib.blake2b(digest_size=12)
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        digest.update(str(list(value.columns) if isinstance(value, pd.DataFrame) else value.name).encode())
+        digest.update(pd.util.hash_pandas_object(value, index=True).to_numpy().tobytes())
+    elif isinstance(value, np.ndarray):
+        digest.update(str(value.shape).encode())
+        digest.update(np.ascontiguousarray(value).tobytes())
+    else:
+        digest.update(repr(value).encode())
+    return digest.hexdigest()
+
+
+# --- 1. Stages & DAG ---
+class Stage:
+    """
+    One step of a pipeline: `func(inputs)` receives {artifact name: value} for its declared
+    `inputs` and returns {artifact name: value} for its declared `outputs`.
+
+    A cached stage is skipped when the fingerprints of its inputs (and its `version`) are
+    the same as in its last successful run; its outputs then keep their stored
+    fingerprints, which downstream stages receive in place of the values. So cached stages
+    should publish tokens (a model signature, a table digest) for what they persisted, and
+    only `cache=False` source stages should hand real data downstream.
+    """
+
+    def __init__(self, name, func, inputs=(), outputs=(), cache=True, version="1"):
+        self.name = name
+        self.func = func
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.cache = cache
+        self.version = version
+
+
+class Pipeline:
+    """
+    Runs Stages as a DAG on a thread pool: a stage starts as soon as every stage producing
+    its inputs has finished, so independent (e.g. per-ticker) branches run concurrently.
+    Input fingerprints per stage are kept in `state_path` between runs; a failed stage
+    blocks its dependents and is retried on the next run.
+    """
+
+    def __init__(self, stages, state_path=STATE_PATH, max_workers=4):
+        self.stages = {stage.name: stage for stage in stages}
+        if len(self.stages) != len(stages):
+            raise ValueError("Stage names must be unique")
+        self.state_path = state_path
+        self.max_workers = max_workers
+
+        self.producer = {}
+        for stage in stages:
+            for output in stage.outputs:
+                if output in self.producer:
+                    raise ValueError(f"Artifact {output} is produced by {self.producer[output]} and {stage.name}")
+                self.producer[output] = stage.name
+        missing = {i for stage in stages for i in stage.inputs if i not in self.producer}
+        if missing:
+            raise ValueError(f"No stage produces {sorted(missing)}")
+        self.depends = {stage.name: {self.producer[i] for i in stage.inputs} for stage in stages}
+        self.order = self._toposort()
+
+    def _toposort(self):
+        order, done, visiting = [], set(), set()
+
+        def visit(name):
+            if name in done:
+                return
+            if name in visiting:
+                raise ValueError(f"Cycle through stage {name}")
+            visiting.add(name)
+            for dep in sorted(self.depends[name]):
+                visit(dep)
+            visiting.discard(name)
+            done.add(name)
+            order.append(name)
+
+        for name in self.stages:
+            visit(name)
+        return order
+
+    def _load_state(self):
+        if not os.path.exists(self.state_path):
+            return {}
+        with open(self.state_path) as f:
+            return json.load(f)
+
+    def _save_state(self, state):
+        folder = os.path.dirname(self.state_path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        with open(self.state_path + ".tmp", "w") as f:
+            json.dump(state, f, indent=2)
+        os.replace(self.state_path + ".tmp", self.state_path)
+
+    def _execute(self, stage, values, prints, state, force):
+        """
+        Runs or skips one stage. Returns (status, outputs, output fingerprints, seconds, error).
+        """
+        started = time.perf_counter()
+        key = fingerprint([stage.version] + [(i, prints[i]) for i in stage.inputs])
+        previous = state.get(stage.name)
+        if stage.cache and not force and previous and previous["key"] == key:
+            count("pipeline.skipped")
+            outputs = dict(previous["outputs"])
+            return SKIPPED, outputs, outputs, time.perf_counter() - started, None
+        try:
+            with span(f"stage.{stage.name}"):
+                outputs = stage.func({i: values[i] for i in stage.inputs}) or {}
+            missing = [o for o in stage.outputs if o not in outputs]
+            if missing:
+                raise ValueError(f"{stage.name} did not return {missing}")
+            output_prints = {o: fingerprint(outputs[o]) for o in stage.outputs}
+            state[stage.name] = {"key": key, "outputs": output_prints}
+            return RAN, outputs, output_prints, time.perf_counter() - started, None
+        except Exception as e:
+            return FAILED, {}, {}, time.perf_counter() - started, f"{type(e).__name__}: {e}"
+
+    def run(self, force=False, only=None):
+        """
+        Runs the DAG once (`only`: stage names to run, plus everything they depend on).
+        Returns a DataFrame with one row per stage: Stage, Status, Seconds, Started, Error.
+        """
+        names = set(self.stages)
+        if only is not None:
+            names, frontier = set(), list(only)
+            while frontier:
+                name = frontier.pop()
+                if name not in names:
+                    names.add(name)
+                    frontier.extend(self.depends[name])
+
+        state = self._load_state()
+        values, prints, status, rows = {}, {}, {}, []
+        pending = [name for name in self.order if name in names]
+        run_started = time.time()
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="stage") as pool:
+            running = {}
+            while pending or running:
+                for name in list(pending):
+                    deps = self.depends[name]
+                    if not deps <= status.keys():
+                        continue
+                    pending.remove(name)
+                    if any(status[d] in (FAILED, BLOCKED) for d in deps):
+                        status[name] = BLOCKED
+                        rows.append({"Stage": name, "Status": BLOCKED, "Seconds": 0.0,
+                                     "Started": time.time(), "Error": "upstream failure"})
+                        continue
+                    inputs = {i: values[i] for i in self.stages[name].inputs}
+                    input_prints = {i: prints[i] for i in self.stages[name].inputs}
+                    future = pool.submit(self._execute, self.stages[name], inputs, input_prints, state, force)
+                    running[future] = (name, time.time())
+                if not running:
+                    continue
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name, started = running.pop(future)
+                    result, outputs, output_prints, seconds, error = future.result()
+                    values.update(outputs)
+                    prints.update(output_prints)
+                    status[name] = result
+                    rows.append({"Stage": name, "Status": result, "Seconds": seconds,
+                                 "Started": started, "Error": error})
+
+        self._save_state(state)
+        report = pd.DataFrame(rows, columns=["Stage", "Status", "Seconds", "Started", "Error"])
+        report["Started"] = pd.to_datetime(report["Started"], unit="s")
+        report.attrs["run_started"] = pd.Timestamp(run_started, unit="s")
+        return report
+
+
+def run_summary(report):
+    counts = report["Status"].value_counts()
+    return {"Ran": int(counts.get(RAN, 0)), "Skipped": int(counts.get(SKIPPED, 0)),
+            "Failed": int(counts.get(FAILED, 0)), "Blocked": int(counts.get(BLOCKED, 0)),
+            "Seconds": float(report["Seconds"].sum())}
+
+
+def record_run(sinks, report, run_id=None):
+    """
+    Persists a run: one `pipeline_stages` row per stage and one `pipeline_runs` summary row.
+    """
+    run_id = run_id or report.attrs.get("run_started", pd.Timestamp.now()).strftime("%Y%m%d-%H%M%S")
+    sinks.write("pipeline_stages", report.assign(RunId=run_id), keys=("RunId", "Stage"))
+    summary = pd.DataFrame([{"RunId": run_id, "Started": report.attrs.get("run_started"), **run_summary(report)}])
+    sinks.write("pipeline_runs", summary, keys=("RunId",))
+    return run_id
+
+
+# --- 2. Market-calendar schedule ---
+class MarketCalendar:
+    """
+    Trading days (weekdays minus `holidays`) of one exchange, and the daily run time
+    `run_at` in the exchange's time zone (default: after the NSE close).
+
+    Only `years` (default: the years `holidays` covers) are known; asking about any other
+    year raises ValueError rather than treating its holidays as trading days.
+    """
+
+    def __init__(self, holidays=NSE_HOLIDAYS, run_at="16:00", tz="Asia/Kolkata", years=None):
+        self.holidays = np.array(holidays, dtype="datetime64[D]")
+        self.years = set(years) if years is not None else {pd.Timestamp(d).year for d in holidays}
+        self.run_at = datetime.strptime(run_at, "%H:%M").time()
+        self.tz = ZoneInfo(tz)
+
+    def _check_year(self, day):
+        year = pd.Timestamp(day).year
+        if year not in self.years:
+            raise ValueError(f"MarketCalendar has no holidays for {year}: add them to NSE_HOLIDAYS "
+                             f"or pass holidays= / years=")
+
+    def is_trading_day(self, day):
+        self._check_year(day)
+        return bool(np.is_busday(np.datetime64(pd.Timestamp(day).date(), "D"), holidays=self.holidays))
+
+    def next_run(self, now=None):
+        """
+        First run time strictly after `now` (an aware datetime; default: the current time).
+        """
+        now = (now or datetime.now(self.tz)).astimezone(self.tz)
+        day = np.datetime64(now.date(), "D")
+        if datetime.combine(now.date(), self.run_at, self.tz) <= now:
+            day = day + 1
+        self._check_year(day)
+        day = np.busday_offset(day, 0, roll="forward", holidays=self.holidays)
+        self._check_year(day)
+        return datetime.combine(day.astype(object), self.run_at, self.tz)
+
+
+def run_daemon(pipeline, calendar, on_run=None, stop=None, max_runs=None, now=None):
+    """
+    Runs `pipeline` at every `calendar` run time until `stop` (a threading.Event) is set or
+    `max_runs` runs are done. `on_run(report)` is called after each run (e.g. record_run).
+    `now` replaces the clock (for simulations). Stops with a message once the next run
+    falls in a year the calendar has no holidays for.
+    """
+    stop = stop or threading.Event()
+    clock = now or (lambda: datetime.now(calendar.tz))
+    runs = 0
+    while not stop.is_set() and (max_runs is None or runs < max_runs):
+        try:
+            due = calendar.next_run(clock())
+        except ValueError as e:
+            print(f"⚠️ Stopping the daemon: {e}")
+            break
+        print(f" Next pipeline run: {due:%Y-%m-%d %H:%M %Z}")
+        while not stop.is_set() and clock() < due:
+            stop.wait(min(60.0, max(0.0, (due - clock()).total_seconds())))
+        if stop.is_set():
+            break
+        report = pipeline.run()
+        runs += 1
+        print(f" Pipeline run finished: {run_summary(report)}")
+        if on_run is not None:
+            on_run(report)
+    return runs
+
+
+if __name__ == "__main__":
+    import tempfile
+
+    calls = {}
+
+    def stage(name, work, seconds=0.2):
+        def func(inputs):
+            calls[name] = calls.get(name, 0) + 1
+            time.sleep(seconds)
+            return work(inputs)
+        return func
+
+    tickers = ["RELIANCE.NS", "TCS.NS", "INFY.NS", "HDFCBANK.NS"]
+    bars = {t: pd.Series(np.arange(100.0) + i, name=t) for i, t in enumerate(tickers)}
+    stages = [Stage(f"fetch:{t}", lambda inputs, t=t: {f"bars:{t}": bars[t]}, outputs=[f"bars:{t}"], cache=False)
+              for t in tickers]
+    for t in tickers:
+        stages.append(Stage(f"train:{t}", stage(f"train:{t}", lambda inputs, t=t: {f"model:{t}": t + "-model"}),
+                            inputs=[f"bars:{t}"], outputs=[f"model:{t}"]))
+        stages.append(Stage(f"backtest:{t}", stage(f"backtest:{t}", lambda inputs, t=t: {f"trades:{t}": len(inputs)}),
+                            inputs=[f"bars:{t}", f"model:{t}"], outputs=[f"trades:{t}"]))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pipeline = Pipeline(stages, state_path=os.path.join(tmp, "state.json"), max_workers=8)
+        t0 = time.perf_counter()
+        first = pipeline.run()
+        t1 = time.perf_counter()
+        bars["TCS.NS"] = pd.Series(np.arange(101.0), name="TCS.NS")  # one new bar for one ticker
+        second = pipeline.run()
+
+    cal = MarketCalendar()
+    friday = datetime(2025, 4, 17, 17, 0, tzinfo=cal.tz)  # Thu after close; Fri 18 Apr is Good Friday
+    print(f"First run: {run_summary(first)} | wall {t1 - t0:.2f}s for {len(tickers) * 2} stages of 0.2s")
+    print(f"After a new TCS bar: {run_summary(second)} | re-ran: "
+          f"{sorted(second.loc[second['Status'] == RAN, 'Stage'])}")
+    print(f"Next run after {friday:%a %d %b %H:%M}: {cal.next_run(friday):%a %d %b %H:%M %Z}")
+    diwali = datetime(2026, 11, 9, 17, 0, tzinfo=cal.tz)  # Tue 10 Nov 2026 is Diwali Balipratipada
+    print(f"Next run after {diwali:%a %d %b %Y %H:%M}: {cal.next_run(diwali):%a %d %b %H:%M %Z}")
+    new_year = datetime(2026, 12, 31, 17, 0, tzinfo=cal.tz)
+    print(f"Daemon runs past the calendar: {run_daemon(pipeline, cal, now=lambda: new_year)}")
@@ -0,0 +1,164 @@
+# portfolio.py
+
+import numpy as np
+import pandas as pd
+
+from src.indicators import rsi, sma, crossover
+
+TRADE_COLS = ['Ticker', 'Size', 'EntryBar', 'ExitBar', 'EntryPrice', 'ExitPrice', 'PnL',
+              'ReturnPct', 'EntryTime', 'ExitTime', 'Duration']
+
+
+def price_matrices(df):
+    """
+    Long (Date, Ticker, Open, Close, ...) frame -> (index, tickers, open, close) with one
+    column per ticker, aligned on the union of dates (NaN where a ticker has no bar).
+    """
+    wide = df.pivot_table(index="Date", columns="Ticker", values=["Open", "Close"], aggfunc="last").sort_index()
+    tickers = wide["Close"].columns.tolist()
+    return (wide.index, tickers, wide["Open"][tickers].to_numpy(dtype=np.float64),
+            wide["Close"][tickers].to_numpy(dtype=np.float64))
+
+
+def portfolio_signals(close, rsi_length=14, oversold=30, fast=20, slow=50, latch=True):
+    """
+    MyStrategy's buy/sell bars for every column of a (bars x tickers) close matrix at once.
+    Same rules as `vector_backtest.strategy_signals`, including the per-ticker warm-up.
+    """
+    rsi_values = rsi(close, rsi_length)
+    fast_values = sma(close, fast)
+    slow_values = sma(close, slow)
+
+    # Warm-up per ticker: 1 + first bar where all three indicators are defined
+    defined = ~(np.isnan(rsi_values) | np.isnan(fast_values) | np.isnan(slow_values))
+    first_valid = np.where(defined.any(axis=0), defined.argmax(axis=0), len(close))
+    active = np.arange(len(close))[:, None] >= first_valid + 1
+
+    cross_up = crossover(fast_values, slow_values) & active
+    cross_down = crossover(slow_values, fast_values) & active
+    with np.errstate(invalid="ignore"):
+        oversold_bar = (rsi_values < oversold) & active
+
+    if latch:
+        # A crossover buys iff an oversold bar happened since the previous crossover
+        seen = np.cumsum(oversold_bar, axis=0)
+        at_cross = pd.DataFrame(np.where(cross_up, seen, np.nan))
+        prev_seen = at_cross.shift(1).ffill().fillna(0).to_numpy()
+        buy = cross_up & (seen > prev_seen)
+    else:
+        buy = cross_up & oversold_bar
+    return {"rsi": rsi_values, "buy": buy, "sell": cross_down}
+
+
+def run_portfolio(index, tickers, open_, close, cash=100000, commission=0.002, max_positions=10,
+                  position_size=None, rsi_length=14, oversold=30, fast=20, slow=50, latch=True):
+    """
+    Backtests the RSI + SMA rules on a whole universe with one shared cash pool.
+
+    Signals on bar t fill at the open of bar t+1. Exits are processed before entries so
+    freed cash is reusable on the same bar. New entries go to the most oversold (lowest
+    RSI) candidates while fewer than `max_positions` are open, each sized to
+    `position_size` of current equity (default 1 / max_positions) and capped by cash.
+    Commission is charged on both legs like backtesting.py.
+
+    Returns (equity DataFrame with Equity/Cash/Positions, closed-trades DataFrame).
+    """
+    n_bars, n_tickers = close.shape
+    position_size = position_size or 1.0 / max_positions
+    signals = portfolio_signals(close, rsi_length, oversold, fast, slow, latch)
+    buy, sell, rsi_values = signals["buy"], signals["sell"], signals["rsi"]
+    mark = pd.DataFrame(close).ffill().to_numpy()  # last known close for valuation
+    mark_open = pd.DataFrame(open_).ffill().to_numpy()
+
+    shares = np.zeros(n_tickers, dtype=np.int64)
+    entry_price = np.zeros(n_tickers)
+    entry_bar = np.zeros(n_tickers, dtype=np.int64)
+    delta_shares = np.zeros((n_bars + 1, n_tickers), dtype=np.int64)
+    delta_cash = np.zeros(n_bars + 1)
+    balance = float(cash)
+    trades = []
+
+    # Only bars with a signal can change the book
+    for t in np.flatnonzero(buy[:-1].any(axis=1) | sell[:-1].any(axis=1)):
+        fill = t + 1
+        price = open_[fill]
+        tradable = ~np.isnan(price)
+
+        exits = np.flatnonzero(sell[t] & (shares > 0) & tradable)
+        if len(exits):
+            size, px, cost = shares[exits], price[exits], entry_price[exits]
+            pnl = size * (px - cost) - size * (px + cost) * commission
+            proceeds = size * px * (1 - commission)
+            balance += proceeds.sum()
+            delta_cash[fill] += proceeds.sum()
+            delta_shares[fill, exits] -= size
+            trades.append(pd.DataFrame({
+                "Ticker": np.asarray(tickers, dtype=object)[exits], "Size": size,
+                "EntryBar": entry_bar[exits], "ExitBar": fill, "EntryPrice": cost, "ExitPrice": px,
+                "PnL": pnl, "ReturnPct": pnl / (size * cost),
+            }))
+            shares[exits] = 0
+
+        candidates = np.flatnonzero(buy[t] & (shares == 0) & tradable)
+        slots = max_positions - int((shares > 0).sum())
+        if len(candidates) and slots > 0:
+            candidates = candidates[np.argsort(rsi_values[t, candidates], kind="stable")][:slots]
+            target = (balance + (shares * mark_open[fill]).sum()) * position_size
+            for k in candidates:
+                unit_cost = price[k] * (1 + commission)
+                size = int(min(target, balance) // unit_cost)
+                if size <= 0:
+                    break
+                balance -= size * unit_cost
+                delta_cash[fill] -= size * unit_cost
+                delta_shares[fill, k] += size
+                shares[k], entry_price[k], entry_bar[k] = size, price[k], fill
+
+    holdings = np.cumsum(delta_shares, axis=0)[:n_bars]
+    cash_curve = cash + np.cumsum(delta_cash)[:n_bars]
+    equity = cash_curve + np.nansum(holdings * mark, axis=1)
+    curve = pd.DataFrame({"Equity": equity, "Cash": cash_curve, "Positions": (holdings > 0).sum(axis=1)},
+                         index=index)
+
+    trades = pd.concat(trades, ignore_index=True) if trades else pd.DataFrame(columns=TRADE_COLS[:8])
+    trades["EntryTime"] = index[trades["EntryBar"].to_numpy(dtype=np.int64)]
+    trades["ExitTime"] = index[trades["ExitBar"].to_numpy(dtype=np.int64)]
+    trades["Duration"] = trades["ExitTime"] - trades["EntryTime"]
+    return curve, trades[TRADE_COLS].sort_values(["EntryBar", "Ticker"]).reset_index(drop=True)
+
+
+def portfolio_stats(curve, trades):
+    equity = curve["Equity"].to_numpy()
+    daily = np.diff(equity) / equity[:-1]
+    years = (curve.index[-1] - curve.index[0]).days / 365.25
+    return pd.Series({
+        "Start": curve.index[0],
+        "End": curve.index[-1],
+        "Equity Final [$]": equity[-1],
+        "Return [%]": (equity[-1] / equity[0] - 1) * 100,
+        "CAGR [%]": ((equity[-1] / equity[0]) ** (1 / years) - 1) * 100 if years > 0 else np.nan,
+        "Max. Drawdown [%]": -(1 - equity / np.maximum.accumulate(equity)).max() * 100,
+        "Sharpe Ratio": daily.mean() / daily.std() * np.sqrt(252) if daily.std() > 0 else np.nan,
+        "Avg. Positions": curve["Positions"].mean(),
+        "# Trades": len(trades),
+        "Win Rate [%]": (trades["PnL"] > 0).mean() * 100 if len(trades) else np.nan,
+    })
+
+
+if __name__ == "__main__":
+    import time
+    from src.synthetic import synthetic_bars
+
+    universe = [f"SYN{i:03d}.NS" for i in range(500)]
+    bars = pd.concat([synthetic_bars(t, "2015-01-01", "2025-01-01").assign(Ticker=t).rename_axis("Date").reset_index()
+                      for t in universe], ignore_index=True)
+
+    t0 = time.perf_counter()
+    index, tickers, open_, close = price_matrices(bars)
+    t1 = time.perf_counter()
+    curve, trades = run_portfolio(index, tickers, open_, close, max_positions=20)
+    t2 = time.perf_counter()
+
+    print(f"{close.shape[1]} tickers x {close.shape[0]} bars | pivot: {t1 - t0:.2f}s | backtest: {t2 - t1:.2f}s")
+    print(portfolio_stats(curve, trades).to_string())
+    print(trades.head().to_string(index=False))
@@ -0,0 +1,294 @@
+# screener.py
+
+import numpy as np
+import pandas as pd
+
+from src.indicators import rsi, sma, crossover
+from src.instrument import traced
+
+PRICE_COLS = ["Open", "High", "Low", "Close", "Volume"]
+
+
+# --- 1. Aligned (dates x tickers) matrices ---
+class Universe:
+    """
+    A long Date/Ticker frame aligned once into (dates x tickers) arrays, plus every term
+    and rule already evaluated on it, so indicators shared by several rules (or several
+    screens) are computed once.
+
+    Dates and tickers are factorized once; a price column becomes a matrix with one
+    scatter (NaN where a ticker has no bar) the first time a rule needs it. Indicators run
+    column-wise over the aligned dates, so a missing bar also makes the rolling windows
+    spanning it NaN (a per-ticker slice would skip it).
+    """
+
+    def __init__(self, df):
+        self._date_codes, dates = pd.factorize(df["Date"], sort=True)
+        self._ticker_codes, tickers = pd.factorize(df["Ticker"], sort=False)
+        self.dates = pd.DatetimeIndex(dates)
+        self.tickers = list(tickers)
+        self._frame = df
+        self._matrices = {}
+        self._values = {}
+
+    def matrix(self, column):
+        if column not in self._matrices:
+            values = np.full(self.shape, np.nan)
+            values[self._date_codes, self._ticker_codes] = self._frame[column].to_numpy(dtype=np.float64)
+            self._matrices[column] = values
+        return self._matrices[column]
+
+    @property
+    def shape(self):
+        return len(self.dates), len(self.tickers)
+
+    def evaluate(self, node):
+        if node.key not in self._values:
+            self._values[node.key] = node.compute(self)
+        return self._values[node.key]
+
+
+# --- 2. Rule expressions ---
+class Term:
+    """
+    A numeric (dates x tickers) quantity: a price column, an indicator, a constant or
+    arithmetic on those. Comparing terms gives a Rule: `RSI(14) < 30`, `Close > SMA(200) * 1.05`.
+    """
+
+    def __init__(self, key, compute, terms=None):
+        self.key = key
+        self.compute = compute
+        self.terms = (self,) if terms is None else terms  # the values screen() reports
+
+    def __repr__(self):
+        return self.key
+
+    def _binary(self, other, op, symbol, reverse=False):
+        other = _term(other)
+        left, right = (other, self) if reverse else (self, other)
+        return Term(f"({left.key} {symbol} {right.key})",
+                    lambda u: op(u.evaluate(left), u.evaluate(right)), left.terms + right.terms)
+
+    def __add__(self, other):
+        return self._binary(other, np.add, "+")
+
+    def __radd__(self, other):
+        return self._binary(other, np.add, "+", reverse=True)
+
+    def __sub__(self, other):
+        return self._binary(other, np.subtract, "-")
+
+    def __rsub__(self, other):
+        return self._binary(other, np.subtract, "-", reverse=True)
+
+    def __mul__(self, other):
+        return self._binary(other, np.multiply, "*")
+
+    def __rmul__(self, other):
+        return self._binary(other, np.multiply, "*", reverse=True)
+
+    def __truediv__(self, other):
+        return self._binary(other, np.divide, "/")
+
+    def __rtruediv__(self, other):
+        return self._binary(other, np.divide, "/", reverse=True)
+
+    def _compare(self, other, op, symbol):
+        other = _term(other)
+
+        def compute(u):
+            with np.errstate(invalid="ignore"):
+                return op(u.evaluate(self), u.evaluate(other))  # NaN compares False
+        return Rule(f"({self.key} {symbol} {other.key})", compute, self.terms + other.terms)
+
+    def __lt__(self, other):
+        return self._compare(other, np.less, "<")
+
+    def __le__(self, other):
+        return self._compare(other, np.less_equal, "<=")
+
+    def __gt__(self, other):
+        return self._compare(other, np.greater, ">")
+
+    def __ge__(self, other):
+        return self._compare(other, np.greater_equal, ">=")
+
+    def shift(self, bars=1):
+        """
+        The value `bars` (>= 1) bars earlier (NaN for the first bars).
+        """
+        if bars < 1:
+            raise ValueError(f"shift needs bars >= 1, got {bars}")
+
+        def compute(u):
+            values = u.evaluate(self)
+            out = np.full_like(values, np.nan)
+            out[bars:] = values[:-bars]
+            return out
+        return Term(f"{self.key}[-{bars}]", compute)
+
+
+def _term(value):
+    if isinstance(value, Term):
+        return value
+    return Term(repr(value), lambda u: value, terms=())
+
+
+class Rule:
+    """
+    A boolean (dates x tickers) condition. Combine with `&`, `|` and `~`; comparisons bind
+    looser than `&`, so parenthesize them: `(RSI(14) < 30) & crosses_above(SMA(20), SMA(50))`.
+    """
+
+    def __init__(self, key, compute, terms=()):
+        self.key = key
+        self.compute = compute
+        self.terms = terms
+
+    def __repr__(self):
+        return self.key
+
+    def __and__(self, other):
+        return Rule(f"({self.key} & {other.key})", lambda u: u.evaluate(self) & u.evaluate(other),
+                    self.terms + other.terms)
+
+    def __or__(self, other):
+        return Rule(f"({self.key} | {other.key})", lambda u: u.evaluate(self) | u.evaluate(other),
+                    self.terms + other.terms)
+
+    def __invert__(self):
+        return Rule(f"~{self.key}", lambda u: ~u.evaluate(self), self.terms)
+
+
+def Price(column):
+    return Term(column, lambda u: u.matrix(column))
+
+
+def RSI(length=14):
+    close = Price("Close")
+    return Term(f"RSI({length})", lambda u: rsi(u.evaluate(close), length))
+
+
+def SMA(length, of=None):
+    source = of or Price("Close")
+    name = f"SMA({length})" if of is None else f"SMA({length}, {of.key})"
+    return Term(name, lambda u: sma(u.evaluate(source), length))
+
+
+def crosses_above(fast, slow):
+    """
+    True on the bar where `fast` moves from below to above `slow` (backtesting.lib.crossover).
+    """
+    fast, slow = _term(fast), _term(slow)
+    return Rule(f"crosses_above({fast.key}, {slow.key})",
+                lambda u: crossover(*np.broadcast_arrays(u.evaluate(fast), u.evaluate(slow))),
+                fast.terms + slow.terms)
+
+
+def crosses_below(fast, slow):
+    return crosses_above(slow, fast)
+
+
+def within(rule, bars):
+    """
+    True where `rule` held on this bar or any of the previous `bars - 1` bars (`bars` >= 1).
+    """
+    if bars < 1:
+        raise ValueError(f"within needs bars >= 1, got {bars}")
+
+    def compute(u):
+        seen = np.cumsum(u.evaluate(rule), axis=0)
+        before = np.zeros_like(seen)
+        before[bars:] = seen[:-bars]
+        return seen - before > 0
+    return Rule(f"within({rule.key}, {bars})", compute, rule.terms)
+
+
+Open, High, Low, Close, Volume = (Price(c) for c in PRICE_COLS)
+
+# Same condition as generate_signals' `signal == 1`
+OVERSOLD = RSI(14) < 30
+# RSI < 30 on one of the last 10 bars and a 20/50 SMA golden cross on this one. A windowed
+# variant of MyStrategy's entry, whose latch accepts any oversold bar since the previous
+# crossover however long ago; see vector_backtest.strategy_signals for the exact rule.
+OVERSOLD_CROSS = within(RSI(14) < 30, 10) & crosses_above(SMA(20), SMA(50))
+
+
+# --- 3. Screening ---
+@traced()
+def screen(data, rule=OVERSOLD, start=None, end=None):
+    """
+    Evaluates `rule` for every ticker at once on a long Date/Ticker frame (or a Universe)
+    and returns only the matching rows: Ticker, Date, Close and every term the rule uses,
+    sorted by ticker then date. `start` / `end` limit the reported dates, not the history
+    the indicators warm up on.
+    """
+    universe = data if isinstance(data, Universe) else Universe(data)
+    mask = np.asarray(universe.evaluate(rule), dtype=bool)
+    if start is not None or end is not None:
+        keep = np.ones(len(universe.dates), dtype=bool)
+        if start is not None:
+            keep &= universe.dates >= pd.Timestamp(start)
+        if end is not None:
+            keep &= universe.dates < pd.Timestamp(end)
+        mask = mask & keep[:, None]
+
+    # Universe keeps tickers in first-appearance order; walk them sorted, dates within each
+    order = np.argsort(np.asarray(universe.tickers, dtype=object), kind="stable")
+    cols, rows = np.nonzero(mask.T[order])
+    cols = order[cols]
+    result = {"Ticker": np.asarray(universe.tickers, dtype=object)[cols], "Date": universe.dates[rows],
+              "Close": universe.matrix("Close")[rows, cols]}
+    for term in rule.terms:
+        if term.key not in result:
+            values = np.broadcast_to(universe.evaluate(term), universe.shape)
+            result[term.key] = values[rows, cols]
+    return pd.DataFrame(result)
+
+
+def scan_universe(tickers, start_date, end_date, rule=OVERSOLD):
+    """
+    Screener counterpart of `get_signals_for_tickers`: one fetch, one vectorized pass,
+    only the matching (ticker, date) rows.
+    """
+    from src.ingestion import fetch_data
+
+    return screen(fetch_data(tickers, start=start_date, end=end_date), rule)
+
+
+if __name__ == "__main__":
+    import io
+    import time
+    import contextlib
+    from src import simple_strategy
+    from src.synthetic import synthetic_universe
+
+    long, _ = synthetic_universe(2000, 2520)  # 2,000 tickers x 10 years of business days
+    tickers = long["Ticker"].unique().tolist()
+    print(f"Universe: {len(tickers)} tickers x 2520 bars ({len(long):,} rows)")
+
+    t0 = time.perf_counter()
+    universe = Universe(long)
+    t1 = time.perf_counter()
+    oversold = screen(universe, OVERSOLD)
+    t2 = time.perf_counter()
+    entries = screen(universe, OVERSOLD_CROSS & (Close > SMA(200)))  # reuses RSI(14) / SMA(20) / SMA(50)
+    t3 = time.perf_counter()
+    print(f"Screener: align {t1 - t0:.3f}s | RSI < 30 {t2 - t1:.3f}s ({len(oversold):,} rows) | "
+          f"oversold cross above SMA(200) {t3 - t2:.3f}s ({len(entries):,} rows) | total {t3 - t0:.3f}s")
+
+    # Current path: per-ticker generate_signals (fetch_data replaced by the frame above)
+    fetch, simple_strategy.fetch_data = simple_strategy.fetch_data, lambda *args, **kwargs: long
+    try:
+        t0 = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            legacy = simple_strategy.get_signals_for_tickers(tickers, None, None)
+        legacy_s = time.perf_counter() - t0
+    finally:
+        simple_strategy.fetch_data = fetch
+    expected = legacy[legacy["signal"] == 1][["Ticker", "Date", "RSI"]].reset_index(drop=True)
+    same = (len(expected) == len(oversold) and (expected["Ticker"].to_numpy() == oversold["Ticker"].to_numpy()).all()
+            and (expected["Date"].to_numpy() == oversold["Date"].to_numpy()).all()
+            and np.array_equal(expected["RSI"].to_numpy(), oversold["RSI(14)"].to_numpy()))
+    print(f"get_signals_for_tickers: {legacy_s:.2f}s | same (Ticker, Date, RSI) rows: {same}")
+    print(entries.head().to_string(index=False))
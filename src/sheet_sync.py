@@ -0,0 +1,323 @@
+# sheet_sync.py
+
+import os
+import json
+import time
+import threading
+
+import numpy as np
+import pandas as pd
+
+from src.serialize import serialize_frame
+from src.instrument import traced, span, count
+
+STATE_DIR = ".sheet_sync"
+CHUNK_ROWS = 500
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+# --- 1. Clients ---
+class GspreadClient:
+    """
+    The sheet client interface used by SheetSink, backed by gspread:
+    `worksheet(sheet_name, worksheet_name, rows, cols)` returns a worksheet that
+    supports `clear()`, `update(values, range_name)`, `batch_update(data)`,
+    `resize(rows)` and `row_count`.
+    """
+
+    def __init__(self, json_key_path):
+        import gspread
+        from oauth2client.service_account import ServiceAccountCredentials
+
+        scope = [
+            "https://spreadsheets.google.com/feeds",
+            "https://www.googleapis.com/auth/spreadsheets",
+            "https://www.googleapis.com/auth/drive"
+        ]
+        creds = ServiceAccountCredentials.from_json_keyfile_name(json_key_path, scope)
+        self._gspread = gspread
+        self._client = gspread.authorize(creds)
+
+    def worksheet(self, sheet_name, worksheet_name, rows=100, cols=26):
+        try:
+            sheet = self._client.open(sheet_name)
+        except self._gspread.SpreadsheetNotFound:
+            sheet = self._client.create(sheet_name)
+        try:
+            return sheet.worksheet(worksheet_name)
+        except self._gspread.WorksheetNotFound:
+            return sheet.add_worksheet(title=worksheet_name, rows=str(rows), cols=str(cols))
+
+
+def get_client(json_key_path):
+    """
+    Returns the process-wide authenticated client for `json_key_path` (one auth per process).
+    """
+    with _clients_lock:
+        if json_key_path not in _clients:
+            _clients[json_key_path] = GspreadClient(json_key_path)
+        return _clients[json_key_path]
+
+
+class FakeWorksheet:
+    """
+    In-memory worksheet implementing the calls SheetSink makes, with a call counter.
+    Like a real sheet, writes past `row_count` fail until the grid is resized.
+    """
+
+    def __init__(self, calls, rows=100):
+        self.cells = []
+        self.calls = calls
+        self.row_count = rows
+
+    def _count(self, name):
+        self.calls[name] = self.calls.get(name, 0) + 1
+
+    def clear(self):
+        self._count("clear")
+        self.cells = []
+
+    def _write(self, start_row, values):
+        end = start_row - 1 + len(values)
+        if end > self.row_count:
+            raise ValueError(f"Range exceeds grid limits: row {end} > {self.row_count}")
+        self.cells.extend([] for _ in range(end - len(self.cells)))
+        for offset, row in enumerate(values):
+            self.cells[start_row - 1 + offset] = list(row)
+
+    def update(self, values, range_name="A1"):
+        self._count("update")
+        self._write(int(range_name.lstrip("A")), values)
+
+    def resize(self, rows=None, cols=None):
+        self._count("resize")
+        if rows is not None:
+            self.row_count = rows
+            del self.cells[rows:]
+
+    def batch_update(self, data, value_input_option="RAW"):
+        self._count("batch_update")
+        for item in data:
+            self._write(int(item["range"].lstrip("A")), item["values"])
+
+
+class FakeSheetsClient:
+    """
+    In-memory stand-in for GspreadClient. `calls` counts every API call made.
+    """
+
+    def __init__(self):
+        self.calls = {}
+        self.sheets = {}
+
+    def worksheet(self, sheet_name, worksheet_name, rows=100, cols=26):
+        self.calls["worksheet"] = self.calls.get("worksheet", 0) + 1
+        key = (sheet_name, worksheet_name)
+        if key not in self.sheets:
+            self.sheets[key] = FakeWorksheet(self.calls, rows)
+        return self.sheets[key]
+
+
+# --- 2. Incremental sink ---
+def _retryable(exc):
+    status = getattr(getattr(exc, "response", None), "status_code", None)
+    return status in RETRYABLE_STATUS or isinstance(exc, (ConnectionError, TimeoutError))
+
+
+class SheetSink:
+    """
+    Append-only sync of DataFrames into worksheets.
+
+    For every worksheet a ledger in `state_dir` records the header, the next free row
+    and, per key (e.g. Ticker+Date), the row it was written to and a digest of its
+    values. A sync only appends unseen keys and rewrites rows whose values changed, in
+    chunks of `chunk_rows` with exponential backoff on rate-limit / server errors.
+
+    New rows are written to explicit ranges from `next_row` (growing the grid first)
+    rather than with `append_rows`: a retried request that had already succeeded then
+    rewrites the same cells instead of appending a second copy, so the ledger's row map
+    never drifts from the sheet.
+    """
+
+    def __init__(self, client, state_dir=STATE_DIR, chunk_rows=CHUNK_ROWS, retries=5, backoff=1.0):
+        self.client = client
+        self.state_dir = state_dir
+        self.chunk_rows = chunk_rows
+        self.retries = retries
+        self.backoff = backoff
+        self._worksheets = {}
+
+    def _worksheet(self, sheet_name, worksheet_name, n_rows, n_cols):
+        key = (sheet_name, worksheet_name)
+        if key not in self._worksheets:
+            self._worksheets[key] = self._call(self.client.worksheet, sheet_name, worksheet_name,
+                                               n_rows + 10, n_cols + 5)
+        return self._worksheets[key]
+
+    def _call(self, func, *args, **kwargs):
+        for attempt in range(self.retries + 1):
+            try:
+                with span(f"sheets.{func.__name__}"):
+                    return func(*args, **kwargs)
+            except Exception as e:
+                if attempt == self.retries or not _retryable(e):
+                    raise
+                count("sheets.retries")
+                time.sleep(self.backoff * 2 ** attempt)
+
+    # --- ledger ---
+    def _ledger_path(self, sheet_name, worksheet_name):
+        return os.path.join(self.state_dir, sheet_name, f"{worksheet_name}.json")
+
+    def load_ledger(self, sheet_name, worksheet_name):
+        path = self._ledger_path(sheet_name, worksheet_name)
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            return json.load(f)
+
+    def _save_ledger(self, sheet_name, worksheet_name, ledger):
+        path = self._ledger_path(sheet_name, worksheet_name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + ".tmp", "w") as f:
+            json.dump(ledger, f)
+        os.replace(path + ".tmp", path)
+
+    def reset(self, sheet_name, worksheet_name):
+        """
+        Forgets what was written, so the next sync rewrites the worksheet from scratch.
+        """
+        path = self._ledger_path(sheet_name, worksheet_name)
+        if os.path.exists(path):
+            os.remove(path)
+
+    # --- sync ---
+    @staticmethod
+    def _keys(header, rows, key_cols):
+        positions = [header.index(c) for c in key_cols if c in header]
+        if not positions:
+            return [str(i) for i in range(len(rows))]
+        return ["|".join(str(row[p]) for p in positions) for row in rows]
+
+    @staticmethod
+    def _digests(header, rows):
+        if not rows:
+            return []
+        table = pd.DataFrame(rows, columns=range(len(header)), dtype=object)
+        return [format(d, "x") for d in pd.util.hash_pandas_object(table, index=False).to_numpy()]
+
+    @traced("sheets.sync")
+    def sync(self, sheet_name, worksheet_name, df, key_cols=("Ticker", "Date")):
+        """
+        Writes only the new or changed rows of `df`. Returns {"appended", "updated", "unchanged"}.
+        """
+        header, rows = serialize_frame(df)
+        keys = self._keys(header, rows, key_cols)
+        digests = self._digests(header, rows)
+
+        # Last occurrence wins for duplicate keys
+        latest = {key: i for i, key in enumerate(keys)}
+        order = sorted(latest.values())
+
+        worksheet = self._worksheet(sheet_name, worksheet_name, len(rows), len(header))
+        ledger = self.load_ledger(sheet_name, worksheet_name)
+        if ledger is None or ledger["header"] != header:
+            self._call(worksheet.clear)
+            self._call(worksheet.update, values=[header], range_name="A1")
+            ledger = {"header": header, "next_row": 2, "rows": {}, "high_water": {}}
+
+        written = ledger["rows"]
+        new = [i for i in order if keys[i] not in written]
+        changed = [i for i in order if keys[i] in written and written[keys[i]][1] != digests[i]]
+
+        try:
+            for start in range(0, len(changed), self.chunk_rows):
+                chunk = changed[start:start + self.chunk_rows]
+                data = [{"range": f"A{written[keys[i]][0]}", "values": [rows[i]]} for i in chunk]
+                self._call(worksheet.batch_update, data, value_input_option="RAW")
+                for i in chunk:
+                    written[keys[i]][1] = digests[i]
+
+            for start in range(0, len(new), self.chunk_rows):
+                chunk = new[start:start + self.chunk_rows]
+                self._ensure_rows(worksheet, ledger["next_row"] + len(chunk) - 1)
+                self._call(worksheet.update, values=[rows[i] for i in chunk],
+                           range_name=f"A{ledger['next_row']}")
+                for offset, i in enumerate(chunk):
+                    written[keys[i]] = [ledger["next_row"] + offset, digests[i]]
+                ledger["next_row"] += len(chunk)
+        finally:
+            ledger["high_water"] = self._high_water(header, rows, key_cols, ledger["high_water"])
+            self._save_ledger(sheet_name, worksheet_name, ledger)
+
+        print(f" Synced {worksheet_name}: {len(new)} appended, {len(changed)} updated, "
+              f"{len(order) - len(new) - len(changed)} unchanged")
+        return {"appended": len(new), "updated": len(changed), "unchanged": len(order) - len(new) - len(changed)}
+
+    def _ensure_rows(self, worksheet, last_row):
+        # resize sets an absolute size, so it is as safe to retry as the ranged update
+        if worksheet.row_count < last_row:
+            self._call(worksheet.resize, rows=last_row + self.chunk_rows)
+
+    @staticmethod
+    def _high_water(header, rows, key_cols, high_water):
+        """
+        Latest date written per ticker (informational: lets callers fetch only newer bars).
+        """
+        if "Ticker" not in header or "Date" not in header or "Date" not in key_cols or not rows:
+            return high_water
+        table = pd.DataFrame(rows, columns=header)
+        latest = table.groupby("Ticker")["Date"].max()
+        for ticker, date in latest.items():
+            if date is not None and str(date) > high_water.get(ticker, ""):
+                high_water[ticker] = str(date)
+        return high_water
+
+
+if __name__ == "__main__":
+    import tempfile
+    from src.synthetic import synthetic_bars
+
+    def ingested(end):
+        frames = [synthetic_bars(t, "2020-01-01", end).assign(Ticker=t).rename_axis("Date").reset_index()
+                  for t in ("RELIANCE.NS", "TCS.NS", "INFY.NS")]
+        return pd.concat(frames, ignore_index=True)
+
+    client = FakeSheetsClient()
+    with tempfile.TemporaryDirectory() as tmp:
+        sink = SheetSink(client, state_dir=tmp)
+        first = ingested("2025-06-01")
+        sink.sync("Algo_Trading_Sheets", "Ingested_Data", first)
+        print(f"First run calls: {client.calls}")
+
+        client.calls.clear()
+        second = ingested("2025-06-24")
+        second.loc[len(first) // 2, "Close"] = np.round(second.loc[len(first) // 2, "Close"] + 1, 4)
+        sink.sync("Algo_Trading_Sheets", "Ingested_Data", second)
+        print(f"Second run calls: {client.calls}")
+
+        sheet = client.sheets[("Algo_Trading_Sheets", "Ingested_Data")]
+        header, rows = serialize_frame(second)
+        print(f"Sheet rows: {len(sheet.cells) - 1} | expected: {len(rows)} | "
+              f"contents match: {sorted(sheet.cells[1:]) == sorted(rows)}")
+
+        # A write that lands but times out on the way back is retried without duplicating rows
+        flaky = client.sheets[("Algo_Trading_Sheets", "Ingested_Data")]
+        update, failed = flaky.update, []
+
+        def update_then_timeout(values, range_name="A1"):
+            update(values, range_name)
+            if not failed:
+                failed.append(range_name)
+                raise TimeoutError("read timed out")
+
+        flaky.update = update_then_timeout
+        sink.backoff = 0
+        third = pd.concat([second, ingested("2025-07-10").iloc[-5:]], ignore_index=True)
+        sink.sync("Algo_Trading_Sheets", "Ingested_Data", third)
+        header, rows = serialize_frame(third)
+        print(f"After a timed-out write: sheet rows {len(sheet.cells) - 1} | expected {len(rows)} | "
+              f"contents match: {sorted(sheet.cells[1:]) == sorted(rows)}")
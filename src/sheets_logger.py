@@ -1,44 +1,27 @@
-import gspread
-from oauth2client.service_account import ServiceAccountCredentials
 import pandas as pd
 from src.ingestion import fetch_data
+from src.serialize import serialize_frame
+from src.sheet_sync import get_client
+from src.metrics import bar_metrics
+from src.instrument import traced
 from src.simple_strategy import get_signals_for_tickers  # ✅ Import your strategy results
 
-# --- 1. Google Auth ---
-def authenticate_google(json_key_path):
-    scope = [
-        "https://spreadsheets.google.com/feeds",
-        "https://www.googleapis.com/auth/spreadsheets",
-        "https://www.googleapis.com/auth/drive"
-    ]
-    creds = ServiceAccountCredentials.from_json_keyfile_name(json_key_path, scope)
-    client = gspread.authorize(creds)
-    return client
-
-# --- 2. Upload DataFrame to Specific Sheet ---
+# --- 1. Upload DataFrame to Specific Sheet (client: sheet_sync.get_client) ---
+@traced()
 def log_to_named_sheet(sheet_name, worksheet_name, df, json_key_path):
-    client = authenticate_google(json_key_path)
-
-    try:
-        sheet = client.open(sheet_name)
-    except gspread.SpreadsheetNotFound:
-        sheet = client.create(sheet_name)
-
-    try:
-        worksheet = sheet.worksheet(worksheet_name)
-        worksheet.clear()
-    except gspread.WorksheetNotFound:
-        worksheet = sheet.add_worksheet(title=worksheet_name, rows=str(len(df)+10), cols=str(len(df.columns)+5))
+    """
+    Replaces the worksheet's contents with `df` (see SheetSink for incremental sync).
+    """
+    header, rows = serialize_frame(df)
+    worksheet = get_client(json_key_path).worksheet(sheet_name, worksheet_name, len(rows) + 10, len(header) + 5)
 
-    # Handle Timestamp columns for Google Sheets
-    df = df.applymap(lambda x: x.strftime("%Y-%m-%d %H:%M:%S") if isinstance(x, pd.Timestamp) else x)
-
-    worksheet.insert_row(df.columns.tolist(), index=1)
-    worksheet.insert_rows(df.values.tolist(), row=2)
+    # One resize + one batched write instead of clear + insert_row + insert_rows
+    worksheet.resize(rows=len(rows) + 1, cols=max(len(header), 1))
+    worksheet.update(values=[header] + rows, range_name="A1")
 
     print(f" Logged data to {worksheet_name} in Google Sheet: {sheet_name}")
 
-# --- 3. Main Execution ---
+# --- 2. Main Execution ---
 if __name__ == "__main__":
     json_path = "algo_sheets_api.json"
     sheet_name = "Algo_Trading_Sheets"
@@ -62,26 +45,7 @@ if __name__ == "__main__":
     log_to_named_sheet(sheet_name, "Ingested_Data", all_data, json_path)
 
     # 📊 Summary Per Ticker
-    summary_list = []
-    for ticker, df in all_data.groupby("Ticker"):
-        total_trades = len(df)
-        win_trades = (df["Profit"] > 0).sum()
-        loss_trades = (df["Profit"] <= 0).sum()
-        total_profit = df["Profit"].sum()
-        avg_profit = df["Profit"].mean()
-        win_ratio = round((win_trades / total_trades) * 100, 2)
-
-        summary_list.append({
-            "Ticker": ticker,
-            "Total Trades": total_trades,
-            "Winning Trades": win_trades,
-            "Losing Trades": loss_trades,
-            "Total Profit": round(total_profit, 2),
-            "Average Profit": round(avg_profit, 2),
-            "Win Ratio (%)": win_ratio
-        })
-
-    summary_df = pd.DataFrame(summary_list)
+    summary_df = bar_metrics(all_data)
     log_to_named_sheet(sheet_name, "Summary", summary_df, json_path)
 
     # Strategy Signals (RSI + MA Crossover)
@@ -1,23 +1,26 @@
 # simple_strategy.py
 
 import pandas as pd
-import pandas_ta as ta
 from src.ingestion import fetch_data
+from src.indicators import get_engine
 
-def add_indicators(df):
+STRATEGY_INDICATORS = [("rsi", {"length": 14}), ("sma", {"length": 20}), ("sma", {"length": 50})]
+
+def add_indicators(df, ticker=""):
     """
     Adds RSI, SMA20, SMA50 indicators to a single-ticker DataFrame.
     """
-    df['RSI'] = df.ta.rsi(length=14)
-    df['SMA20'] = df['Close'].rolling(window=20).mean()
-    df['SMA50'] = df['Close'].rolling(window=50).mean()
+    values = get_engine().compute_all(df, STRATEGY_INDICATORS, ticker=ticker)
+    df['RSI'] = values['rsi_14']
+    df['SMA20'] = values['sma_20']
+    df['SMA50'] = values['sma_50']
     return df
 
-def generate_signals(df, rsi_threshold=30):
+def generate_signals(df, rsi_threshold=30, ticker=""):
     """
     Adds 'signal' column with value 1 when RSI < threshold.
     """
-    df = add_indicators(df)
+    df = add_indicators(df, ticker=ticker)
     df['signal'] = 0
 
     # Only check RSI for now (less strict)
@@ -33,16 +36,17 @@ def get_signals_for_tickers(tickers, start_date, end_date, rsi_threshold=30):
     all_data = fetch_data(tickers, start=start_date, end=end_date)
     all_signals = []
 
+    # One groupby pass instead of a boolean mask + copy per ticker; each group is
+    # already its own frame, and Date / Ticker are columns of the long frame.
+    groups = dict(list(all_data.groupby("Ticker", sort=False))) if "Ticker" in all_data else {}
     for ticker in tickers:
-        df = all_data[all_data["Ticker"] == ticker].copy()
+        df = groups.get(ticker)
 
-        if df.empty or "Close" not in df.columns:
+        if df is None or df.empty or "Close" not in df.columns:
             print(f"⚠️ No data for {ticker}")
             continue
 
-        df = generate_signals(df, rsi_threshold=rsi_threshold)
-        df['Ticker'] = ticker
-        df['Date'] = df.index
+        df = generate_signals(df, rsi_threshold=rsi_threshold, ticker=ticker)
         all_signals.append(df)
 
         # ✅ Show debug info
@@ -0,0 +1,326 @@
+# store.py
+
+import os
+import sqlite3
+import threading
+
+import pandas as pd
+
+from src.instrument import traced
+
+DB_PATH = "results.db"
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+_sinks = None
+
+
+def _quote(name):
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def _sql_type(dtype):
+    if pd.api.types.is_bool_dtype(dtype) or pd.api.types.is_integer_dtype(dtype):
+        return "INTEGER"
+    if pd.api.types.is_numeric_dtype(dtype):
+        return "REAL"
+    if pd.api.types.is_datetime64_any_dtype(dtype):
+        return "TIMESTAMP"
+    return "TEXT"
+
+
+def _records(df):
+    """
+    DataFrame -> list of row tuples of plain Python values (None for missing).
+    """
+    frame = df.copy()
+    for col in frame.columns:
+        if pd.api.types.is_datetime64_any_dtype(frame[col].dtype):
+            frame[col] = frame[col].dt.strftime(TIME_FORMAT)
+        elif pd.api.types.is_timedelta64_dtype(frame[col].dtype):
+            frame[col] = frame[col].astype(str)
+    frame = frame.astype(object).where(frame.notna(), None)
+    return list(frame.itertuples(index=False, name=None))
+
+
+# --- 1. Embedded store ---
+class SQLiteStore:
+    """
+    Local SQLite store for bot results. Tables are created from the first DataFrame written
+    to them, with a unique index on the key columns (used for upserts) and an index per key.
+    """
+
+    def __init__(self, path=DB_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+
+    def close(self):
+        self._conn.close()
+
+    def tables(self):
+        rows = self._conn.execute("SELECT name FROM sqlite_master WHERE type='table'").fetchall()
+        return [r[0] for r in rows]
+
+    def columns(self, table):
+        """
+        Returns {column: declared type} for `table` (empty if it doesn't exist).
+        """
+        return {r[1]: r[2] for r in self._conn.execute(f"PRAGMA table_info({_quote(table)})")}
+
+    def _key_columns(self, table):
+        rows = self._conn.execute(f"PRAGMA index_info({_quote(f'ux_{table}')})").fetchall()
+        return [r[2] for r in sorted(rows)]
+
+    def _create_indexes(self, table, keys):
+        key_list = ", ".join(_quote(k) for k in keys)
+        self._conn.execute(f"CREATE UNIQUE INDEX {_quote(f'ux_{table}')} ON {_quote(table)} ({key_list})")
+        for key in keys:
+            self._conn.execute(f"CREATE INDEX IF NOT EXISTS {_quote(f'ix_{table}_{key}')} "
+                               f"ON {_quote(table)} ({_quote(key)})")
+
+    def _ensure_table(self, table, df, keys):
+        existing = self.columns(table)
+        if not existing:
+            cols = ", ".join(f"{_quote(c)} {_sql_type(df[c].dtype)}" for c in df.columns)
+            self._conn.execute(f"CREATE TABLE {_quote(table)} ({cols})")
+            if keys:
+                self._create_indexes(table, keys)
+            return
+        for col in df.columns:
+            if col not in existing:
+                self._conn.execute(f"ALTER TABLE {_quote(table)} ADD COLUMN {_quote(col)} {_sql_type(df[col].dtype)}")
+        if keys and self._key_columns(table) != list(keys):
+            # The key changed (e.g. trade_log gained Strategy): rows that can't fill the new
+            # key can't be attributed, so they are dropped and rewritten by the next run
+            missing = " OR ".join(f"{_quote(k)} IS NULL" for k in keys)
+            dropped = self._conn.execute(f"DELETE FROM {_quote(table)} WHERE {missing}").rowcount
+            self._conn.execute(f"DROP INDEX IF EXISTS {_quote(f'ux_{table}')}")
+            self._create_indexes(table, keys)
+            print(f" {table}: key is now {tuple(keys)}; dropped {dropped} rows without it")
+
+    @traced("store.write")
+    def write(self, table, df, keys=("Ticker", "Date")):
+        """
+        Bulk upsert: rows whose key already exists are updated, the rest inserted.
+        With `keys=None` the rows are appended as-is. Returns the number of rows written.
+        """
+        keys = [k for k in (keys or ()) if k in df.columns]
+        if df.empty:
+            return 0
+        cols = ", ".join(_quote(c) for c in df.columns)
+        marks = ", ".join("?" for _ in df.columns)
+        sql = f"INSERT INTO {_quote(table)} ({cols}) VALUES ({marks})"
+        updates = [c for c in df.columns if c not in keys]
+        if keys:
+            conflict = ", ".join(_quote(k) for k in keys)
+            action = ("DO UPDATE SET " + ", ".join(f"{_quote(c)}=excluded.{_quote(c)}" for c in updates)
+                      if updates else "DO NOTHING")
+            sql += f" ON CONFLICT ({conflict}) {action}"
+
+        records = _records(df)
+        with self._lock, self._conn:
+            self._ensure_table(table, df, keys)
+            self._conn.executemany(sql, records)
+        return len(records)
+
+    @traced("store.replace")
+    def replace(self, table, df, keys=("Ticker", "Date"), scope=None):
+        """
+        Replaces the rows matching `scope` ({column: value}; None means the whole table)
+        with `df`, in one transaction, so rows from an earlier run never linger.
+        Returns the number of rows written.
+        """
+        scope = scope or {}
+        keys = [k for k in (keys or ()) if k in df.columns]
+        where = " AND ".join(f"{_quote(c)} = ?" for c in scope)
+        delete = f"DELETE FROM {_quote(table)}" + (f" WHERE {where}" if where else "")
+        params = [pd.Timestamp(v).strftime(TIME_FORMAT) if isinstance(v, pd.Timestamp) else v
+                  for v in scope.values()]
+        with self._lock, self._conn:
+            if self.columns(table):
+                self._conn.execute(delete, params)
+            if df.empty:
+                return 0
+            self._ensure_table(table, df, keys)
+            cols = ", ".join(_quote(c) for c in df.columns)
+            marks = ", ".join("?" for _ in df.columns)
+            records = _records(df)
+            self._conn.executemany(f"INSERT OR REPLACE INTO {_quote(table)} ({cols}) VALUES ({marks})", records)
+        return len(records)
+
+    def query(self, sql, params=()):
+        """
+        Runs a SELECT and returns a DataFrame.
+        """
+        with self._lock:
+            return pd.read_sql_query(sql, self._conn, params=params)
+
+    def read(self, table, tickers=None, start=None, end=None, columns=None):
+        """
+        Reads `table`, optionally filtered to `tickers` and a [start, end) date range
+        (both served by the Ticker/Date indexes). TIMESTAMP columns come back as datetimes.
+        """
+        declared = self.columns(table)
+        if not declared:
+            return pd.DataFrame(columns=columns)
+        select = ", ".join(_quote(c) for c in columns) if columns else "*"
+        where, params = [], []
+        if tickers is not None:
+            tickers = [tickers] if isinstance(tickers, str) else list(tickers)
+            where.append(f"Ticker IN ({', '.join('?' for _ in tickers)})")
+            params += tickers
+        if start is not None:
+            where.append("Date >= ?")
+            params.append(pd.Timestamp(start).strftime(TIME_FORMAT))
+        if end is not None:
+            where.append("Date < ?")
+            params.append(pd.Timestamp(end).strftime(TIME_FORMAT))
+        sql = f"SELECT {select} FROM {_quote(table)}" + (" WHERE " + " AND ".join(where) if where else "")
+
+        df = self.query(sql, params)
+        for col in df.columns:
+            if declared.get(col) == "TIMESTAMP":
+                df[col] = pd.to_datetime(df[col])
+        return df
+
+
+# --- 2. Mirrors ---
+class CSVMirror:
+    """
+    Writes selected tables to CSV. `tables` maps table -> split column: with a split column
+    each value gets its own `{value}_{table}.csv` (without that column), like trade_logs/.
+    """
+
+    def __init__(self, root, tables):
+        self.root = root
+        self.tables = tables
+
+    def write(self, table, df, keys=None):
+        if table not in self.tables:
+            return
+        os.makedirs(self.root, exist_ok=True)
+        split = self.tables[table]
+        if split is None:
+            df.to_csv(os.path.join(self.root, f"{table}.csv"), index=False)
+            return
+        for value, part in df.groupby(split, sort=False):
+            part.drop(columns=split).to_csv(os.path.join(self.root, f"{value}_{table}.csv"), index=False)
+
+    def replace(self, table, df, keys=None, scope=None):
+        """
+        Writes the replaced rows without the scope columns (the file name already says which
+        ticker), and a header-only file when there are none, like the pre-store trade logs.
+        """
+        scope = scope or {}
+        split = self.tables.get(table, "")
+        if table not in self.tables or split is not None and split not in scope:
+            return self.write(table, df, keys)
+        os.makedirs(self.root, exist_ok=True)
+        name = f"{table}.csv" if split is None else f"{scope[split]}_{table}.csv"
+        df.drop(columns=[c for c in scope if c in df.columns]).to_csv(os.path.join(self.root, name), index=False)
+
+
+class SheetsMirror:
+    """
+    Syncs selected tables to Google Sheets through a SheetSink. `worksheets` maps
+    table -> worksheet name.
+    """
+
+    def __init__(self, sheet_sink, sheet_name, worksheets):
+        self.sheet_sink = sheet_sink
+        self.sheet_name = sheet_name
+        self.worksheets = worksheets
+
+    def write(self, table, df, keys=None):
+        if table in self.worksheets:
+            self.sheet_sink.sync(self.sheet_name, self.worksheets[table], df, key_cols=keys or ())
+
+    def replace(self, table, df, keys=None, scope=None):
+        self.write(table, df, keys)
+
+
+# --- 3. Fan-out ---
+class ResultSinks:
+    """
+    Writes every result to the store first, then to each mirror. A failing mirror
+    (e.g. Sheets quota) is reported but never loses the stored copy.
+    """
+
+    def __init__(self, store=None, mirrors=()):
+        self.store = store or SQLiteStore()
+        self.mirrors = list(mirrors)
+
+    def add_mirror(self, mirror):
+        self.mirrors.append(mirror)
+
+    def write(self, table, df, keys=("Ticker", "Date")):
+        written = self.store.write(table, df, keys)
+        for mirror in self.mirrors:
+            try:
+                mirror.write(table, df, keys)
+            except Exception as e:
+                print(f" Mirror {type(mirror).__name__} failed for {table}: {e}")
+        return written
+
+    def replace(self, table, df, keys=("Ticker", "Date"), scope=None):
+        """
+        Like `write`, but first drops the stored rows matching `scope` (see SQLiteStore.replace).
+        """
+        written = self.store.replace(table, df, keys, scope)
+        for mirror in self.mirrors:
+            try:
+                mirror.replace(table, df, keys, scope)
+            except Exception as e:
+                print(f" Mirror {type(mirror).__name__} failed for {table}: {e}")
+        return written
+
+    def read(self, table, **filters):
+        return self.store.read(table, **filters)
+
+
+def get_sinks():
+    """
+    Returns the process-wide sinks: results.db with trade logs mirrored to trade_logs/.
+    """
+    global _sinks
+    if _sinks is None:
+        _sinks = ResultSinks(SQLiteStore(DB_PATH), [CSVMirror("trade_logs", {"trade_log": "Ticker"})])
+    return _sinks
+
+
+def set_sinks(sinks):
+    global _sinks
+    _sinks = sinks
+
+
+if __name__ == "__main__":
+    import time
+    import tempfile
+    from src.synthetic import synthetic_bars
+    from src.metrics import bar_metrics
+
+    universe = [f"SYN{i:03d}.NS" for i in range(100)]
+    bars = pd.concat([synthetic_bars(t, "2015-01-01", "2025-01-01").assign(Ticker=t).rename_axis("Date").reset_index()
+                      for t in universe], ignore_index=True)
+    bars["Profit"] = bars["Close"] - bars["Open"]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SQLiteStore(os.path.join(tmp, "results.db"))
+        t0 = time.perf_counter()
+        store.write("ingested", bars)
+        t1 = time.perf_counter()
+        store.write("ingested", bars.tail(len(universe) * 5))  # re-run: upserts, no duplicates
+        t2 = time.perf_counter()
+        one = store.read("ingested", tickers="SYN042.NS", start="2024-01-01")
+        t3 = time.perf_counter()
+        summary = bar_metrics(store.read("ingested", start="2024-01-01"))
+        t4 = time.perf_counter()
+        rows = store.query('SELECT COUNT(*) AS n FROM "ingested"')["n"][0]
+        store.close()
+
+    print(f"{len(bars):,} rows | insert: {t1 - t0:.2f}s | upsert {len(universe) * 5} rows: {t2 - t1:.3f}s | "
+          f"rows stored: {rows:,}")
+    print(f"Indexed read ({len(one)} rows): {(t3 - t2) * 1000:.1f}ms | summary from table: {(t4 - t3) * 1000:.1f}ms")
+    print(summary.head(3).to_string(index=False))
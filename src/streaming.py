@@ -0,0 +1,444 @@
+# streaming.py
+
+import os
+import json
+import math
+from collections import deque
+
+import numpy as np
+
+NAN = float("nan")
+
+
+def _isnan(value):
+    return value != value
+
+
+# --- 1. Building blocks (same recurrences as pandas' ewm / rolling kernels) ---
+class _EWM:
+    """
+    One step of `Series.ewm(...).mean()`; `adjust=True` with alpha=1/n is Wilder's RMA.
+    """
+
+    def __init__(self, alpha, adjust=True, min_periods=1):
+        self.alpha = alpha
+        self.adjust = adjust
+        self.min_periods = min_periods
+        self.weighted = NAN
+        self.old_wt = 1.0
+        self.nobs = 0
+
+    def update(self, value):
+        is_observation = not _isnan(value)
+        self.nobs += is_observation
+        if not _isnan(self.weighted):
+            self.old_wt *= 1.0 - self.alpha
+            if is_observation:
+                new_wt = 1.0 if self.adjust else self.alpha
+                if self.weighted != value:
+                    self.weighted = (self.old_wt * self.weighted + new_wt * value) / (self.old_wt + new_wt)
+                self.old_wt = self.old_wt + new_wt if self.adjust else 1.0
+        elif is_observation:
+            self.weighted = value
+        return self.weighted if self.nobs >= self.min_periods else NAN
+
+
+class _RollingMean:
+    """
+    Fixed-window mean with Kahan-compensated add/remove, like `Series.rolling(n).mean()`.
+    """
+
+    def __init__(self, length):
+        self.length = length
+        self.window = deque()
+        self.nobs = 0
+        self.sum_x = 0.0
+        self.neg_ct = 0
+        self.comp_add = 0.0
+        self.comp_remove = 0.0
+        self.same_count = 0
+        self.prev_value = NAN
+
+    def update(self, value):
+        if len(self.window) == self.length:
+            self._remove(self.window.popleft())
+        self.window.append(value)
+        self._add(value)
+
+        if self.nobs < self.length:
+            return NAN
+        result = self.sum_x / self.nobs
+        if self.same_count >= self.nobs:
+            result = self.prev_value
+        elif self.neg_ct == 0 and result < 0:
+            result = 0.0
+        elif self.neg_ct == self.nobs and result > 0:
+            result = 0.0
+        return result
+
+    def _add(self, value):
+        if _isnan(value):
+            return
+        self.nobs += 1
+        y = value - self.comp_add
+        t = self.sum_x + y
+        self.comp_add = t - self.sum_x - y
+        self.sum_x = t
+        self.neg_ct += math.copysign(1.0, value) < 0
+        self.same_count = self.same_count + 1 if value == self.prev_value else 1
+        self.prev_value = value
+
+    def _remove(self, value):
+        if _isnan(value):
+            return
+        self.nobs -= 1
+        y = -value - self.comp_remove
+        t = self.sum_x + y
+        self.comp_remove = t - self.sum_x - y
+        self.sum_x = t
+        self.neg_ct -= math.copysign(1.0, value) < 0
+
+
+class _RollingStd:
+    """
+    Fixed-window standard deviation (Welford with Kahan terms), like `rolling(n).std(ddof)`.
+    """
+
+    def __init__(self, length, ddof=0):
+        self.length = length
+        self.ddof = ddof
+        self.window = deque()
+        self.nobs = 0
+        self.mean_x = 0.0
+        self.ssqdm_x = 0.0
+        self.comp_add = 0.0
+        self.comp_remove = 0.0
+        self.same_count = 0
+        self.prev_value = NAN
+
+    def update(self, value):
+        if len(self.window) == self.length:
+            self._remove(self.window.popleft())
+        self.window.append(value)
+        self._add(value)
+
+        if self.nobs < self.length or self.nobs <= self.ddof:
+            return NAN
+        if self.nobs == 1 or self.same_count >= self.nobs:
+            return 0.0
+        variance = self.ssqdm_x / (self.nobs - self.ddof)
+        return math.sqrt(variance) if variance > 0 else 0.0
+
+    def _add(self, value):
+        if _isnan(value):
+            return
+        self.nobs += 1
+        self.same_count = self.same_count + 1 if value == self.prev_value else 1
+        self.prev_value = value
+        prev_mean = self.mean_x - self.comp_add
+        y = value - self.comp_add
+        t = y - self.mean_x
+        self.comp_add = t + self.mean_x - y
+        self.mean_x = self.mean_x + t / self.nobs
+        self.ssqdm_x = self.ssqdm_x + (value - prev_mean) * (value - self.mean_x)
+
+    def _remove(self, value):
+        if _isnan(value):
+            return
+        self.nobs -= 1
+        if self.nobs:
+            prev_mean = self.mean_x - self.comp_remove
+            y = value - self.comp_remove
+            t = y - self.mean_x
+            self.comp_remove = t + self.mean_x - y
+            self.mean_x = self.mean_x - t / self.nobs
+            self.ssqdm_x = self.ssqdm_x - (value - prev_mean) * (value - self.mean_x)
+        else:
+            self.mean_x = 0.0
+            self.ssqdm_x = 0.0
+
+
+class _RollingExtreme:
+    """
+    Fixed-window max (or min) with a monotonic deque, O(1) amortised per bar.
+    """
+
+    def __init__(self, length, is_max=True):
+        self.length = length
+        self.is_max = is_max
+        self.count = 0
+        self.candidates = deque()  # (bar number, value), values monotonic
+
+    def update(self, value):
+        self.count += 1
+        while self.candidates and self.candidates[0][0] <= self.count - self.length:
+            self.candidates.popleft()
+        if not _isnan(value):
+            while self.candidates and (self.candidates[-1][1] <= value if self.is_max
+                                       else self.candidates[-1][1] >= value):
+                self.candidates.pop()
+            self.candidates.append((self.count, value))
+        if self.count < self.length or len(self.candidates) == 0:
+            return NAN
+        return self.candidates[0][1]
+
+
+# --- 2. Streaming indicators (same values as src.indicators / pandas_ta) ---
+class StreamingIndicator:
+    """
+    Base class: `update(...)` consumes one bar and returns the latest value.
+    State round-trips through `to_dict()` / `from_dict()` for checkpoints.
+    """
+
+    def to_dict(self):
+        return _encode(self)
+
+    @staticmethod
+    def from_dict(data):
+        return _decode(data)
+
+
+class StreamingRSI(StreamingIndicator):
+    def __init__(self, length=14):
+        self.prev_close = NAN
+        self.gain = _EWM(1.0 / length, min_periods=length)
+        self.loss = _EWM(1.0 / length, min_periods=length)
+        self.value = NAN
+
+    def update(self, close):
+        delta = close - self.prev_close
+        self.prev_close = close
+        positive_avg = self.gain.update(delta if _isnan(delta) else max(delta, 0.0))
+        negative_avg = self.loss.update(delta if _isnan(delta) else min(delta, 0.0))
+        self.value = 100 * positive_avg / (positive_avg + abs(negative_avg))
+        return self.value
+
+
+class StreamingSMA(StreamingIndicator):
+    def __init__(self, length):
+        self.mean = _RollingMean(length)
+        self.value = NAN
+
+    def update(self, close):
+        self.value = self.mean.update(close)
+        return self.value
+
+
+class StreamingEMA(StreamingIndicator):
+    """
+    EMA seeded with the SMA of the first `length` values, like `pandas_ta.ema`.
+    """
+
+    def __init__(self, length=10):
+        self.length = length
+        self.seed = []
+        self.ewm = _EWM(2.0 / (length + 1), adjust=False)
+        self.value = NAN
+
+    def update(self, close):
+        if self.seed is not None:
+            self.seed.append(close)
+            if len(self.seed) < self.length:
+                return NAN
+            # Same reduction as `Series.mean()` (NaN-skipping, pairwise sum)
+            seed = np.array(self.seed)
+            valid = ~np.isnan(seed)
+            close = np.where(valid, seed, 0.0).sum() / valid.sum() if valid.any() else NAN
+            self.seed = None
+        self.value = self.ewm.update(close)
+        return self.value
+
+
+class StreamingMACD(StreamingIndicator):
+    def __init__(self, fast=12, slow=26, signal=9):
+        self.fast = StreamingEMA(fast)
+        self.slow = StreamingEMA(slow)
+        self.signal = StreamingEMA(signal)
+        self.value = (NAN, NAN, NAN)
+
+    def update(self, close):
+        line = self.fast.update(close) - self.slow.update(close)
+        signal = self.signal.update(line) if not _isnan(line) else NAN
+        self.value = (line, line - signal, signal)
+        return self.value
+
+
+class StreamingATR(StreamingIndicator):
+    """
+    Matches `pandas_ta.atr` except for its whole-series epsilon nudge on zero-range bars.
+    """
+
+    def __init__(self, length=14):
+        self.prev_close = NAN
+        self.rma = _EWM(1.0 / length, min_periods=length)
+        self.value = NAN
+
+    def update(self, high, low, close):
+        prev_close = self.prev_close
+        self.prev_close = close
+        if _isnan(prev_close):
+            true_range = NAN
+        else:
+            true_range = max(abs(high - low), abs(high - prev_close), abs(prev_close - low))
+        self.value = self.rma.update(true_range)
+        return self.value
+
+
+class StreamingBollinger(StreamingIndicator):
+    def __init__(self, length=20, std=2.0):
+        self.mean = _RollingMean(length)
+        self.std = _RollingStd(length, ddof=0)
+        self.width = std
+        self.value = (NAN, NAN, NAN)
+
+    def update(self, close):
+        mid = self.mean.update(close)
+        deviation = self.width * self.std.update(close)
+        self.value = (mid - deviation, mid, mid + deviation)
+        return self.value
+
+
+class StreamingWilliamsR(StreamingIndicator):
+    def __init__(self, length=14):
+        self.highest = _RollingExtreme(length, is_max=True)
+        self.lowest = _RollingExtreme(length, is_max=False)
+        self.value = NAN
+
+    def update(self, high, low, close):
+        highest_high = self.highest.update(high)
+        lowest_low = self.lowest.update(low)
+        self.value = 100 * ((close - lowest_low) / (highest_high - lowest_low) - 1)
+        return self.value
+
+
+# --- 3. Signals & features on top of the indicators ---
+class StreamingSignalGenerator(StreamingIndicator):
+    """
+    Emits the strategy events bar by bar:
+      - "oversold": RSI below the threshold (the `signal == 1` rows of the Buy_Signals sheet)
+      - "cross_up" / "cross_down": SMA fast/slow crossovers
+      - "buy" / "sell": MyStrategy decisions (`latch=True` is backtest.MyStrategy, False is backtest.BotStrategy)
+    """
+
+    def __init__(self, rsi_length=14, oversold=30, fast=20, slow=50, latch=True):
+        self.rsi = StreamingRSI(rsi_length)
+        self.fast = StreamingSMA(fast)
+        self.slow = StreamingSMA(slow)
+        self.threshold = oversold
+        self.latch = latch
+        self.prev = None  # (fast, slow) of the previous bar once every indicator is defined
+        self.oversold_flag = False
+        self.is_long = False
+
+    def update(self, close, time=None):
+        rsi = self.rsi.update(close)
+        fast = self.fast.update(close)
+        slow = self.slow.update(close)
+        if _isnan(rsi) or _isnan(fast) or _isnan(slow):
+            self.prev = None
+            return []
+
+        prev, self.prev = self.prev, (fast, slow)
+        if prev is None:
+            # Backtest.run starts one bar after every indicator is defined
+            return []
+
+        events = []
+        oversold = rsi < self.threshold
+        cross_up = prev[0] < prev[1] and fast > slow
+        cross_down = prev[1] < prev[0] and slow > fast
+        if oversold:
+            events.append({"type": "oversold", "time": time, "close": close, "rsi": rsi})
+        if cross_up:
+            events.append({"type": "cross_up", "time": time, "close": close, "rsi": rsi})
+        if cross_down:
+            events.append({"type": "cross_down", "time": time, "close": close, "rsi": rsi})
+
+        if self.latch and oversold:
+            self.oversold_flag = True
+        armed = self.oversold_flag if self.latch else oversold
+        if armed and cross_up:
+            events.append({"type": "buy", "time": time, "close": close, "rsi": rsi})
+            self.oversold_flag = False
+            self.is_long = True
+        elif self.is_long and cross_down:
+            events.append({"type": "sell", "time": time, "close": close, "rsi": rsi})
+            self.is_long = False
+        return events
+
+
+class FeatureStream(StreamingIndicator):
+    """
+    Maintains the ML `FEATURE_COLS` row incrementally, so the latest bar can be scored
+    without refetching and recomputing the history.
+    """
+
+    def __init__(self):
+        self.rsi = StreamingRSI(14)
+        self.macd = StreamingMACD(12, 26, 9)
+        self.atr = StreamingATR(14)
+        self.bbands = StreamingBollinger(20)
+        self.willr = StreamingWilliamsR(14)
+        self.prev = (NAN, NAN)
+
+    def update(self, high, low, close):
+        rsi = self.rsi.update(close)
+        macd = self.macd.update(close)[0]
+        lower, _, upper = self.bbands.update(close)
+        row = {
+            "RSI": rsi,
+            "MACD": macd,
+            "ATR": self.atr.update(high, low, close),
+            "BBU": upper,
+            "BBL": lower,
+            "WILLR": self.willr.update(high, low, close),
+            "RSI_prev": self.prev[0],
+            "MACD_prev": self.prev[1],
+        }
+        self.prev = (rsi, macd)
+        return row
+
+
+# --- 4. Checkpoints ---
+def _encode(value):
+    if isinstance(value, deque):
+        return {"__deque__": [_encode(v) for v in value]}
+    if isinstance(value, tuple):
+        return {"__tuple__": [_encode(v) for v in value]}
+    if isinstance(value, list):
+        return [_encode(v) for v in value]
+    if isinstance(value, dict):
+        return {k: _encode(v) for k, v in value.items()}
+    if hasattr(value, "__dict__"):
+        return {"__class__": type(value).__name__, "state": _encode(value.__dict__)}
+    return value
+
+
+def _decode(value):
+    if isinstance(value, list):
+        return [_decode(v) for v in value]
+    if not isinstance(value, dict):
+        return value
+    if "__deque__" in value:
+        return deque(_decode(v) for v in value["__deque__"])
+    if "__tuple__" in value:
+        return tuple(_decode(v) for v in value["__tuple__"])
+    if "__class__" in value:
+        obj = globals()[value["__class__"]].__new__(globals()[value["__class__"]])
+        obj.__dict__.update(_decode(value["state"]))
+        return obj
+    return {k: _decode(v) for k, v in value.items()}
+
+
+def save_checkpoint(path, streams):
+    """
+    Writes {key: streaming object} to a JSON checkpoint (NaN is kept as JSON NaN).
+    """
+    with open(path + ".tmp", "w") as f:
+        json.dump({key: _encode(obj) for key, obj in streams.items()}, f)
+    os.replace(path + ".tmp", path)
+
+
+def load_checkpoint(path):
+    with open(path) as f:
+        return {key: _decode(value) for key, value in json.load(f).items()}
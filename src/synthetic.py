@@ -0,0 +1,204 @@
+# synthetic.py
+
+import time
+import zlib
+import numpy as np
+import pandas as pd
+
+EPOCH = np.datetime64("2000-01-03")
+SESSION_MINUTES = (9 * 60 + 15, 15 * 60 + 30)  # NSE 09:15-15:30
+
+# Market regimes for the switching model: (name, daily drift, daily volatility, mean length in days)
+REGIMES = (
+    ("bull", 0.0008, 0.010, 120),
+    ("bear", -0.0012, 0.022, 45),
+    ("sideways", 0.0, 0.013, 60),
+)
+
+
+def _ticker_seed(ticker, seed):
+    return (zlib.crc32(ticker.encode()) + seed) % (2 ** 32)
+
+
+def regime_returns(seed, n, step=1.0, regimes=REGIMES):
+    """
+    Log returns of a regime-switching GBM: the regime follows a Markov jump chain with
+    geometric holding times (mean length in days / `step`) and each bar draws from
+    N(drift * step, vol^2 * step) of the current regime. `step` is the bar length in
+    trading days. Separate streams keep every prefix independent of `n`.
+    Returns (returns, regime index per bar).
+    """
+    length_rng, jump_rng, shock_rng = (np.random.default_rng([*np.atleast_1d(seed), k]) for k in (10, 11, 12))
+    drift = np.array([r[1] for r in regimes])
+    vol = np.array([r[2] for r in regimes])
+    mean_bars = np.array([max(r[3] / step, 1.0) for r in regimes])
+
+    state = np.empty(n, dtype=np.int64)
+    pos, current = 0, 0
+    while pos < n:
+        length = int(length_rng.geometric(1.0 / mean_bars[current]))
+        state[pos:pos + length] = current
+        pos += length
+        others = [k for k in range(len(regimes)) if k != current]
+        current = others[int(jump_rng.integers(len(others)))]
+
+    shocks = shock_rng.standard_normal(n)
+    return drift[state] * step + vol[state] * np.sqrt(step) * shocks, state
+
+
+def _ohlcv(returns, open_rng, range_rng, vol_rng, step=1.0):
+    close = 100.0 * np.exp(np.cumsum(returns))
+    open_ = close * np.exp(open_rng.normal(0.0, 0.004 * np.sqrt(step), len(returns)))
+    spread = np.abs(range_rng.normal(0.0, 0.008 * np.sqrt(step), len(returns))) * close
+    high = np.maximum(open_, close) + spread
+    low = np.minimum(open_, close) - spread
+    volume = np.maximum((vol_rng.integers(100_000, 5_000_000, len(returns)) * step).astype(np.int64), 1)
+    return open_, high, low, close, volume
+
+
+def synthetic_bars(ticker, start, end, interval="1d", seed=0, model="gbm"):
+    """
+    Deterministic OHLCV bars for one ticker on business days: geometric Brownian motion
+    (`model="gbm"`) or regime-switching GBM (`model="regime"`, see `regime_returns`).
+    The path is anchored at EPOCH, so overlapping ranges return identical bars.
+    """
+    first = min(np.datetime64(pd.Timestamp(start).date()), EPOCH)
+    days = np.arange(first, np.datetime64(pd.Timestamp(end).date()), dtype="datetime64[D]")
+    days = days[np.is_busday(days)]
+    # One stream per field keeps each prefix of the path independent of `end`
+    base = _ticker_seed(ticker, seed)
+    ret_rng, open_rng, range_rng, vol_rng = (np.random.default_rng([base, k]) for k in range(4))
+    n = len(days)
+
+    if model == "regime":
+        returns, _ = regime_returns([base, 4], n)
+    else:
+        returns = ret_rng.normal(0.0003, 0.015, n)
+    open_, high, low, close, volume = _ohlcv(returns, open_rng, range_rng, vol_rng)
+
+    keep = days >= np.datetime64(pd.Timestamp(start).date())
+    return pd.DataFrame({"Open": open_[keep], "High": high[keep], "Low": low[keep],
+                         "Close": close[keep], "Volume": volume[keep]},
+                        index=pd.DatetimeIndex(days[keep].astype("datetime64[ns]"), name="Date"))
+
+
+def synthetic_minute_bars(ticker, start, end, seed=0, session=("09:15", "15:30")):
+    """
+    Deterministic one-minute bars for each business day's trading session. Every day runs
+    a Brownian bridge from that day's `synthetic_bars` open to its close, so intraday and
+    daily data agree and overlapping ranges return identical bars.
+    """
+    daily = synthetic_bars(ticker, start, end, seed=seed)
+    open_minute, close_minute = (int(t[:2]) * 60 + int(t[3:]) for t in session)
+    m = close_minute - open_minute
+    n_days = len(daily)
+    base = _ticker_seed(ticker, seed)
+
+    # One stream per day keeps every day independent of the requested range
+    ordinals = (daily.index.values.astype("datetime64[D]") - EPOCH).astype(np.int64)
+    shocks = np.empty((n_days, m))
+    noise = np.empty((n_days, m, 2))
+    for i, day in enumerate(ordinals):
+        rng = np.random.default_rng([base, int(day) + 10_000, 7])
+        shocks[i] = rng.normal(0.0, 1.0, m)
+        noise[i] = rng.random((m, 2))
+
+    log_open = np.log(daily["Open"].to_numpy())[:, None]
+    log_close = np.log(daily["Close"].to_numpy())[:, None]
+    walk = np.cumsum(shocks, axis=1) * (0.012 / np.sqrt(m))
+    steps = np.arange(1, m + 1) / m
+    path = log_open + steps * (log_close - log_open) + walk - steps * walk[:, -1:]
+
+    close = np.exp(path)
+    open_ = np.concatenate([np.exp(log_open), close[:, :-1]], axis=1)
+    wiggle = 1 + noise[..., 0] * 0.0008
+    high = np.maximum(open_, close) * wiggle
+    low = np.minimum(open_, close) / wiggle
+    profile = 1.5 - np.sin(np.linspace(0, np.pi, m))  # busier open and close
+    volume = (daily["Volume"].to_numpy()[:, None] / m * profile * (0.5 + noise[..., 1])).astype(np.int64)
+
+    minutes = (daily.index.values.astype("datetime64[m]")[:, None]
+               + np.arange(open_minute, close_minute).astype("timedelta64[m]"))
+    return pd.DataFrame({"Open": open_.ravel(), "High": high.ravel(), "Low": low.ravel(),
+                         "Close": close.ravel(), "Volume": volume.ravel()},
+                        index=pd.DatetimeIndex(minutes.ravel().astype("datetime64[ns]"), name="Date"))
+
+
+def _interval_minutes(interval):
+    """
+    "1d" -> None (daily bars); "15m", "1h", ... -> bar length in minutes.
+    """
+    if interval.endswith("d"):
+        return None
+    return int(pd.Timedelta(interval.replace("m", "min")) / pd.Timedelta(minutes=1))
+
+
+def bar_index(n_bars, interval="1d", start=EPOCH):
+    """
+    The first `n_bars` bar timestamps from `start`: business days, or intraday bars of
+    `interval` anchored at each session open (the last bar of a day may be partial).
+    """
+    minutes = _interval_minutes(interval)
+    per_day = 1 if minutes is None else -(-(SESSION_MINUTES[1] - SESSION_MINUTES[0]) // minutes)
+    first = np.datetime64(pd.Timestamp(start).date())
+    days = np.busday_offset(first, np.arange(-(-n_bars // per_day)), roll="forward")
+    if minutes is None:
+        return pd.DatetimeIndex(days.astype("datetime64[ns]"), name="Date")
+    offsets = SESSION_MINUTES[0] + np.arange(per_day) * minutes
+    stamps = (days.astype("datetime64[m]")[:, None] + offsets.astype("timedelta64[m]")).ravel()[:n_bars]
+    return pd.DatetimeIndex(stamps.astype("datetime64[ns]"), name="Date")
+
+
+def benchmark_bars(ticker, n_bars, interval="1d", model="regime", seed=0):
+    """
+    Exactly `n_bars` deterministic bars of `interval` for one ticker (benchmarks size
+    workloads by bar count, not by date range). Drift and volatility scale with bar length.
+    """
+    minutes = _interval_minutes(interval)
+    step = 1.0 if minutes is None else minutes / (SESSION_MINUTES[1] - SESSION_MINUTES[0])
+    base = _ticker_seed(ticker, seed)
+    ret_rng, open_rng, range_rng, vol_rng = (np.random.default_rng([base, k, 1]) for k in range(4))
+    if model == "regime":
+        returns, _ = regime_returns([base, 5], n_bars, step=step)
+    else:
+        returns = ret_rng.normal(0.0003 * step, 0.015 * np.sqrt(step), n_bars)
+    open_, high, low, close, volume = _ohlcv(returns, open_rng, range_rng, vol_rng, step)
+    return pd.DataFrame({"Open": open_, "High": high, "Low": low, "Close": close, "Volume": volume},
+                        index=bar_index(n_bars, interval))
+
+
+def synthetic_universe(n_tickers, n_bars, interval="1d", model="regime", seed=0):
+    """
+    Long Date/Ticker/OHLCV frame (the `fetch_data` shape) for `n_tickers` x `n_bars`.
+    Returns (frame, {ticker: per-ticker frame}).
+    """
+    tickers = [f"SYN{i:04d}.NS" for i in range(n_tickers)]
+    frames = {t: benchmark_bars(t, n_bars, interval, model, seed) for t in tickers}
+    long = pd.concat([f.assign(Ticker=t).reset_index() for t, f in frames.items()], ignore_index=True)
+    return long[["Date", "Ticker", "Open", "High", "Low", "Close", "Volume"]], frames
+
+
+def synthetic_source(latency=0.0, seed=0, fail=(), model="gbm"):
+    """
+    Returns an ingestion source serving synthetic bars.
+    `latency` simulates the per-call network round trip; tickers in `fail` are left out.
+    """
+    def source(tickers, start, end, interval="1d"):
+        if latency:
+            time.sleep(latency)
+        return {ticker: synthetic_bars(ticker, start, end, interval, seed=seed, model=model)
+                for ticker in tickers if ticker not in fail}
+
+    return source
+
+
+def synthetic_downloader(model="gbm", seed=0):
+    """
+    An OHLCVCache downloader `(tickers, start, end, interval) -> long frame` serving
+    synthetic bars, so `fetch_data` runs offline: `set_cache(OHLCVCache(synthetic_downloader()))`.
+    """
+    def download(tickers, start, end, interval="1d"):
+        from src.ingestion import fetch_universe
+        return fetch_universe(tickers, start, end, interval, source=synthetic_source(seed=seed, model=model))[0]
+
+    return download
@@ -0,0 +1,167 @@
+# training.py
+
+import os
+import json
+import time
+import hashlib
+
+import numpy as np
+
+from src.ingestion import fetch_data, OHLCV_COLS
+from src.indicators import IndicatorEngine
+from src.instrument import traced
+from src.tree_pack import export_models
+from src.ml_model import (FEATURE_COLS, MODEL_DIR, PARAM_GRID, TRAIN_START, TRAIN_END,
+                          prepare_features, save_model)
+from src.validation import purged_search, fit_final, VALIDATION, N_SPLITS, EMBARGO
+
+FEATURE_DIR = "feature_cache"
+MANIFEST_NAME = "training_manifest.json"
+
+
+# --- 1. Cached feature matrices ---
+class FeatureStore:
+    """
+    Keeps each ticker's FEATURE_COLS matrix and Target vector in `root/{ticker}.npz`,
+    tagged with a hash of the raw OHLCV bars they were built from. The features are
+    rebuilt only when those bars change.
+    """
+
+    def __init__(self, root=FEATURE_DIR):
+        self.root = root
+        self.stats = {"hits": 0, "builds": 0}
+
+    def _path(self, ticker):
+        return os.path.join(self.root, f"{ticker}.npz")
+
+    def get(self, ticker, raw):
+        """
+        Returns (X, y, data_version) for one ticker's raw OHLCV frame.
+        """
+        version = IndicatorEngine.data_version(*(raw[col] for col in OHLCV_COLS))
+        path = self._path(ticker)
+        if os.path.exists(path):
+            with np.load(path) as stored:
+                if str(stored["version"]) == version:
+                    self.stats["hits"] += 1
+                    return stored["X"], stored["y"], version
+
+        df = prepare_features(raw.copy(), ticker)
+        X = df[FEATURE_COLS].to_numpy(dtype=np.float64)
+        y = df["Target"].to_numpy()
+        os.makedirs(self.root, exist_ok=True)
+        np.savez(path, X=X, y=y, version=version)
+        self.stats["builds"] += 1
+        return X, y, version
+
+
+def _params_version(param_grid):
+    # The validation scheme is part of the version, so models selected another way retrain
+    spec = {"grid": param_grid, "validation": VALIDATION, "splits": N_SPLITS, "embargo": EMBARGO}
+    return hashlib.blake2b(json.dumps(spec, sort_keys=True).encode(), digest_size=12).hexdigest()
+
+
+def _load_manifest(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def _save_manifest(path, manifest):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, path)
+
+
+# --- 2. Orchestrator ---
+@traced()
+def train_models(tickers, param_grid=PARAM_GRID, max_workers=None, force=False,
+                 feature_store=None, model_dir=MODEL_DIR, start=TRAIN_START, end=TRAIN_END):
+    """
+    Trains one model per ticker: parameters chosen by purged walk-forward CV with every
+    ticker x param x fold fit scheduled on a single process pool of `max_workers` processes
+    (the global budget; each worker runs single-threaded), then a final fit on every
+    labelled row. Tickers whose data and grid are unchanged since the last run are skipped
+    unless `force` is set. `end=None` trains up to the latest cached bar, so new bars
+    change the data version and trigger a retrain.
+
+    Returns {ticker: {"best_params", "accuracy", "status"}}; `accuracy` is the purged
+    holdout accuracy (the newest fold, never used for selection).
+    """
+    feature_store = feature_store or FeatureStore()
+    params_version = _params_version(param_grid)
+    manifest_path = os.path.join(model_dir, MANIFEST_NAME)
+    manifest = _load_manifest(manifest_path)
+
+    raw = fetch_data(list(tickers), start=start, end=end)
+    results, pending = {}, {}
+    for ticker in tickers:
+        df = raw[raw["Ticker"] == ticker].dropna().reset_index(drop=True)
+        if df.empty:
+            results[ticker] = {"best_params": None, "accuracy": None, "status": "no data"}
+            continue
+        X, y, version = feature_store.get(ticker, df)
+
+        entry = manifest.get(ticker, {})
+        up_to_date = (entry.get("data_version") == version and entry.get("params_version") == params_version
+                      and all(os.path.exists(os.path.join(model_dir, f"{ticker}_{kind}.pkl"))
+                              for kind in ("model", "scaler")))
+        if up_to_date and not force:
+            results[ticker] = {"best_params": entry["best_params"], "accuracy": entry["accuracy"],
+                               "status": "unchanged"}
+            continue
+        pending[ticker] = (version, X[:-1], y[:-1])  # the last row's label needs the next bar
+
+    if pending:
+        started = time.perf_counter()
+        selected = purged_search({t: (X, y) for t, (_, X, y) in pending.items()}, param_grid,
+                                 max_workers=max_workers)
+        print(f" Purged walk-forward search for {len(pending)} tickers "
+              f"in {time.perf_counter() - started:.2f}s")
+
+        for ticker, (version, X, y) in pending.items():
+            result = selected.get(ticker)
+            if result is None:
+                results[ticker] = {"best_params": None, "accuracy": None, "status": "too few rows"}
+                continue
+            best, accuracy = result["params"], result["holdout_accuracy"]
+            model, scaler = fit_final(X, y, best)
+            save_model(model, scaler, ticker, model_dir)
+            print(f"\n📊 {ticker} - Best Parameters: {best}")
+            print(f"✅ Accuracy (purged walk-forward holdout): {accuracy:.4f} | CV: {result['cv_accuracy']:.4f}")
+
+            manifest[ticker] = {"data_version": version, "params_version": params_version,
+                                "best_params": best, "accuracy": accuracy,
+                                "cv_accuracy": result["cv_accuracy"], "validation": VALIDATION,
+                                "folds": result["folds"], "embargo": EMBARGO}
+            results[ticker] = {"best_params": best, "accuracy": accuracy, "status": "trained"}
+        _save_manifest(manifest_path, manifest)
+    export_models(model_dir)  # NumPy tree pack for sklearn-free scoring (no-op when unchanged)
+
+    return results
+
+
+if __name__ == "__main__":
+    import tempfile
+    from src.ingestion import set_cache, fetch_universe
+    from src.data_cache import OHLCVCache
+    from src.synthetic import synthetic_source
+
+    def synthetic_download(tickers, start, end, interval):
+        return fetch_universe(tickers, start, end, interval, source=synthetic_source())[0]
+
+    universe = [f"SYN{i:02d}.NS" for i in range(24)]
+    with tempfile.TemporaryDirectory() as tmp:
+        set_cache(OHLCVCache(synthetic_download, root=os.path.join(tmp, "bars")))
+        store = FeatureStore(os.path.join(tmp, "features"))
+
+        for workers in (1, None):
+            t0 = time.perf_counter()
+            train_models(universe, max_workers=workers, force=True, feature_store=store, model_dir=tmp)
+            print(f"max_workers={workers}: {time.perf_counter() - t0:.2f}s")
+        t0 = time.perf_counter()
+        train_models(universe, feature_store=store, model_dir=tmp)
+        print(f"Unchanged rerun: {time.perf_counter() - t0:.2f}s | feature store: {store.stats}")
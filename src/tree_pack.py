@@ -0,0 +1,371 @@
+# tree_pack.py
+
+import os
+import json
+import time
+import uuid
+import threading
+import contextlib
+
+import numpy as np
+import pandas as pd
+
+try:
+    import fcntl
+except ImportError:  # Windows: exports are serialized within the process only
+    fcntl = None
+
+PACK_DIR = "native"  # under the model directory
+INDEX_NAME = "index.json"
+LOCK_NAME = ".export.lock"
+TREE_LEAF = -1  # sklearn.tree._tree.TREE_LEAF
+NODE_ARRAYS = ("feature", "threshold", "left", "right", "missing_left", "proba")
+MODEL_ARRAYS = ("root", "mean", "scale")
+
+
+# --- 1. Export (needs the pickles, so sklearn, only here) ---
+def tree_arrays(model, scaler):
+    """
+    One fitted DecisionTreeClassifier + StandardScaler as flat arrays: per node the split
+    feature, threshold, children, NaN direction and normalized class probabilities
+    (exactly what predict_proba divides out), plus the scaler's mean and scale.
+    """
+    tree = model.tree_
+    value = np.asarray(tree.value, dtype=np.float64)[:, 0, :]
+    normalizer = value.sum(axis=1, keepdims=True)
+    normalizer[normalizer == 0.0] = 1.0
+    n_features = model.n_features_in_
+    mean = getattr(scaler, "mean_", None)
+    scale = getattr(scaler, "scale_", None)
+    return {
+        "feature": tree.feature.astype(np.int32),
+        "threshold": tree.threshold.astype(np.float64),
+        "left": tree.children_left.astype(np.int32),
+        "right": tree.children_right.astype(np.int32),
+        "missing_left": np.asarray(getattr(tree, "missing_go_to_left", np.zeros(tree.node_count)), dtype=np.uint8),
+        "proba": value / normalizer,
+        "mean": np.zeros(n_features) if mean is None else np.asarray(mean, dtype=np.float64),
+        "scale": np.ones(n_features) if scale is None else np.asarray(scale, dtype=np.float64),
+        "classes": [int(c) for c in model.classes_],
+    }
+
+
+def _file_signature(paths):
+    return [[s.st_mtime_ns, s.st_size] for s in map(os.stat, paths)]
+
+
+_export_lock = threading.Lock()
+
+
+@contextlib.contextmanager
+def export_lock(out_dir):
+    """
+    Exclusive lock on the pack directory, across threads and processes (JobRunner workers,
+    `train_models` racing `train_model`).
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    with _export_lock, open(os.path.join(out_dir, LOCK_NAME), "a") as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _read_index(out_dir):
+    try:
+        with open(os.path.join(out_dir, INDEX_NAME)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def write_pack(entries, out_dir, features):
+    """
+    Concatenates {ticker: (tree_arrays, signature)} into one set of .npy files (child ids
+    offset to global node ids) and an index. Array files carry a fresh token and the index
+    is replaced last, so readers never see a half-written pack. The previous pack's arrays
+    are kept for readers that loaded its index just before the switch; older ones are
+    removed. Call under `export_lock`.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    tickers = sorted(entries)
+    classes = entries[tickers[0]][0]["classes"] if tickers else [0, 1]
+    nodes = {name: [] for name in NODE_ARRAYS}
+    roots, offset = [], 0
+    for ticker in tickers:
+        arrays, _ = entries[ticker]
+        internal = arrays["left"] != TREE_LEAF
+        for name in NODE_ARRAYS:
+            values = arrays[name]
+            if name in ("left", "right"):
+                values = np.where(internal, values + offset, TREE_LEAF).astype(np.int32)
+            nodes[name].append(values)
+        roots.append(offset)
+        offset += len(arrays["left"])
+
+    n_features = len(features)
+    arrays = {name: (np.concatenate(parts) if parts else np.empty((0, len(classes)) if name == "proba" else 0))
+              for name, parts in nodes.items()}
+    arrays["root"] = np.asarray(roots, dtype=np.int32)
+    arrays["mean"] = np.vstack([entries[t][0]["mean"] for t in tickers]) if tickers else np.empty((0, n_features))
+    arrays["scale"] = np.vstack([entries[t][0]["scale"] for t in tickers]) if tickers else np.empty((0, n_features))
+
+    previous = (_read_index(out_dir) or {}).get("token")
+    token = uuid.uuid4().hex[:8]
+    for name, values in arrays.items():
+        np.save(os.path.join(out_dir, f"{name}-{token}.npy"), np.ascontiguousarray(values))
+    index = {"token": token, "previous": previous, "created": time.time(), "features": list(features), "classes": classes,
+             "nodes": offset, "tickers": {t: {"row": i, "signature": entries[t][1]} for i, t in enumerate(tickers)}}
+    index_path = os.path.join(out_dir, INDEX_NAME)
+    with open(index_path + ".tmp", "w") as f:
+        json.dump(index, f)
+    os.replace(index_path + ".tmp", index_path)
+
+    keep = {f"-{t}.npy" for t in (token, previous) if t}
+    for name in os.listdir(out_dir):  # arrays older than the previous pack
+        if name.endswith(".npy") and name[name.rfind("-"):] not in keep:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(os.path.join(out_dir, name))
+    return os.path.join(out_dir, INDEX_NAME)
+
+
+def export_models(model_dir, features=None):
+    """
+    Exports every `{ticker}_model.pkl` + `_scaler.pkl` in `model_dir` to `model_dir/native/`.
+    Tickers whose pickles are unchanged since the last export reuse their packed arrays,
+    so only retrained models are unpickled. Exports are serialized by a file lock; a missing
+    or broken pack is rebuilt from the pickles. Returns the loaded TreePack.
+    """
+    out_dir = os.path.join(model_dir, PACK_DIR)
+    with export_lock(out_dir):
+        return _export(model_dir, out_dir, features)
+
+
+def _export(model_dir, out_dir, features):
+    import joblib
+    from src.ml_model import FEATURE_COLS
+
+    old = load_pack(model_dir, mmap=False)
+    tickers = sorted(name[:-len("_model.pkl")] for name in os.listdir(model_dir) if name.endswith("_model.pkl"))
+
+    entries, reused = {}, 0
+    for ticker in tickers:
+        paths = [os.path.join(model_dir, f"{ticker}_{kind}.pkl") for kind in ("model", "scaler")]
+        if not os.path.exists(paths[1]):
+            continue
+        signature = _file_signature(paths)
+        if old is not None and old.signature(ticker) == signature:
+            entries[ticker] = (old.entry(ticker), signature)
+            reused += 1
+            continue
+        model, scaler = joblib.load(paths[0]), joblib.load(paths[1])
+        names = getattr(scaler, "feature_names_in_", None)
+        if names is not None and features is None:
+            features = [str(n) for n in names]
+        entries[ticker] = (tree_arrays(model, scaler), signature)
+
+    if old is not None and reused == len(entries) == len(old):
+        return load_pack(model_dir)  # nothing retrained or removed
+
+    # One pack serves one feature layout and class set; odd models stay on the sklearn path
+    features = list(features or (old.features if old is not None else FEATURE_COLS))
+    if entries:
+        first = next(iter(entries.values()))[0]["classes"]
+        entries = {t: e for t, e in entries.items()
+                   if e[0]["classes"] == first and len(e[0]["mean"]) == len(features)}
+    write_pack(entries, out_dir, features)
+    return load_pack(model_dir)
+
+
+# --- 2. Load & inference (NumPy only) ---
+class TreePack:
+    """
+    Memory-mapped per-ticker trees + scaler parameters. `predict_proba` reproduces
+    Pipeline(StandardScaler, DecisionTreeClassifier).predict_proba bit for bit: the scaled
+    rows are cast to float32 like sklearn's tree input, each split sends a row left when
+    `x <= threshold` (left or right per node for NaN) and the leaf's normalized
+    class distribution is returned.
+    """
+
+    def __init__(self, path, mmap=True):
+        with open(os.path.join(path, INDEX_NAME)) as f:
+            self.index = json.load(f)
+        self.path = path
+        self.features = self.index["features"]
+        self.classes = np.asarray(self.index["classes"])
+        self._rows = {t: entry["row"] for t, entry in self.index["tickers"].items()}
+        token, mode = self.index["token"], "r" if mmap else None
+        for name in NODE_ARRAYS + MODEL_ARRAYS:
+            setattr(self, name, np.load(os.path.join(path, f"{name}-{token}.npy"), mmap_mode=mode))
+
+    @property
+    def tickers(self):
+        return list(self._rows)
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __contains__(self, ticker):
+        return ticker in self._rows
+
+    def signature(self, ticker):
+        entry = self.index["tickers"].get(ticker)
+        return entry and entry["signature"]
+
+    def entry(self, ticker):
+        """
+        One ticker's arrays in `tree_arrays` form (local node ids), for re-export.
+        """
+        row = self._rows[ticker]
+        start = int(self.root[row])
+        end = int(self.root[row + 1]) if row + 1 < len(self.root) else int(self.index["nodes"])
+        arrays = {name: np.array(getattr(self, name)[start:end]) for name in NODE_ARRAYS}
+        internal = arrays["left"] != TREE_LEAF
+        for name in ("left", "right"):
+            arrays[name] = np.where(internal, arrays[name] - start, TREE_LEAF).astype(np.int32)
+        arrays.update(mean=np.array(self.mean[row]), scale=np.array(self.scale[row]),
+                      classes=self.index["classes"])
+        return arrays
+
+    def rows_for(self, tickers):
+        return np.fromiter((self._rows[t] for t in tickers), dtype=np.int64, count=len(tickers))
+
+    def apply(self, rows, X):
+        """
+        Leaf node id for each (model row, raw feature row) pair.
+        """
+        X = np.asarray(X, dtype=np.float64)
+        Xt = ((X - self.mean[rows]) / self.scale[rows]).astype(np.float32)
+        node = np.asarray(self.root)[rows].astype(np.int64)
+        active = np.arange(len(node))
+        while len(active):
+            current = node[active]
+            left = self.left[current]
+            split = left != TREE_LEAF
+            active, current, left = active[split], current[split], left[split]
+            if not len(active):
+                break
+            values = Xt[active, self.feature[current]]
+            go_left = values <= self.threshold[current]
+            missing = np.isnan(values)
+            if missing.any():
+                go_left = np.where(missing, self.missing_left[current].astype(bool), go_left)
+            node[active] = np.where(go_left, left, self.right[current])
+        return node
+
+    def predict_proba(self, tickers, X):
+        """
+        Class probabilities for raw feature rows `X` (n x features, in `self.features`
+        order), row i scored by the model of `tickers[i]` (or one ticker for every row).
+        """
+        X = np.atleast_2d(np.asarray(X, dtype=np.float64))
+        tickers = [tickers] * len(X) if isinstance(tickers, str) else list(tickers)
+        return np.asarray(self.proba[self.apply(self.rows_for(tickers), X)])
+
+    def predict(self, tickers, X):
+        """
+        (predicted class, probability of class 1) per row, like `ModelRegistry.predict`.
+        """
+        proba = self.predict_proba(tickers, X)
+        return self.classes[proba.argmax(axis=1)], proba[:, 1]
+
+
+def load_pack(model_dir, mmap=True):
+    """
+    The exported pack of `model_dir`, or None if it was never exported or is unreadable
+    (truncated index, arrays removed); callers then fall back to the pickles.
+    """
+    path = os.path.join(model_dir, PACK_DIR)
+    if not os.path.exists(os.path.join(path, INDEX_NAME)):
+        return None
+    try:
+        return TreePack(path, mmap=mmap)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"⚠️ Ignoring unreadable tree pack in {path}: {e}")
+        return None
+
+
+def feature_matrix(rows, features):
+    """
+    {ticker: Series/dict of features} -> (tickers, float64 matrix in `features` order).
+    """
+    tickers = list(rows)
+    X = np.empty((len(tickers), len(features)))
+    for i, ticker in enumerate(tickers):
+        row = rows[ticker]
+        if isinstance(row, pd.Series) and list(row.index) == features:
+            X[i] = row.to_numpy(dtype=np.float64)
+        else:
+            X[i] = [row[f] for f in features]
+    return tickers, X
+
+
+if __name__ == "__main__":
+    import io
+    import sys
+    import tempfile
+    import contextlib
+    import subprocess
+    from src.ml_model import prepare_features, save_model, FEATURE_COLS
+    from src.model_registry import ModelRegistry
+    from src.synthetic import synthetic_universe
+    from sklearn.tree import DecisionTreeClassifier
+    from sklearn.preprocessing import StandardScaler
+
+    n_tickers = 1000
+    _, frames = synthetic_universe(n_tickers, 700)
+    with tempfile.TemporaryDirectory() as model_dir:
+        rows, params = {}, [(4, 2, 1), (6, 5, 3), (10, 2, 1)]
+        for i, (ticker, raw) in enumerate(frames.items()):
+            df = prepare_features(raw, ticker)
+            scaler = StandardScaler().fit(df[FEATURE_COLS])
+            depth, split, leaf = params[i % len(params)]
+            model = DecisionTreeClassifier(random_state=42, max_depth=depth, min_samples_split=split,
+                                           min_samples_leaf=leaf).fit(scaler.transform(df[FEATURE_COLS]), df["Target"])
+            save_model(model, scaler, ticker, model_dir)
+            rows[ticker] = df[FEATURE_COLS]
+
+        t0 = time.perf_counter()
+        pack = export_models(model_dir)
+        export_s = time.perf_counter() - t0
+
+        # Exactness against sklearn on every training row of every ticker (plus NaNs)
+        registry = ModelRegistry(model_dir, max_models=n_tickers)
+        mismatches = checked = 0
+        for ticker, X in list(rows.items())[:200]:
+            X = X.to_numpy().copy()
+            X[::17, 3] = np.nan
+            expected = registry.get(ticker).predict_proba(pd.DataFrame(X, columns=FEATURE_COLS))
+            mismatches += int((pack.predict_proba(ticker, X) != expected).sum())
+            checked += expected.size
+        print(f"predict_proba exactness: {checked:,} values, {mismatches} mismatches")
+
+        latest = {t: X.iloc[-1] for t, X in rows.items()}
+        t0 = time.perf_counter()
+        registry = ModelRegistry(model_dir, max_models=n_tickers)
+        with contextlib.redirect_stdout(io.StringIO()):
+            for ticker, row in latest.items():
+                registry.get(ticker).predict_proba(pd.DataFrame([row]))
+        sklearn_s = time.perf_counter() - t0
+
+        code = ("import time, sys; t = time.perf_counter(); from src.tree_pack import load_pack, feature_matrix; "
+                "import pandas as pd; pack = load_pack(sys.argv[1]); "
+                "X = pd.read_pickle(sys.argv[2]); pack.predict(list(X.index), X.to_numpy()); "
+                "print(time.perf_counter() - t, 'sklearn' in sys.modules)")
+        pd.DataFrame(latest).T.to_pickle(os.path.join(model_dir, "latest.pkl"))
+        out = subprocess.run([sys.executable, "-c", code, model_dir, os.path.join(model_dir, "latest.pkl")],
+                             capture_output=True, text=True).stdout.split()
+        tickers, X = feature_matrix(latest, FEATURE_COLS)
+        t0 = time.perf_counter()
+        pack = load_pack(model_dir)
+        pack.predict(tickers, X)
+        native_s = time.perf_counter() - t0
+
+        size = sum(os.path.getsize(os.path.join(model_dir, PACK_DIR, f)) for f in os.listdir(os.path.join(model_dir, PACK_DIR)))
+        pickles = sum(os.path.getsize(os.path.join(model_dir, f)) for f in os.listdir(model_dir) if f.endswith(".pkl"))
+        print(f"{n_tickers} tickers | export {export_s:.2f}s | pack {size / 1e6:.2f} MB vs pickles {pickles / 1e6:.2f} MB")
+        print(f"Load + score latest rows: sklearn {sklearn_s * 1000:.0f}ms | pack {native_s * 1000:.1f}ms "
+              f"| pack in a fresh process incl. imports {float(out[0]) * 1000:.0f}ms (sklearn imported: {out[1]})")
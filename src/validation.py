@@ -0,0 +1,195 @@
+# validation.py
+
+import time
+
+import numpy as np
+import pandas as pd
+from sklearn.model_selection import ParameterGrid, GridSearchCV, train_test_split
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import StandardScaler
+from sklearn.tree import DecisionTreeClassifier
+from sklearn.metrics import accuracy_score
+
+from src.ml_model import FEATURE_COLS, PARAM_GRID
+from src.parallel import worker_map
+
+N_SPLITS = 5
+EMBARGO = 5
+
+
+# --- 1. Purged walk-forward folds ---
+def purged_walk_forward(n_rows, n_splits=N_SPLITS, horizon=1, embargo=EMBARGO, min_train=100):
+    """
+    Expanding-window (train_idx, test_idx) folds over time-ordered rows, oldest first.
+
+    The last `n_splits` blocks of equal size are the test windows. Training rows whose
+    label looks `horizon` bars ahead into the test window are purged, and `embargo` more
+    bars are dropped before it so serially correlated rows don't straddle the boundary.
+    Folds with fewer than `min_train` training rows are skipped.
+    """
+    test_size = n_rows // (n_splits + 1)
+    folds = []
+    for k in range(n_splits):
+        test_start = n_rows - (n_splits - k) * test_size
+        train_end = test_start - horizon - embargo
+        if test_size == 0 or train_end < min_train:
+            continue
+        folds.append((np.arange(train_end), np.arange(test_start, test_start + test_size)))
+    return folds
+
+
+def labelled(df, horizon=1):
+    """
+    FEATURE_COLS / Target arrays without the last `horizon` rows, whose label needs bars
+    that don't exist yet (`prepare_features` keeps them for prediction).
+    """
+    X = df[FEATURE_COLS].to_numpy(dtype=np.float64)[:-horizon]
+    y = df['Target'].to_numpy()[:-horizon]
+    return X, y
+
+
+# --- 2. Worker ---
+def _fit_fold(state, job):
+    """
+    Fits the scaler -> tree pipeline on one fold's training rows and scores its test rows.
+    """
+    ticker, candidate, fold = job
+    X, y, folds = state["datasets"][ticker]
+    train_idx, test_idx = folds[fold]
+    model = make_pipeline(StandardScaler(),
+                          DecisionTreeClassifier(random_state=42, **state["candidates"][candidate]))
+    model.fit(X[train_idx], y[train_idx])
+    return ticker, candidate, fold, model.score(X[test_idx], y[test_idx])
+
+
+# --- 3. Estimates ---
+VALIDATION = "purged_walk_forward"
+
+
+def purged_search(datasets, param_grid=PARAM_GRID, n_splits=N_SPLITS, horizon=1, embargo=EMBARGO,
+                  max_workers=None):
+    """
+    Purged walk-forward grid search on {ticker: (X, y)} labelled arrays (time-ordered).
+    The fold index arrays are built once per ticker and shared by every parameter combo;
+    all ticker x param x fold fits run on one process pool.
+
+    The newest fold is a final holdout: params are chosen on the mean accuracy of the
+    earlier folds (`cv_accuracy`) and then scored once on the holdout (`holdout_accuracy`).
+    Returns {ticker: {"params", "cv_accuracy", "holdout_accuracy", "folds"}}; tickers with
+    too few rows for two folds are left out.
+    """
+    candidates = list(ParameterGrid(param_grid))
+    prepared = {}
+    for ticker, (X, y) in datasets.items():
+        folds = purged_walk_forward(len(X), n_splits + 1, horizon, embargo)
+        if len(folds) >= 2:
+            prepared[ticker] = (X, y, folds)
+
+    jobs = [(t, c, f) for t, (_, _, folds) in prepared.items()
+            for c in range(len(candidates)) for f in range(len(folds))]
+    scores = {t: np.zeros((len(candidates), len(folds))) for t, (_, _, folds) in prepared.items()}
+    state = {"datasets": prepared, "candidates": candidates}
+    for ticker, candidate, fold, score in worker_map(_fit_fold, jobs, state, max_workers):
+        scores[ticker][candidate, fold] = score
+
+    results = {}
+    for ticker, grid in scores.items():
+        cv = grid[:, :-1].mean(axis=1)
+        best = int(np.argmax(cv))
+        results[ticker] = {"params": candidates[best], "cv_accuracy": float(cv[best]),
+                           "holdout_accuracy": float(grid[best, -1]), "folds": grid.shape[1]}
+    return results
+
+
+def purged_estimates(frames, param_grid=PARAM_GRID, n_splits=N_SPLITS, horizon=1, embargo=EMBARGO,
+                     max_workers=None):
+    """
+    Leakage-free accuracy per ticker (`purged_search` on prepared feature frames).
+    """
+    datasets = {ticker: labelled(df, horizon) for ticker, df in frames.items()}
+    results = purged_search(datasets, param_grid, n_splits, horizon, embargo, max_workers)
+    return pd.DataFrame([{"ticker": ticker, **result} for ticker, result in results.items()],
+                        columns=["ticker", "params", "cv_accuracy", "holdout_accuracy", "folds"])
+
+
+def fit_final(X, y, params):
+    """
+    The production scaler + tree: fit on every labelled row with the selected params.
+    """
+    scaler = StandardScaler().fit(X)
+    model = DecisionTreeClassifier(random_state=42, **params).fit(scaler.transform(X), y)
+    return model, scaler
+
+
+def shuffled_estimates(frames, param_grid=PARAM_GRID):
+    """
+    The estimates `train_model` used to report: scaler fit on all rows, shuffled 80/20
+    split and 5-fold GridSearchCV.
+    """
+    rows = []
+    for ticker, df in frames.items():
+        X = StandardScaler().fit_transform(df[FEATURE_COLS])
+        X_train, X_test, y_train, y_test = train_test_split(X, df['Target'], test_size=0.2, random_state=42)
+        clf = GridSearchCV(DecisionTreeClassifier(random_state=42), param_grid, cv=5).fit(X_train, y_train)
+        rows.append({"ticker": ticker, "params": clf.best_params_, "cv_accuracy": clf.best_score_,
+                     "holdout_accuracy": accuracy_score(y_test, clf.best_estimator_.predict(X_test))})
+    return pd.DataFrame(rows)
+
+
+def compare_estimates(frames, param_grid=PARAM_GRID, n_splits=N_SPLITS, horizon=1, embargo=EMBARGO,
+                      max_workers=None):
+    """
+    Old (shuffled) vs new (purged walk-forward) accuracy per ticker, plus the runtime of both.
+    Returns (per-ticker DataFrame, {"old_s", "new_s"}).
+    """
+    t0 = time.perf_counter()
+    old = shuffled_estimates(frames, param_grid)
+    t1 = time.perf_counter()
+    new = purged_estimates(frames, param_grid, n_splits, horizon, embargo, max_workers)
+    t2 = time.perf_counter()
+
+    report = old.merge(new.drop(columns="folds"), on="ticker", how="outer", suffixes=("_old", "_new"))
+    report["optimism"] = report["holdout_accuracy_old"] - report["holdout_accuracy_new"]
+    return report, {"old_s": t1 - t0, "new_s": t2 - t1}
+
+
+if __name__ == "__main__":
+    import sys
+    import tempfile
+    from src.ingestion import set_cache, fetch_universe
+    from src.data_cache import OHLCVCache
+    from src.synthetic import synthetic_source
+    from src.ml_model import fetch_and_prepare
+
+    tickers = sys.argv[1:]
+    with tempfile.TemporaryDirectory() as tmp:
+        if not tickers:
+            # Offline demo on synthetic bars
+            def synthetic_download(tickers, start, end, interval):
+                return fetch_universe(tickers, start, end, interval, source=synthetic_source())[0]
+
+            set_cache(OHLCVCache(synthetic_download, root=tmp))
+            tickers = [f"SYN{i:02d}.NS" for i in range(10)]
+
+        frames = {t: fetch_and_prepare(t) for t in tickers}
+        report, runtime = compare_estimates(frames)
+    print(report[["ticker", "cv_accuracy_old", "holdout_accuracy_old",
+                  "cv_accuracy_new", "holdout_accuracy_new", "optimism"]].to_string(index=False))
+    print(f"Mean optimism: {report['optimism'].mean():.4f} | "
+          f"old: {runtime['old_s']:.2f}s | new: {runtime['new_s']:.2f}s")
+
+    # In-process searches from two threads at once (two train jobs) keep their own datasets
+    import threading
+
+    pair = {t: labelled(frames[t]) for t in tickers[:2]}
+    sequential = {t: purged_search({t: data}, max_workers=1)[t] for t, data in pair.items()}
+    concurrent = {}
+    threads = [threading.Thread(target=lambda t=t: concurrent.update(purged_search({t: pair[t]}, max_workers=1)))
+               for t in pair]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    same = concurrent == sequential
+    print(f"Concurrent in-process searches match sequential: {same}")
+    sys.exit(0 if same else 1)